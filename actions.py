@@ -0,0 +1,75 @@
+# Moderation actions
+# Shared by the slash commands and automod so a ban or timeout always gets logged and
+# scheduled the same way no matter where it came from
+import datetime
+import time
+
+import interactions
+from interactions import Member
+
+import cases
+from duration import Duration, parse_duration
+from scheduler import scheduler
+
+# Timekeeping logic
+MAX_TIMEOUT = datetime.timedelta(days=28)  # Discord's maximum timeout time
+
+
+def timeout_time_logic(
+    duration_str: str, max_seconds: int | None = None  # The server's max_timeout setting
+) -> datetime.timedelta | None:
+    parsed = parse_duration(duration_str)
+    if parsed is None:
+        return None
+
+    delta = parsed.delta
+    # Check against Discord's maximum timeout time (or the server's, if it's lower)
+    if delta > MAX_TIMEOUT or (max_seconds is not None and parsed.seconds > max_seconds):
+        return None
+
+    return delta
+
+
+# Timeouts and bans
+async def timeout_member(
+    guild_id: int,
+    member: Member,
+    delta: datetime.timedelta,
+    moderator_id: int,
+    reason: str | None = None,
+) -> datetime.datetime:
+    end_time = datetime.datetime.now(datetime.timezone.utc) + delta
+    await member.timeout(communication_disabled_until=end_time, reason=reason)
+    cases.log_case(
+        guild_id, member.id, moderator_id, "timeout", reason, int(delta.total_seconds())
+    )
+    return end_time
+
+
+async def ban_user(
+    guild: interactions.Guild,
+    user_id: int,
+    moderator_id: int,
+    reason: str | None = None,
+    audit_reason: str | None = None,  # Shown in the audit log, defaults to reason
+    delete_message_seconds: int = 0,
+    ban_length: Duration | None = None,  # Forever if None
+):
+    await guild.ban(
+        user_id, delete_message_seconds=delete_message_seconds, reason=audit_reason or reason
+    )
+    if ban_length:
+        # Unbanned later by the scheduler
+        scheduler.schedule(guild.id, user_id, "unban", time.time() + ban_length.seconds)
+    else:
+        # A permanent ban replaces any temp ban they already had
+        scheduler.cancel(guild.id, user_id, "unban")
+    cases.log_case(
+        guild.id,
+        user_id,
+        moderator_id,
+        "ban",
+        reason,
+        ban_length.seconds if ban_length else None,
+    )
+
@@ -0,0 +1,185 @@
+# Anti-raid
+# Counts joins per guild in a sliding window made of one second buckets (adding a join
+# and reading the total are both O(1)). When too many people (or too many brand new
+# accounts) join at once the guild goes into lockdown: everyone from the burst plus
+# anyone joining while it lasts gets queued and handled in batches by the handler
+# main.py registers (kick/timeout/ban through bulk.py so it stays under rate limits)
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, NamedTuple
+
+import config
+import log
+
+DISCORD_EPOCH = 1420070400  # Seconds, snowflakes count milliseconds from here
+DONE_VERBS = {"kick": "kicked", "timeout": "timed out", "ban": "banned"}  # For messages
+
+Handler = Callable[[int, list[int]], Awaitable[None]]
+
+
+def account_created(user_id: int) -> float:
+    return (int(user_id) >> 22) / 1000 + DISCORD_EPOCH
+
+
+class JoinWindow:
+    # Joins and young account joins over the last RAID_WINDOW seconds
+    __slots__ = ("_joins", "_young", "_last", "total", "young")
+
+    def __init__(self, seconds: int):
+        self._joins = [0] * seconds
+        self._young = [0] * seconds
+        self._last = 0  # Newest second we've seen
+        self.total = 0
+        self.young = 0
+
+    def _advance(self, second: int):
+        # Clears the buckets that slid out of the window since the last join
+        size = len(self._joins)
+        if second - self._last >= size:
+            self._joins = [0] * size
+            self._young = [0] * size
+            self.total = self.young = 0
+        else:
+            for old in range(self._last + 1, second + 1):
+                i = old % size
+                self.total -= self._joins[i]
+                self.young -= self._young[i]
+                self._joins[i] = self._young[i] = 0
+        self._last = max(self._last, second)
+
+    def add(self, now: float, young: bool):
+        second = int(now)
+        self._advance(second)
+        i = second % len(self._joins)
+        self._joins[i] += 1
+        self.total += 1
+        if young:
+            self._young[i] += 1
+            self.young += 1
+
+
+class GuildState:
+    __slots__ = ("window", "recent", "lockdown_until", "pending", "drainer")
+
+    def __init__(self):
+        self.window = JoinWindow(config.RAID_WINDOW)
+        # Who joined recently, handed over as the burst cohort when lockdown starts
+        self.recent: deque[tuple[float, int]] = deque(maxlen=config.BULK_MAX_USERS)
+        self.lockdown_until = 0.0
+        self.pending: set[int] = set()  # Queued for the handler
+        self.drainer: asyncio.Task | None = None
+
+    def locked(self, now: float) -> bool:
+        return now < self.lockdown_until
+
+
+class JoinCheck(NamedTuple):
+    started: bool  # This join kicked off a lockdown
+    queued: int  # Users queued because of this join
+
+
+_guilds: dict[int, GuildState] = {}
+_handler: Handler | None = None
+
+
+def set_handler(handler: Handler):
+    global _handler
+    _handler = handler
+
+
+def _state(guild_id: int) -> GuildState:
+    state = _guilds.get(guild_id)
+    if state is None:
+        state = _guilds[guild_id] = GuildState()
+    return state
+
+
+def member_joined(guild_id: int, user_id: int, now: float | None = None) -> JoinCheck:
+    now = time.time() if now is None else now
+    state = _state(guild_id)
+    young = now - account_created(user_id) < config.RAID_ACCOUNT_AGE
+    state.window.add(now, young)
+    state.recent.append((now, user_id))
+
+    if state.locked(now):
+        # Keep it going while joins keep coming
+        state.lockdown_until = max(state.lockdown_until, now + config.RAID_LOCKDOWN_SECONDS)
+        _queue(guild_id, state, [user_id])
+        return JoinCheck(False, 1)
+
+    if (
+        state.window.total >= config.RAID_JOIN_THRESHOLD
+        or state.window.young >= config.RAID_YOUNG_THRESHOLD
+    ):
+        state.lockdown_until = now + config.RAID_LOCKDOWN_SECONDS
+        cohort = [uid for joined, uid in state.recent if now - joined <= config.RAID_WINDOW]
+        _queue(guild_id, state, cohort)
+        return JoinCheck(True, len(cohort))
+    return JoinCheck(False, 0)
+
+
+def _queue(guild_id: int, state: GuildState, user_ids: list[int]):
+    state.pending.update(user_ids)
+    if state.drainer is None or state.drainer.done():
+        state.drainer = asyncio.create_task(_drain(guild_id, state))
+
+
+async def _drain(guild_id: int, state: GuildState):
+    # Waits a moment so joins arriving together go out as one batch
+    while state.pending:
+        await asyncio.sleep(config.RAID_BATCH_DELAY)
+        batch = list(state.pending)
+        state.pending.clear()
+        if _handler is None:
+            continue
+        try:
+            await _handler(guild_id, batch)
+        except Exception as e:
+            log.error("raid_batch_failed", guild_id=guild_id, users=len(batch), exc=e)
+
+
+def start_lockdown(guild_id: int, seconds: float):
+    # Manual lockdown, only people joining from now on get handled
+    _state(guild_id).lockdown_until = time.time() + seconds
+
+
+def end_lockdown(guild_id: int) -> bool:
+    state = _guilds.get(guild_id)
+    if state is None or not state.locked(time.time()):
+        return False
+    state.lockdown_until = 0.0
+    state.pending.clear()
+    return True
+
+
+def lockdown_remaining(guild_id: int) -> float:
+    state = _guilds.get(guild_id)
+    if state is None:
+        return 0.0
+    return max(0.0, state.lockdown_until - time.time())
+
+
+def guild_removed(guild_id: int):
+    state = _guilds.pop(guild_id, None)
+    if state is not None and state.drainer is not None:
+        state.drainer.cancel()
+
+
+# Warm restarts (warm_start.py)
+def snapshot() -> list[tuple[int, float, list[int]]]:
+    # Lockdowns still going, with how long they have left and who's still waiting to
+    # be handled
+    now = time.time()
+    return [
+        (guild_id, state.lockdown_until - now, sorted(state.pending))
+        for guild_id, state in _guilds.items()
+        if state.locked(now)
+    ]
+
+
+def restore_lockdown(guild_id: int, seconds: float, pending: list[int]):
+    state = _state(guild_id)
+    state.lockdown_until = max(state.lockdown_until, time.time() + seconds)
+    if pending:
+        _queue(guild_id, state, pending)
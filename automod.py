@@ -0,0 +1,249 @@
+# Automod
+# Scans every message for each guild's banned terms. A guild's whole term list gets
+# compiled into one pattern (plain words go into a trie so the regex engine walks them
+# like an automaton instead of trying every word one by one) and it's only rebuilt when
+# the list changes. Text gets normalized first so caps, lookalike letters, leetspeak and
+# zero-width characters don't sneak past. Regex terms are different: they can be slow
+# enough to freeze the bot so they run in regex_worker.py's process with a timeout, on
+# the message as it was sent (ignoring case)
+import re
+import unicodedata
+from typing import NamedTuple
+
+import config
+import log
+import sharding
+from database import db
+from regex_worker import RegexTimeout, worker
+
+db.add_schema(
+    """
+    CREATE TABLE IF NOT EXISTS automod_terms (
+        guild_id INTEGER NOT NULL,
+        term TEXT NOT NULL,
+        action TEXT NOT NULL,
+        PRIMARY KEY (guild_id, term)
+    );
+    """
+)
+
+ACTIONS = ("delete", "timeout", "ban")  # Every action deletes the message first
+REGEX_PREFIX = "re:"  # Terms starting with this are regexes instead of words
+
+# Characters that render as nothing, people put these inside words to dodge filters
+_ZERO_WIDTH = "\u00ad\u034f\u061c\u180e\u200b\u200c\u200d\u200e\u200f\u2060\u2061\u2062\u2063\u2064\ufeff"
+# Lookalikes that NFKC leaves alone (mostly Cyrillic and Greek) and leetspeak
+_CONFUSABLES = {
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o",
+    "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j", "ѕ": "s",
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o",
+    "ρ": "p", "τ": "t", "υ": "u", "χ": "x",
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s",
+}  # fmt: skip
+# One table so normalizing is a single str.translate call
+_TRANSLATE = str.maketrans({**dict.fromkeys(_ZERO_WIDTH), **_CONFUSABLES})
+# bytes.translate is a lot faster than str.translate so plain ASCII messages use this
+_ASCII_LEET = {char: sub for char, sub in _CONFUSABLES.items() if char.isascii()}
+_ASCII_TRANSLATE = bytes.maketrans(
+    "".join(_ASCII_LEET).encode(), "".join(_ASCII_LEET.values()).encode()
+)
+
+
+class AutomodError(Exception):
+    # Raised for terms that can't be added (bad regex, too many terms, etc.)
+    pass
+
+
+class Rule(NamedTuple):
+    term: str
+    action: str
+
+
+def normalize(text: str) -> str:
+    # Most messages are plain ASCII so skip the unicode work for them
+    if text.isascii():
+        return text.lower().encode().translate(_ASCII_TRANSLATE).decode()
+    text = unicodedata.normalize("NFKC", text)
+    return text.casefold().translate(_TRANSLATE)
+
+
+def _trie_pattern(words: list[str]) -> str:
+    # Words sharing a prefix share a branch, "bad", "badge" and "bat" turn into
+    # ba(?:d(?:ge)?|t) so each spot in the message is only checked once per letter
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # End of a word
+
+    def emit(node: dict) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return emit(trie)
+
+
+class Matcher:
+    # One guild's compiled word list, regexes only get sorted out here and run in the worker
+    __slots__ = ("_pattern", "_words", "regexes")
+
+    def __init__(self, rules: dict[str, Rule]):
+        self._words: dict[str, Rule] = {}
+        self.regexes: list[Rule] = []
+        for term, rule in rules.items():
+            if term.startswith(REGEX_PREFIX):
+                self.regexes.append(rule)
+            else:
+                self._words[term] = rule
+        # Whole words only so "class" doesn't trip on "ass". Escaped words can't backtrack
+        # much so this is fine to run on the event loop
+        self._pattern = None
+        if self._words:
+            self._pattern = re.compile(rf"(?<!\w)(?:{_trie_pattern(list(self._words))})(?!\w)")
+
+    def match(self, normalized: str) -> Rule | None:
+        if self._pattern is None:
+            return None
+        found = self._pattern.search(normalized)
+        if found is None:
+            return None
+        return self._words.get(found.group())
+
+
+_rules: dict[int, dict[str, Rule]] = {}  # guild id -> {term: rule}
+_matchers: dict[int, Matcher] = {}  # Compiled lazily, dropped when the terms change
+_suspended: set[int] = set()  # Guilds whose regexes timed out, until their terms change
+
+
+async def load():
+    # Other workers' servers never send us messages, no point holding their terms
+    rows = await db.read(
+        "SELECT guild_id, term, action FROM automod_terms"
+        f" WHERE {sharding.owned_sql('guild_id')}"
+    )
+    _rules.clear()
+    _matchers.clear()
+    _suspended.clear()
+    for guild_id, term, action in rows:
+        _rules.setdefault(guild_id, {})[term] = Rule(term, action)
+
+
+def _clean_term(term: str) -> str:
+    term = term.strip()
+    if term.lower().startswith(REGEX_PREFIX):
+        source = term[len(REGEX_PREFIX):].strip()
+        if not source or len(source) > config.AUTOMOD_MAX_REGEX_LENGTH:
+            raise AutomodError(
+                f"Regexes need to be 1-{config.AUTOMOD_MAX_REGEX_LENGTH} characters"
+            )
+        try:
+            re.compile(source, re.IGNORECASE)  # Same as the worker compiles it
+        except re.error as e:
+            raise AutomodError(f"That regex doesn't compile: {e}")
+        return REGEX_PREFIX + source
+    # Stored normalized so it lines up with normalized messages
+    term = normalize(term)
+    if not term:
+        raise AutomodError("That term is empty")
+    return term
+
+
+def add_term(guild_id: int, term: str, action: str) -> str:
+    if action not in ACTIONS:
+        raise AutomodError(f"Action has to be one of {', '.join(ACTIONS)}")
+    term = _clean_term(term)
+    rules = _rules.setdefault(int(guild_id), {})
+    if term not in rules and len(rules) >= config.AUTOMOD_MAX_TERMS:
+        raise AutomodError(f"This server already has {config.AUTOMOD_MAX_TERMS} terms")
+    rules[term] = Rule(term, action)
+    _changed(int(guild_id))
+    db.write(
+        "INSERT OR REPLACE INTO automod_terms (guild_id, term, action) VALUES (?, ?, ?)",
+        (int(guild_id), term, action),
+    )
+    return term
+
+
+def remove_term(guild_id: int, term: str) -> bool:
+    try:
+        term = _clean_term(term)
+    except AutomodError:
+        return False
+    rules = _rules.get(int(guild_id))
+    if not rules or rules.pop(term, None) is None:
+        return False
+    _changed(int(guild_id))
+    db.write(
+        "DELETE FROM automod_terms WHERE guild_id = ? AND term = ?",
+        (int(guild_id), term),
+    )
+    return True
+
+
+def _changed(guild_id: int):
+    _matchers.pop(guild_id, None)
+    _suspended.discard(guild_id)
+
+
+def terms(guild_id: int) -> list[Rule]:
+    return sorted(_rules.get(int(guild_id), {}).values())
+
+
+def _matcher(guild_id: int) -> Matcher | None:
+    rules = _rules.get(guild_id)
+    if not rules:
+        return None
+    matcher = _matchers.get(guild_id)
+    if matcher is None:
+        matcher = _matchers[guild_id] = Matcher(rules)
+        worker.set_patterns(
+            guild_id, [rule.term[len(REGEX_PREFIX):] for rule in matcher.regexes]
+        )
+    return matcher
+
+
+def check(guild_id: int, content: str) -> Rule | None:
+    # Words only, called for every message so guilds without terms bail out on one dict
+    # lookup. check_regexes() does the rest
+    if not content:
+        return None
+    matcher = _matcher(guild_id)
+    if matcher is None:
+        return None
+    return matcher.match(normalize(content))
+
+
+def has_regexes(guild_id: int) -> bool:
+    matcher = _matcher(guild_id)
+    return matcher is not None and bool(matcher.regexes) and guild_id not in _suspended
+
+
+async def check_regexes(guild_id: int, content: str) -> Rule | None:
+    if not content or not has_regexes(guild_id):
+        return None
+    matcher = _matchers[guild_id]
+    try:
+        hit = await worker.match(guild_id, content)
+    except RegexTimeout:
+        # Skipped until someone changes the terms instead of stalling every message
+        _suspended.add(guild_id)
+        log.warning(
+            "automod_regex_timeout", guild_id=guild_id, seconds=config.AUTOMOD_REGEX_TIMEOUT
+        )
+        return None
+    except Exception as e:
+        log.error("automod_regex_failed", guild_id=guild_id, exc=e)
+        return None
+    return None if hit is None else matcher.regexes[hit]
+
+
+def guild_removed(guild_id: int):
+    # Terms stay in the database in case the bot gets added back
+    _changed(guild_id)
+    worker.set_patterns(guild_id, [])
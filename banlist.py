@@ -0,0 +1,518 @@
+# Shared ban list
+# For running EasyMod across a network of partner servers. Servers opt in with
+# /banlist join, permanent /bans in servers that share get added to the list and every
+# subscribed server gets those users banned too (and unbanned again if the server that
+# added them unbans them). Each subscribed server keeps a snapshot of its own bans as a
+# sorted array of user ids, kept fresh from ban events, so syncing is a merge of two
+# sorted lists that comes out with exactly who's missing. A server's bans only get
+# fetched once when it joins, after that only the difference goes out (through the bulk
+# ban endpoint, same as /massban). Every change to the list gets a version number so
+# servers that are already in sync only look at the ids that changed since. A /ban in one
+# server can ban people everywhere so only servers in config.BANLIST_GUILDS can join and
+# only the ones in BANLIST_SHARE_GUILDS can add to the list
+import asyncio
+import bisect
+import heapq
+import time
+from array import array
+
+from interactions import Client
+
+import bulk
+import cases
+import config
+import log
+import sharding
+from database import db
+
+db.add_schema(
+    """
+    CREATE TABLE IF NOT EXISTS banlist (
+        user_id INTEGER PRIMARY KEY,
+        guild_id INTEGER NOT NULL,
+        moderator_id INTEGER NOT NULL,
+        reason TEXT,
+        added_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS banlist_changes (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        added INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS banlist_subscribers (
+        guild_id INTEGER PRIMARY KEY,
+        share INTEGER NOT NULL,
+        synced_version INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS banlist_guild_bans (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS banlist_applied (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        pardoned INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id)
+    ) WITHOUT ROWID;
+    """
+)
+
+BANS_PAGE = 1000  # Max bans per fetch
+
+
+class IdSet:
+    # Sorted array of user ids (8 bytes each, a set would be around 70) plus the few
+    # that changed since, those get merged back in by compact()
+    __slots__ = ("ids", "added", "removed")
+
+    def __init__(self, ids=()):
+        self.ids = array("q", ids)  # Has to be sorted
+        self.added: set[int] = set()
+        self.removed: set[int] = set()
+
+    def _in_array(self, user_id: int) -> bool:
+        i = bisect.bisect_left(self.ids, user_id)
+        return i < len(self.ids) and self.ids[i] == user_id
+
+    def __contains__(self, user_id: int) -> bool:
+        if user_id in self.added:
+            return True
+        return user_id not in self.removed and self._in_array(user_id)
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.added) - len(self.removed)
+
+    def add(self, user_id: int):
+        if self._in_array(user_id):
+            self.removed.discard(user_id)
+        else:
+            self.added.add(user_id)
+
+    def discard(self, user_id: int):
+        if self._in_array(user_id):
+            self.removed.add(user_id)
+        else:
+            self.added.discard(user_id)
+
+    def pending(self) -> int:
+        return len(self.added) + len(self.removed)
+
+    def compact(self) -> array:
+        if self.added or self.removed:
+            removed = self.removed
+            kept = (user_id for user_id in self.ids if user_id not in removed)
+            self.ids = array("q", heapq.merge(kept, sorted(self.added)))
+            self.added = set()
+            self.removed = set()
+        return self.ids
+
+
+def difference(a, b) -> list[int]:
+    # Ids in sorted a that aren't in sorted b, one pass over both
+    missing = []
+    j = 0
+    end = len(b)
+    for user_id in a:
+        while j < end and b[j] < user_id:
+            j += 1
+        if j == end or b[j] != user_id:
+            missing.append(user_id)
+    return missing
+
+
+class Subscriber:
+    __slots__ = (
+        "share", "synced_version", "bans", "applied", "pardoned", "todo", "full", "unbanned"
+    )
+
+    def __init__(self, share: bool, synced_version: int | None):
+        self.share = share  # Their /bans go on the list
+        self.synced_version = synced_version  # None until the first sync
+        self.bans = IdSet()  # Everyone banned in the server
+        self.applied = IdSet()  # The ones the list banned
+        self.pardoned: set[int] = set()  # Unbanned by hand after the list banned them
+        self.todo: set[int] = set()  # Ids that changed on the list since the last sync
+        self.full = synced_version is None  # Diff the whole list next time
+        self.unbanned: set[int] | None = None  # Unbans that came in while fetching bans
+
+
+_bot: Client | None = None
+_shared = IdSet()  # Everyone on the list
+_version = 0  # Newest change we've seen
+_subs: dict[int, Subscriber] = {}  # Subscribed servers on this worker's shards
+_syncing: dict[int, asyncio.Task] = {}
+_slots = asyncio.Semaphore(config.BANLIST_SYNC_CONCURRENCY)
+_wake = asyncio.Event()
+_task: asyncio.Task | None = None
+
+
+def can_join(guild_id: int) -> bool:
+    return int(guild_id) in config.BANLIST_GUILDS
+
+
+def can_share(guild_id: int) -> bool:
+    return int(guild_id) in config.BANLIST_SHARE_GUILDS and can_join(guild_id)
+
+
+def size() -> int:
+    return len(_shared)
+
+
+def pending() -> int:
+    # Ids waiting to be checked, for the metrics endpoint
+    return sum(len(sub.todo) for sub in _subs.values())
+
+
+async def start(bot: Client):
+    global _bot, _task, _version
+    if _task is not None:
+        return
+    _bot = bot
+    # Version first so a change landing in between gets pulled again instead of missed
+    _version = (await db.read("SELECT COALESCE(MAX(version), 0) FROM banlist_changes"))[0][0]
+    # The primary key hands them back sorted
+    rows = await db.read("SELECT user_id FROM banlist ORDER BY user_id")
+    _shared.ids = array("q", (user_id for (user_id,) in rows))
+
+    owned = sharding.owned_sql("guild_id")
+    for guild_id, share, synced_version in await db.read(
+        f"SELECT guild_id, share, synced_version FROM banlist_subscribers WHERE {owned}"
+    ):
+        if not can_join(guild_id):
+            # Taken off BANLIST_GUILDS since it joined, its rows stay in case it's added back
+            log.warning("banlist_guild_not_allowed", guild_id=guild_id)
+            continue
+        _subs[guild_id] = Subscriber(bool(share) and can_share(guild_id), synced_version)
+    if _subs:
+        await _load_snapshots(owned)
+    _task = asyncio.create_task(_run())
+
+
+async def _load_snapshots(owned: str):
+    bans: dict[int, list[int]] = {}
+    for guild_id, user_id in await db.read(
+        f"SELECT guild_id, user_id FROM banlist_guild_bans WHERE {owned}"
+        " ORDER BY guild_id, user_id"
+    ):
+        bans.setdefault(guild_id, []).append(user_id)
+    applied: dict[int, list[int]] = {}
+    for guild_id, user_id, pardoned in await db.read(
+        f"SELECT guild_id, user_id, pardoned FROM banlist_applied WHERE {owned}"
+        " ORDER BY guild_id, user_id"
+    ):
+        if pardoned:
+            _subs[guild_id].pardoned.add(user_id)
+        else:
+            applied.setdefault(guild_id, []).append(user_id)
+
+    for guild_id, sub in _subs.items():
+        sub.bans = IdSet(bans.get(guild_id, ()))
+        sub.applied = IdSet(applied.get(guild_id, ()))
+        # Catch up on whatever changed while we were down
+        if sub.synced_version is not None and sub.synced_version < _version:
+            rows = await db.read(
+                "SELECT DISTINCT user_id FROM banlist_changes WHERE version > ?",
+                (sub.synced_version,),
+            )
+            sub.todo.update(user_id for (user_id,) in rows)
+
+
+def _changed(user_id: int, added: bool):
+    if added:
+        _shared.add(user_id)
+    else:
+        _shared.discard(user_id)
+    for sub in _subs.values():
+        sub.todo.add(user_id)
+    _wake.set()
+
+
+def _record(user_id: int, added: bool):
+    db.write(
+        "INSERT INTO banlist_changes (user_id, added) VALUES (?, ?)", (user_id, int(added))
+    )
+    _changed(user_id, added)
+
+
+async def _pull():
+    # Changes other workers made (ours come back too, applying them twice is harmless)
+    global _version
+    rows = await db.read(
+        "SELECT version, user_id, added FROM banlist_changes WHERE version > ? ORDER BY version",
+        (_version,),
+    )
+    if not rows:
+        return
+    _version = rows[-1][0]
+    for _, user_id, added in rows:
+        _changed(user_id, bool(added))
+
+
+# Subscribing
+def subscribe(guild_id: int, share: bool) -> bool:
+    # Returns False if they were already subscribed (that just forces a full resync)
+    if not can_join(guild_id) or (share and not can_share(guild_id)):
+        raise PermissionError(f"guild {guild_id} isn't allowed to {'share' if share else 'join'}")
+    sub = _subs.get(guild_id)
+    new = sub is None
+    if new:
+        sub = _subs[guild_id] = Subscriber(share, None)
+    sub.share = share
+    sub.full = True
+    db.write(
+        "INSERT INTO banlist_subscribers (guild_id, share) VALUES (?, ?)"
+        " ON CONFLICT (guild_id) DO UPDATE SET share = excluded.share",
+        (guild_id, int(share)),
+    )
+    _wake.set()
+    return new
+
+
+def unsubscribe(guild_id: int) -> bool:
+    # Bans the list already made stay
+    if _subs.pop(guild_id, None) is None:
+        return False
+    task = _syncing.pop(guild_id, None)
+    if task is not None:
+        task.cancel()
+    for table in ("banlist_subscribers", "banlist_guild_bans", "banlist_applied"):
+        db.write(f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,))
+    return True
+
+
+def subscriber(guild_id: int) -> Subscriber | None:
+    return _subs.get(guild_id)
+
+
+def is_syncing(guild_id: int) -> bool:
+    return guild_id in _syncing
+
+
+# Publishing, called by /ban
+def publish(guild_id: int, user_id: int, moderator_id: int, reason: str | None) -> bool:
+    # Only permanent bans from servers that share, True if they went on the list
+    sub = _subs.get(guild_id)
+    if sub is None or not sub.share or not can_share(guild_id) or user_id in _shared:
+        return False
+    sub.bans.add(user_id)  # So the sync doesn't try to ban them again here
+    db.write(
+        "INSERT OR IGNORE INTO banlist (user_id, guild_id, moderator_id, reason, added_at)"
+        " VALUES (?, ?, ?, ?, ?)",
+        (user_id, guild_id, moderator_id, reason, time.time()),
+    )
+    _record(user_id, True)
+    return True
+
+
+# Gateway event hooks
+def ban_added(guild_id: int, user_id: int):
+    sub = _subs.get(guild_id)
+    if sub is None:
+        return
+    if sub.unbanned is not None:
+        sub.unbanned.discard(user_id)
+    if user_id in sub.bans:
+        return
+    sub.bans.add(user_id)
+    db.write(
+        "INSERT OR IGNORE INTO banlist_guild_bans (guild_id, user_id) VALUES (?, ?)",
+        (guild_id, user_id),
+    )
+
+
+async def ban_removed(guild_id: int, user_id: int):
+    sub = _subs.get(guild_id)
+    if sub is None:
+        return
+    if sub.unbanned is not None:
+        sub.unbanned.add(user_id)  # Might be on a page we already fetched
+    sub.bans.discard(user_id)
+    db.write(
+        "DELETE FROM banlist_guild_bans WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+    )
+    if user_id in sub.applied:
+        sub.applied.discard(user_id)
+        if user_id in _shared:
+            # Unbanned by hand after the list banned them, don't ban them again
+            sub.pardoned.add(user_id)
+            db.write(
+                "UPDATE banlist_applied SET pardoned = 1 WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            )
+        else:
+            db.write(
+                "DELETE FROM banlist_applied WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            )
+    if sub.share and user_id in _shared:
+        # The server that put them on the list unbanned them, take them off everywhere
+        rows = await db.read("SELECT guild_id FROM banlist WHERE user_id = ?", (user_id,))
+        if rows and rows[0][0] == guild_id:
+            db.write("DELETE FROM banlist WHERE user_id = ?", (user_id,))
+            _record(user_id, False)
+
+
+# Syncing
+async def _run():
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), config.BANLIST_SYNC_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        try:
+            await _pull()
+        except Exception as e:
+            log.error("banlist_pull_failed", exc=e)
+        for guild_id, sub in _subs.items():
+            if (sub.full or sub.todo) and guild_id not in _syncing:
+                _syncing[guild_id] = asyncio.create_task(_sync(guild_id, sub))
+
+
+async def _sync(guild_id: int, sub: Subscriber):
+    try:
+        async with _slots:
+            await _sync_guild(guild_id, sub)
+    except Exception as e:
+        log.error("banlist_sync_failed", guild_id=guild_id, exc=e)
+    finally:
+        _syncing.pop(guild_id, None)
+
+
+async def _fetch_bans(guild_id: int, sub: Subscriber):
+    # The only time a server's bans get fetched, ban events keep the snapshot fresh after
+    # this. Bans come back sorted by user id so "after" pages through them
+    sub.bans = IdSet()  # Ban events during the fetch pile up in here
+    sub.unbanned = set()
+    ids: list[int] = []
+    after = None
+    try:
+        while True:
+            page = await _bot.http.get_guild_bans(guild_id, after=after, limit=BANS_PAGE)
+            ids.extend(int(ban["user"]["id"]) for ban in page)
+            if len(page) < BANS_PAGE:
+                break
+            after = ids[-1]
+        # Unbanned after their page came back, the pages don't know about that
+        ids = sorted(set(ids) - sub.unbanned)
+    finally:
+        sub.unbanned = None
+    sub.bans.ids = array("q", ids)
+    sub.bans.added -= set(ids)
+    db.write("DELETE FROM banlist_guild_bans WHERE guild_id = ?", (guild_id,))
+    db.write_many(
+        "INSERT OR IGNORE INTO banlist_guild_bans (guild_id, user_id) VALUES (?, ?)",
+        [(guild_id, user_id) for user_id in sub.bans.compact()],
+    )
+    log.info("banlist_snapshot", guild_id=guild_id, bans=len(ids))
+
+
+def _full_diff(sub: Subscriber) -> tuple[list[int], list[int]]:
+    shared = _shared.compact()
+    bans = sub.bans.compact()
+    to_ban = [user_id for user_id in difference(shared, bans) if user_id not in sub.pardoned]
+    # Taken off the list but still banned because of it
+    to_unban = [user_id for user_id in difference(sub.applied.compact(), shared) if user_id in sub.bans]
+    return to_ban, to_unban
+
+
+def _changed_diff(sub: Subscriber, todo: set[int]) -> tuple[list[int], list[int]]:
+    # Same thing but only for the ids that changed, a few lookups each
+    to_ban = []
+    to_unban = []
+    for user_id in sorted(todo):
+        if user_id in _shared:
+            if user_id not in sub.bans and user_id not in sub.pardoned:
+                to_ban.append(user_id)
+        elif user_id in sub.applied and user_id in sub.bans:
+            to_unban.append(user_id)
+    return to_ban, to_unban
+
+
+async def _sync_guild(guild_id: int, sub: Subscriber):
+    guild = _bot.get_guild(guild_id)
+    if guild is None:
+        return  # Not in the cache yet, try again next round
+    version = _version
+    full, todo = sub.full, sub.todo
+    sub.full, sub.todo = False, set()
+    failed = []
+    try:
+        # Lots of changes at once is cheaper as one pass over both lists
+        if full or len(todo) > len(_shared) // 8:
+            if sub.synced_version is None:
+                await _fetch_bans(guild_id, sub)
+            to_ban, to_unban = _full_diff(sub)
+        else:
+            to_ban, to_unban = _changed_diff(sub, todo)
+
+        if to_ban:
+            failed += await _ban(guild, sub, to_ban)
+        if to_unban:
+            failed += await _unban(guild, sub, to_unban)
+    except Exception:
+        # Put the work back so the next round tries again (changes that came in
+        # meanwhile are already in sub.todo)
+        sub.full = sub.full or full
+        sub.todo |= todo
+        raise
+    for ids in (sub.bans, sub.applied):
+        if ids.pending() > 1024:
+            ids.compact()
+    if failed:
+        # Tried again next round, the version stays put until everything went through
+        sub.todo.update(failed)
+    elif _subs.get(guild_id) is sub:
+        sub.synced_version = version
+        db.write(
+            "UPDATE banlist_subscribers SET synced_version = ? WHERE guild_id = ?",
+            (version, guild_id),
+        )
+
+
+async def _ban(guild, sub: Subscriber, user_ids: list[int]) -> list[int]:
+    # Returns the ids that failed
+    result = await bulk.ban_many(guild, user_ids, config.BANLIST_REASON)
+    for user_id in result.succeeded:
+        sub.bans.add(user_id)
+        sub.applied.add(user_id)
+    db.write_many(
+        "INSERT OR IGNORE INTO banlist_guild_bans (guild_id, user_id) VALUES (?, ?)",
+        [(guild.id, user_id) for user_id in result.succeeded],
+    )
+    db.write_many(
+        "INSERT OR REPLACE INTO banlist_applied (guild_id, user_id, pardoned) VALUES (?, ?, 0)",
+        [(guild.id, user_id) for user_id in result.succeeded],
+    )
+    cases.log_cases(guild.id, result.succeeded, _bot.user.id, "ban", config.BANLIST_REASON)
+    log.info(
+        "banlist_banned",
+        guild_id=guild.id,
+        banned=len(result.succeeded),
+        failed=len(result.failed),
+    )
+    return list(result.failed)
+
+
+async def _unban(guild, sub: Subscriber, user_ids: list[int]) -> list[int]:
+    reason = "Taken off the shared ban list"
+
+    async def unban(user_id: int):
+        await _bot.http.remove_guild_ban(guild.id, user_id, reason=reason)
+
+    result = await bulk.run(user_ids, unban)
+    for user_id in result.succeeded:
+        sub.bans.discard(user_id)
+        sub.applied.discard(user_id)
+    rows = [(guild.id, user_id) for user_id in result.succeeded]
+    db.write_many("DELETE FROM banlist_guild_bans WHERE guild_id = ? AND user_id = ?", rows)
+    db.write_many("DELETE FROM banlist_applied WHERE guild_id = ? AND user_id = ?", rows)
+    cases.log_cases(guild.id, result.succeeded, _bot.user.id, "unban", reason)
+    log.info(
+        "banlist_unbanned",
+        guild_id=guild.id,
+        unbanned=len(result.succeeded),
+        failed=len(result.failed),
+    )
+    return list(result.failed)
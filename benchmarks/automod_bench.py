@@ -0,0 +1,85 @@
+# Automod benchmark
+# Checks random chat messages against a big term list with the compiled matcher and
+# with a plain loop of re.search calls (one per term) and reports messages per second
+# Run from the repo root: python benchmarks/automod_bench.py
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import automod  # noqa: E402
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+
+
+def make_messages(rng: random.Random, terms: list[str], count: int, hit_rate: float):
+    vocab = [random_word(rng) for _ in range(5000)]
+    messages = []
+    for _ in range(count):
+        words = rng.choices(vocab, k=rng.randint(3, 30))
+        if rng.random() < hit_rate:
+            # Dress the term up like someone dodging a filter would
+            term = rng.choice(terms)
+            term = rng.choice((term.upper(), term.replace("o", "0"), "\u200b".join(term)))
+            words.insert(rng.randrange(len(words) + 1), term)
+        if rng.random() < 0.1:
+            words.append("ünïcödé 🙂")
+        messages.append(" ".join(words))
+    return messages
+
+
+def rate(check, messages: list[str]) -> tuple[float, int]:
+    start = time.perf_counter()
+    hits = sum(1 for message in messages if check(message) is not None)
+    return len(messages) / (time.perf_counter() - start), hits
+
+
+def bench(term_count: int, message_count: int, hit_rate: float, seed: int):
+    rng = random.Random(seed)
+    terms = sorted({random_word(rng) for _ in range(term_count)})
+    messages = make_messages(rng, terms, message_count, hit_rate)
+
+    guild_id = 1
+    for term in terms:
+        automod._rules.setdefault(guild_id, {})[term] = automod.Rule(term, "delete")
+    automod.check(guild_id, "warm up")  # Builds the matcher
+
+    # What you'd write without the compiled matcher
+    naive = [re.compile(rf"\b{re.escape(term)}\b") for term in terms]
+
+    def naive_check(message: str):
+        text = automod.normalize(message)
+        for pattern in naive:
+            if pattern.search(text):
+                return pattern
+        return None
+
+    compiled_rate, compiled_hits = rate(lambda m: automod.check(guild_id, m), messages)
+    naive_rate, naive_hits = rate(naive_check, messages)
+    normalize_rate, _ = rate(lambda m: automod.normalize(m) and None, messages)
+
+    print(f"{len(terms)} terms, {len(messages):,} messages ({hit_rate:.0%} with a term)")
+    print(f"{'normalize only':<16}{normalize_rate:>14,.0f} msgs/s")
+    print(f"{'compiled':<16}{compiled_rate:>14,.0f} msgs/s  {compiled_hits:,} hits")
+    print(f"{'re.search loop':<16}{naive_rate:>14,.0f} msgs/s  {naive_hits:,} hits")
+    if compiled_hits != naive_hits:
+        print("MISMATCH: compiled and re.search loop found different hits")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Automod benchmark")
+    parser.add_argument("--terms", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--hit-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(bench(args.terms, args.messages, args.hit_rate, args.seed))
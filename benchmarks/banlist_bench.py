@@ -0,0 +1,156 @@
+# Shared ban list benchmark
+# Runs the real banlist.py sync against a fake Discord (every request takes --latency ms
+# and bulk bans are held to --ban-rate requests a second per server): a server with
+# some bans of its own joins a --size list, then a few more bans get published and
+# synced incrementally. Reports wall time, requests sent and the CPU the diffs take
+# Run from the repo root: python benchmarks/banlist_bench.py
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="easymod-banlist-"), "bench.db")
+
+import banlist  # noqa: E402
+from database import db  # noqa: E402
+
+GUILD_ID = 1 << 40
+SNOWFLAKE = 1 << 50  # Real user ids are around this size
+
+
+class FakeDiscord:
+    def __init__(self, existing: list[int], latency: float, ban_rate: float):
+        self.bans = set(existing)
+        self.latency = latency
+        self.ban_interval = 1 / ban_rate
+        self.next_ban = 0.0
+        self.requests = {"fetch": 0, "bulk_ban": 0, "unban": 0}
+        self.id = GUILD_ID
+        self.user = SimpleNamespace(id=1)
+        self.http = self
+        self.client = self
+
+    def get_guild(self, guild_id):
+        return self
+
+    async def get_guild_bans(self, guild_id, after=None, limit=1000):
+        self.requests["fetch"] += 1
+        await asyncio.sleep(self.latency)
+        ids = sorted(user_id for user_id in self.bans if after is None or user_id > after)
+        return [{"user": {"id": str(user_id)}} for user_id in ids[:limit]]
+
+    async def request(self, route, payload=None, reason=None):
+        # Only the bulk ban endpoint goes through here. Requests queue up behind the rate
+        # limit like the http client would make them
+        self.requests["bulk_ban"] += 1
+        now = time.monotonic()
+        start = max(now, self.next_ban)
+        self.next_ban = start + self.ban_interval
+        await asyncio.sleep(start - now + self.latency)
+        self.bans.update(payload["user_ids"])
+        return {"banned_users": [str(user_id) for user_id in payload["user_ids"]], "failed_users": []}
+
+    async def remove_guild_ban(self, guild_id, user_id, reason=None):
+        self.requests["unban"] += 1
+        await asyncio.sleep(self.latency)
+        self.bans.discard(user_id)
+
+
+async def wait_synced(sub):
+    while sub.full or sub.todo or banlist.is_syncing(GUILD_ID):
+        await asyncio.sleep(0.05)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    listed = rng.sample(range(SNOWFLAKE, SNOWFLAKE + args.size * 20), args.size)
+    # The joining server already banned some people, some of them are on the list too
+    own = rng.sample(listed, args.own // 2) + [SNOWFLAKE * 2 + i for i in range(args.own // 2)]
+    discord = FakeDiscord(own, args.latency / 1000, args.ban_rate)
+
+    await db.start()
+    db.write_many(
+        "INSERT INTO banlist (user_id, guild_id, moderator_id, reason, added_at) VALUES (?, 2, 3, NULL, 0)",
+        [(user_id,) for user_id in listed],
+    )
+    db.write_many(
+        "INSERT INTO banlist_changes (user_id, added) VALUES (?, 1)",
+        [(user_id,) for user_id in listed],
+    )
+    await asyncio.sleep(config.DATABASE_FLUSH_INTERVAL * 4)
+    await banlist.start(discord)
+
+    # Joining
+    start = time.perf_counter()
+    config.BANLIST_GUILDS = {GUILD_ID}
+    banlist.subscribe(GUILD_ID, share=False)
+    sub = banlist.subscriber(GUILD_ID)
+    await wait_synced(sub)
+    joined = time.perf_counter() - start
+    missing = set(listed) - discord.bans
+    print(
+        f"Join: {args.size:,} listed, {args.own:,} already banned here -> "
+        f"{len(discord.bans) - args.own:,} banned in {joined:.1f}s "
+        f"({discord.requests['fetch']} ban list pages, {discord.requests['bulk_ban']} bulk bans, "
+        f"{len(missing)} missed)"
+    )
+
+    # Incremental, a handful of bans from partner servers
+    for counter in discord.requests:
+        discord.requests[counter] = 0
+    new = [SNOWFLAKE * 3 + i for i in range(args.publish)]
+    start = time.perf_counter()
+    for user_id in new:
+        banlist._record(user_id, True)
+    await wait_synced(sub)
+    print(
+        f"Incremental: {args.publish} new bans synced in {time.perf_counter() - start:.2f}s "
+        f"({discord.requests['bulk_ban']} bulk bans, {discord.requests['fetch']} ban list pages)"
+    )
+
+    # Diff CPU, full pass over both lists vs only the changed ids
+    start = time.perf_counter()
+    for _ in range(5):
+        banlist._full_diff(sub)
+    full = (time.perf_counter() - start) / 5
+    start = time.perf_counter()
+    for _ in range(5):
+        banlist._changed_diff(sub, set(new))
+    changed = (time.perf_counter() - start) / 5
+    print(f"Diff CPU: full {full * 1000:.1f}ms, changed ids only {changed * 1000:.3f}ms")
+
+    # What the snapshot costs to keep around
+    tracemalloc.start()
+    snapshot = banlist.IdSet(sorted(discord.bans))
+    array_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    as_set = set(discord.bans)
+    set_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(
+        f"Snapshot of {len(snapshot):,} bans: {array_bytes / 1e6:.1f} MB as a sorted array, "
+        f"{set_bytes / 1e6:.1f} MB as a set"
+    )
+    del as_set
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared ban list benchmark")
+    parser.add_argument("--size", type=int, default=50_000, help="Users on the shared list")
+    parser.add_argument("--own", type=int, default=5_000, help="Bans the joining server already has")
+    parser.add_argument("--publish", type=int, default=20, help="Bans added after joining")
+    parser.add_argument("--latency", type=float, default=80, help="Fake Discord latency in ms")
+    parser.add_argument("--ban-rate", type=float, default=2, help="Bulk ban requests per second")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,152 @@
+# Duration parser benchmark
+# Times parse_duration against the old per-call regex parser, then checks it against
+# random durations written a bunch of different ways (and broken a few ways), exits
+# non-zero if any of them came out wrong
+# Run from the repo root: python benchmarks/duration_bench.py
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from duration import UNITS, _plan, parse_duration  # noqa: E402
+
+SAMPLES = ["10m", "1h30m", "90m", "1.5h", "2 days 4 hours", "PT1H30M", "P1W", "1w2d3h4m5s"]
+
+
+# The old timeout_time_logic parser, kept here for comparison
+def legacy_parse(duration_str: str) -> int | None:
+    regex = re.compile(r"(\d+)\s*([smhdw])")
+    matches = regex.findall(duration_str.lower())
+    if not matches:
+        return None
+    total_seconds = 0
+    for value, unit in matches:
+        value = int(value)
+        if unit == "s":
+            total_seconds += value
+        elif unit == "m":
+            total_seconds += value * 60
+        elif unit == "h":
+            total_seconds += value * 3600
+        elif unit == "d":
+            total_seconds += value * 86400
+        elif unit == "w":
+            total_seconds += value * 604800
+    return total_seconds if total_seconds > 0 else None
+
+
+def best_of(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def bench(number: int):
+    uncached = parse_duration.__wrapped__
+    print(f"{'input':<16}{'cached':>10}{'uncached':>12}{'legacy':>10}")
+    for sample in SAMPLES:
+        cached = best_of(lambda: parse_duration(sample), number)
+        cold = best_of(lambda: uncached(sample), number)
+        old = best_of(lambda: legacy_parse(sample), number)
+        print(f"{sample:<16}{cached * 1e9:>8.0f}ns{cold * 1e9:>10.0f}ns{old * 1e9:>8.0f}ns")
+
+    # A different input every call like in the bot, so nothing comes out of either cache
+    # unless an earlier input had the same shape
+    rng = random.Random(0)
+    texts = []
+    for _ in range(number // 10):
+        units = rng.sample(["w", "d", "h", "m", "s"], rng.randint(1, 3))
+        texts.append(random_spelling(rng, [(rng.randint(1, 500), unit) for unit in units])[0])
+    _plan.cache_clear()
+    fresh = best_of(lambda: [uncached(text) for text in texts], 1) / len(texts)
+    old = best_of(lambda: [legacy_parse(text) for text in texts], 1) / len(texts)
+    print(f"{'random':<16}{'':>10}{fresh * 1e9:>10.0f}ns{old * 1e9:>8.0f}ns")
+
+
+def pathological(number: int):
+    # Inputs that fail right at the end used to backtrack exponentially, these should
+    # all take about as long as any other bad input
+    print(f"{'bad input':<16}{'time':>10}")
+    uncached = parse_duration.__wrapped__
+    for count in (5, 16, 22, 40):
+        text = "1h" * count + "!"
+        took = best_of(lambda: (_plan.cache_clear(), uncached(text)), number)
+        print(f"{'1h*' + str(count) + '+!':<16}{took * 1e6:>8.1f}us")
+
+
+def random_spelling(rng: random.Random, parts: list[tuple[int, str]]) -> tuple[str, str]:
+    # Writes the same duration in one of a few styles, also hands back the separator
+    aliases = {}
+    for alias, seconds in UNITS.items():
+        aliases.setdefault(seconds, []).append(alias)
+    style = rng.choice(("compact", "spaced", "words"))
+    chunks = []
+    for value, unit in parts:
+        alias = rng.choice(aliases[UNITS[unit]])
+        if style == "compact":
+            chunks.append(f"{value}{alias}")
+        else:
+            chunks.append(f"{value} {alias}")
+    sep = {"compact": "", "spaced": " ", "words": rng.choice((", ", " and ", ", and ", " "))}[style]
+    return sep.join(chunks), sep
+
+
+def iso_spelling(parts: list[tuple[int, str]]) -> str:
+    ordered = sorted(parts, key=lambda part: -UNITS[part[1]])  # ISO needs big units first
+    iso = "P" + "".join(f"{v}{u.upper()}" for v, u in ordered if u in "wd")
+    time_part = "".join(f"{v}{u.upper()}" for v, u in ordered if u in "hms")
+    return iso + (f"T{time_part}" if time_part else "")
+
+
+def check(runs: int, seed: int) -> int:
+    # Properties every random duration has to hold, returns how many checks failed
+    rng = random.Random(seed)
+    failures = 0
+
+    def expect(name: str, text: str, expected: int | None):
+        nonlocal failures
+        result = parse_duration.__wrapped__(text)
+        got = result.seconds if result else None
+        if got != expected:
+            failures += 1
+            print(f"FAILED {name}: {text!r} -> {got}, expected {expected}")
+
+    for _ in range(runs):
+        units = rng.sample(["w", "d", "h", "m", "s"], rng.randint(1, 5))
+        parts = [(rng.randint(0, 500), unit) for unit in units]
+        expected = sum(value * UNITS[unit] for value, unit in parts) or None
+        text, sep = random_spelling(rng, parts)
+
+        # Every spelling comes out as the same number of seconds
+        expect("spelling", text, expected)
+        expect("iso", iso_spelling(parts), expected)
+        # Case and surrounding whitespace don't matter
+        expect("case", f"  {text.upper()}\t", expected)
+        # A separator with nothing after it isn't a duration
+        expect("trailing separator", text + rng.choice((",", " ,", ", and", " and", ",  ")), None)
+        # Neither is the same unit twice
+        value, unit = rng.choice(parts)
+        repeated = f"{value}{unit}"
+        expect("repeated unit", f"{text}{sep or ''}{repeated}", None)
+        # Or junk anywhere in it
+        at = rng.randrange(len(text) + 1)
+        expect("junk", text[:at] + rng.choice("!?#;/") + text[at:], None)
+
+    for junk in ("", "soon", "5x", "1h30", "h", "P", "PT", "1h and", "-5m", "P1DT", "1h,", "1h  ,  ", "1h1h", "1h" * 6, "1h" * 22 + "!"):
+        expect("junk", junk, None)
+    print(f"Checked {runs:,} random durations ({runs * 6:,} inputs), {failures} failures")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Duration parser benchmark")
+    parser.add_argument("--number", type=int, default=100_000)
+    parser.add_argument("--check", type=int, default=10_000, help="Random durations to check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    bench(args.number)
+    pathological(args.number // 100)
+    # Non-zero exit if any property failed
+    sys.exit(1 if check(args.check, args.seed) else 0)
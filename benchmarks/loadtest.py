@@ -0,0 +1,289 @@
+# Load test
+# Runs the real command handlers from extensions/ against a local stand-in for Discord, no
+# connection or token needed. The stand-in answers REST calls after a random delay and
+# can hand out 429s (waited out and retried, same as the library does). Interactions
+# are built from real payloads so option parsing, checks, hierarchy, the database and
+# metrics all run like they would live. /wikipedia gets a fake wikipedia with its own
+# delay so the cache and thread pool get exercised too
+# Run from the repo root: python benchmarks/loadtest.py --rate 200 --seconds 20
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+# Before anything opens the database or a port
+_tmp = tempfile.mkdtemp(prefix="easymod-loadtest-")
+config.DATABASE_PATH = os.path.join(_tmp, "loadtest.db")
+config.METRICS_PORT = None
+config.WIKI_OFFLINE_DUMP = config.WIKI_OFFLINE_INDEX = None
+
+import wikipedia  # noqa: E402
+from interactions import SlashContext  # noqa: E402
+from interactions.client.const import GLOBAL_SCOPE  # noqa: E402
+from interactions.api.http.http_client import HTTPClient  # noqa: E402
+from interactions.models.discord.application import Application  # noqa: E402
+from interactions.models.discord.user import ClientUser  # noqa: E402
+
+GUILD_ID = 100000000000000001
+CHANNEL_ID = 100000000000000002
+BOT_ID = 100000000000000003
+OWNER_ID = 100000000000000004
+MOD_ID = 100000000000000005
+TARGET_BASE = 200000000000000000
+BOT_ROLE, MOD_ROLE, MEMBER_ROLE = 300000000000000001, 300000000000000002, 300000000000000003
+TOPICS = [f"Topic {i}" for i in range(500)]
+
+
+class FakeDiscord:
+    # Stands in for HTTPClient.request, answers every route after a random delay
+    def __init__(self, latency: float, jitter: float, rate_limit: float, retry_after: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit  # Chance a request gets a 429 first
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self.responses: dict[str, str] = {}  # Interaction token -> last content sent
+        self.rng = random.Random(0)
+
+    def delay(self) -> float:
+        # Lognormal so there's a tail like real API calls
+        return self.latency * self.rng.lognormvariate(0, self.jitter)
+
+    async def request(self, route, payload=None, files=None, reason=None, params=None, **kwargs):
+        self.requests += 1
+        while self.rng.random() < self.rate_limit:
+            self.rate_limited += 1
+            await asyncio.sleep(self.retry_after)
+        await asyncio.sleep(self.delay())
+
+        if route.method == "GET" and route.path == "/guilds/{guild_id}/members/{user_id}":
+            # Members fall out of the bounded member cache so these do get fetched
+            user_id = int(route.params["user_id"])
+            role_id = {BOT_ID: BOT_ROLE, MOD_ID: MOD_ROLE}.get(user_id, MEMBER_ROLE)
+            return member_data(user_id, role_id)
+
+        token = route.params.get("interaction_token") or route.params.get("webhook_token")
+        if token and isinstance(payload, dict):
+            data = payload.get("data", payload)
+            if isinstance(data, dict) and data.get("content"):
+                self.responses[token] = data["content"]
+        return None
+
+
+def user_data(user_id: int, name: str, bot: bool = False) -> dict:
+    return {"id": str(user_id), "username": name, "discriminator": "0", "avatar": None, "bot": bot}
+
+
+def member_data(user_id: int, role_id: int) -> dict:
+    return {
+        "user": user_data(user_id, f"user{user_id}"),
+        "roles": [str(role_id)],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+    }
+
+
+def setup_cache(bot, targets: int):
+    bot._user = ClientUser.from_dict(
+        user_data(BOT_ID, "EasyMod", bot=True) | {"verified": True, "mfa_enabled": False, "flags": 0},
+        bot,
+    )
+    bot._app = Application.from_dict(
+        {
+            "id": BOT_ID, "name": "EasyMod", "description": "", "summary": "", "icon": None,
+            "bot_public": True, "bot_require_code_grant": False, "flags": 0, "verify_key": "",
+            "owner": user_data(OWNER_ID, "owner"),
+        },
+        bot,
+    )  # fmt: skip
+
+    def role(role_id: int, position: int) -> dict:
+        return {"id": str(role_id), "name": str(role_id), "position": position, "color": 0, "permissions": "0"}
+
+    bot.cache.place_guild_data(
+        {
+            "id": str(GUILD_ID), "name": "Load test", "owner_id": str(OWNER_ID),
+            "roles": [role(GUILD_ID, 0), role(BOT_ROLE, 3), role(MOD_ROLE, 2), role(MEMBER_ROLE, 1)],
+            "members": [], "channels": [], "preferred_locale": "en-US", "member_count": targets + 3,
+        }
+    )  # fmt: skip
+    bot.cache.place_member_data(GUILD_ID, member_data(BOT_ID, BOT_ROLE))
+    bot.cache.place_member_data(GUILD_ID, member_data(MOD_ID, MOD_ROLE))
+    for i in range(targets):
+        bot.cache.place_member_data(GUILD_ID, member_data(TARGET_BASE + i, MEMBER_ROLE))
+
+
+class Workload:
+    # Builds interaction payloads for each command in the mix
+    def __init__(self, bot, targets: int, seed: int):
+        self.rng = random.Random(seed)
+        self.targets = targets
+        self.next_id = 400000000000000000
+        loaded = bot.interactions_by_scope[GLOBAL_SCOPE]
+        self.commands = {
+            "ban": loaded["ban"],
+            "kick": loaded["kick"],
+            "timeout": loaded["timeout add"],
+            "wikipedia": loaded["wikipedia"],
+        }
+        # Some topics get searched way more than others
+        self.topic_weights = [1 / (rank + 1) for rank in range(len(TOPICS))]
+
+    def _target(self) -> tuple[int, dict]:
+        user_id = TARGET_BASE + self.rng.randrange(self.targets)
+        resolved = {
+            "users": {str(user_id): user_data(user_id, f"user{user_id}")},
+            "members": {str(user_id): {"roles": [str(MEMBER_ROLE)], "joined_at": "2024-01-01T00:00:00+00:00"}},
+        }
+        return user_id, resolved
+
+    def payload(self, name: str) -> dict:
+        self.next_id += 1
+        resolved = {}
+        if name == "wikipedia":
+            topic = self.rng.choices(TOPICS, weights=self.topic_weights)[0]
+            options = [{"name": "query", "type": 3, "value": topic}]
+        else:
+            user_id, resolved = self._target()
+            options = [{"name": "user", "type": 6, "value": str(user_id)}]
+            if name == "timeout":
+                options.append({"name": "duration", "type": 3, "value": "10m"})
+                options = [{"name": "add", "type": 1, "options": options}]
+            else:
+                options.append({"name": "reason", "type": 3, "value": "load test"})
+        return {
+            "id": str(self.next_id), "application_id": str(BOT_ID), "type": 2,
+            "token": f"token-{self.next_id}", "locale": "en-US",
+            "guild_id": str(GUILD_ID), "channel_id": str(CHANNEL_ID),
+            "member": member_data(MOD_ID, MOD_ROLE) | {"permissions": "8"},
+            "data": {"id": "1", "name": name, "type": 1, "options": options, "resolved": resolved},
+        }  # fmt: skip
+
+
+def fake_wikipedia(latency: float, jitter: float):
+    rng = random.Random(1)
+
+    def summary(title, sentences=0, auto_suggest=True, **kwargs):
+        # Runs on the wiki thread pool like the real one
+        time.sleep(latency * rng.lognormvariate(0, jitter))
+        return f"{title} is a made up page for load testing. " * sentences
+
+    wikipedia.summary = summary
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(args):
+    discord = FakeDiscord(args.latency / 1000, args.jitter, args.rate_limit, args.retry_after / 1000)
+
+    # Patch the class before main.py builds its client so metrics wraps the stand-in
+    async def request(_http, route, *rest, **kwargs):
+        return await discord.request(route, *rest, **kwargs)
+
+    HTTPClient.request = request
+    fake_wikipedia(args.wiki_latency / 1000, args.jitter)
+
+    import main  # noqa: E402
+
+    setup_cache(main.bot, args.targets)
+    # Every command comes from the same mod so the rate limits would turn most away
+    if not args.ratelimits:
+        config.RATELIMITS = {}
+    main.load_commands("all")
+    await main.start_services()
+
+    mix = dict(part.split("=") for part in args.mix.split(","))
+    names = list(mix)
+    weights = [float(mix[name]) for name in names]
+    workload = Workload(main.bot, args.targets, args.seed)
+    latencies: dict[str, list[float]] = {name: [] for name in names}
+    failures: dict[str, int] = {name: 0 for name in names}
+    crashes: list[str] = []
+
+    async def one(name: str):
+        payload = workload.payload(name)
+        start = time.perf_counter()
+        try:
+            ctx = SlashContext.from_dict(main.bot, payload)
+            await main.bot._run_slash_command(workload.commands[name], ctx)
+        except Exception as e:
+            crashes.append(f"{name} raised {type(e).__name__}: {e}")
+            return
+        latencies[name].append(time.perf_counter() - start)
+        if discord.responses.get(payload["token"], "").startswith("❌"):
+            failures[name] += 1
+
+    # Open loop: commands arrive on schedule no matter how slow the last ones were
+    rng = random.Random(args.seed)
+    tasks = []
+    # The handlers print a line per command, hide that unless asked
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        start = time.perf_counter()
+        due = start
+        while due - start < args.seconds:
+            due += rng.expovariate(args.rate)
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            tasks.append(asyncio.create_task(one(rng.choices(names, weights)[0])))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    everything = [value for values in latencies.values() for value in values]
+    print(
+        f"{len(tasks):,} commands in {elapsed:.1f}s ({len(everything) / elapsed:,.1f} commands/s), "
+        f"{discord.requests:,} Discord requests, {discord.rate_limited:,} rate limited"
+    )
+    print(f"{'command':<12}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'failed':>8}")
+    for name in names + ["all"]:
+        values = everything if name == "all" else latencies[name]
+        failed = sum(failures.values()) if name == "all" else failures[name]
+        print(
+            f"{name:<12}{len(values):>8}"
+            + "".join(f"{percentile(values, q) * 1000:>8.1f}ms" for q in (0.5, 0.95, 0.99))
+            + f"{failed:>8}"
+        )
+    print("Average time per phase (from metrics.py):")
+    for command, phases in sorted(main.metrics.summary().items()):
+        split = ", ".join(
+            f"{phase} {histogram.sum / histogram.count * 1000:.1f}ms"
+            for phase, histogram in sorted(phases.items())
+            if histogram.count
+        )
+        print(f"  /{command}: {split}")
+    for crash in crashes[:10]:
+        print(crash)
+    if crashes:
+        print(f"{len(crashes)} commands raised instead of answering")
+    main.db.close()
+    return 1 if crashes else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for the command handlers")
+    parser.add_argument("--rate", type=float, default=100, help="Commands per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--mix", default="ban=1,kick=1,timeout=2,wikipedia=4", help="Command weights")
+    parser.add_argument("--latency", type=float, default=80, help="Median Discord API latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Lognormal sigma for latencies")
+    parser.add_argument("--rate-limit", type=float, default=0.01, help="Chance of a 429 per request")
+    parser.add_argument("--retry-after", type=float, default=500, help="429 retry_after in ms")
+    parser.add_argument("--wiki-latency", type=float, default=300, help="Median wikipedia latency in ms")
+    parser.add_argument("--targets", type=int, default=5000, help="Members in the fake server")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ratelimits", action="store_true", help="Keep the command rate limits on")
+    parser.add_argument("--verbose", action="store_true", help="Show the handlers' own output")
+    sys.exit(asyncio.run(run(parser.parse_args())))
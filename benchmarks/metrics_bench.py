@@ -0,0 +1,73 @@
+# Metrics overhead benchmark
+# Runs a do-nothing command (and one that makes a few fake Discord requests) with and
+# without metrics.instrument() and reports how much time the instrumentation adds
+# Run from the repo root: python benchmarks/metrics_bench.py
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+
+
+class FakeRoute:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+
+
+class FakeHTTP:
+    async def request(self, route, *args, **kwargs):
+        return None
+
+
+class FakeBot:
+    def __init__(self):
+        self.http = FakeHTTP()
+
+    async def _run_slash_command(self, command, ctx):
+        for route in ctx:
+            await self.http.request(route)
+
+
+class FakeCommand:
+    resolved_name = "bench"
+
+
+ROUTES = [
+    FakeRoute("POST", "/interactions/{interaction_id}/{interaction_token}/callback"),
+    FakeRoute("GET", "/guilds/{guild_id}/members/{user_id}"),
+    FakeRoute("PUT", "/guilds/{guild_id}/bans/{user_id}"),
+]
+
+
+async def per_call(bot, routes, number: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(number):
+            await bot._run_slash_command(FakeCommand, routes)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+async def bench(number: int):
+    for label, routes in (("no requests", []), ("3 requests", ROUTES)):
+        plain = await per_call(FakeBot(), routes, number)
+        timed_bot = FakeBot()
+        metrics.instrument(timed_bot)
+        timed = await per_call(timed_bot, routes, number)
+        print(
+            f"{label:<12} plain {plain * 1e6:.2f}us, instrumented {timed * 1e6:.2f}us, "
+            f"overhead {(timed - plain) * 1e6:.2f}us per command"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metrics overhead benchmark")
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(bench(args.number))
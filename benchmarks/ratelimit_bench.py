@@ -0,0 +1,79 @@
+# Rate limit benchmark
+# Throws simulated command traffic at one limiter (lots of normal users plus a few
+# abusers hammering it) and reports the cost per check, how much got turned away and
+# how many buckets are being kept around
+# Run from the repo root: python benchmarks/ratelimit_bench.py
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ratelimit  # noqa: E402
+
+
+def simulate(users: int, guilds: int, rate: float, seconds: float, abusers: int, seed: int):
+    # Yields (time, user id, guild id), abusers send 20 commands a second the whole time
+    rng = random.Random(seed)
+    now = 0.0
+    while now < seconds:
+        now += rng.expovariate(rate)
+        yield now, rng.randrange(users), rng.randrange(guilds)
+        if rng.random() < abusers * 20 / rate:
+            yield now, users + rng.randrange(abusers), 0
+
+
+def replay(events, limits):
+    limiter = ratelimit.Limiter("bench", limits)
+    allowed = rejected = replies = 0
+    for now, user, guild in events:
+        result = limiter.check(user, guild, now)
+        if result is None:
+            allowed += 1
+        else:
+            rejected += 1
+            replies += result[1]
+    return limiter, allowed, rejected, replies
+
+
+def bench(args):
+    limits = {"user": (args.uses, args.per), "guild": (args.guild_uses, args.per)}
+    events = list(simulate(args.users, args.guilds, args.rate, args.seconds, args.abusers, args.seed))
+
+    start = time.perf_counter()
+    limiter, allowed, rejected, replies = replay(events, limits)
+    elapsed = time.perf_counter() - start
+
+    # Again with tracemalloc on (it slows everything down so it's not in the timing)
+    tracemalloc.start()
+    replay(events, limits)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{len(events):,} commands over {args.seconds:,.0f}s from {args.users:,} users in "
+        f"{args.guilds:,} servers plus {args.abusers} abusers"
+    )
+    print(f"CPU: {elapsed / len(events) * 1e9:.0f}ns per check ({len(events) / elapsed:,.0f} checks/s)")
+    print(f"Allowed {allowed:,}, rejected {rejected:,} (only {replies:,} of those got a reply)")
+    print(
+        f"Buckets at the end: {sum(len(bucket) for _, bucket in limiter.buckets):,}, "
+        f"{peak / 1e6:.1f} MB peak traced"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate limit benchmark")
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--guilds", type=int, default=5_000)
+    parser.add_argument("--rate", type=float, default=500, help="Commands per second")
+    parser.add_argument("--seconds", type=float, default=600, help="Simulated time")
+    parser.add_argument("--abusers", type=int, default=10)
+    parser.add_argument("--uses", type=int, default=3, help="Uses per user per --per seconds")
+    parser.add_argument("--guild-uses", type=int, default=30, help="Uses per server per --per seconds")
+    parser.add_argument("--per", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    bench(parser.parse_args())
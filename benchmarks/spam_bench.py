@@ -0,0 +1,95 @@
+# Spam detection benchmark
+# Replays simulated chat from a big server (a few very active members and a long tail
+# of people who post once in a while) plus a handful of spammers through the tracker
+# and reports CPU per message, memory and whether the spammers got caught
+# Run from the repo root: python benchmarks/spam_bench.py
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spam  # noqa: E402
+
+
+def simulate(
+    members: int, rate: float, seconds: float, spammers: int, skew: float, seed: int
+):
+    # Yields (time, user id, content) in time order
+    rng = random.Random(seed)
+    phrases = [f"message number {i}" for i in range(50_000)]
+    # Zipf-ish activity, user 0 talks the most
+    weights = [1 / (rank + 1) ** skew for rank in range(members)]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    spam_start = seconds / 2
+
+    now = 0.0
+    while now < seconds:
+        now += rng.expovariate(rate)
+        user = rng.choices(range(members), cum_weights=cumulative)[0]
+        yield now, user, rng.choice(phrases)
+        # Spammers show up halfway through and send 10 messages a second
+        if spam_start <= now < spam_start + 3 and rng.random() < spammers * 10 / rate:
+            yield now, members + rng.randrange(spammers), "FREE NITRO click here"
+
+
+def replay(events, members: int):
+    tracker = spam.SpamTracker()
+    caught = {spam.FLOOD: set(), spam.DUPLICATE: set()}
+    # Regular members really can send 5 messages in 5 seconds, repeating themselves
+    # shouldn't happen though (phrases are picked from 50k), those would be false alarms
+    flagged = {spam.FLOOD: set(), spam.DUPLICATE: set()}
+    for now, user, content in events:
+        problem = tracker.check(1, user, content, now)
+        if problem is not None:
+            if user >= members:
+                caught[problem].add(user)
+            else:
+                flagged[problem].add(user)
+    return tracker, caught, flagged
+
+
+def bench(members: int, rate: float, seconds: float, spammers: int, skew: float, seed: int):
+    events = list(simulate(members, rate, seconds, spammers, skew, seed))
+
+    start = time.perf_counter()
+    tracker, caught, flagged = replay(events, members)
+    elapsed = time.perf_counter() - start
+
+    # Again with tracemalloc on (it slows everything down so it's not in the timing)
+    tracemalloc.start()
+    replay(events, members)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{members:,} members, {rate:,.0f} msgs/s for {seconds:,.0f}s "
+        f"({len(events):,} messages, {spammers} spammers)"
+    )
+    print(f"CPU: {elapsed / len(events) * 1e6:.2f}us per message ({len(events) / elapsed:,.0f} msgs/s)")
+    print(f"Tracked users at the end: {len(tracker):,}")
+    print(f"Memory: ~{tracker.memory() / 1e6:.1f} MB estimated, {peak / 1e6:.1f} MB peak traced")
+    print(
+        f"Spammers caught: {len(caught[spam.FLOOD])} flooding, {len(caught[spam.DUPLICATE])} "
+        f"duplicating. Regular members flagged: {len(flagged[spam.FLOOD])} for flooding, "
+        f"{len(flagged[spam.DUPLICATE])} for duplicates"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spam detection benchmark")
+    parser.add_argument("--members", type=int, default=100_000)
+    parser.add_argument("--rate", type=float, default=100, help="Messages per second")
+    parser.add_argument("--seconds", type=float, default=600, help="Simulated time")
+    parser.add_argument("--spammers", type=int, default=20)
+    parser.add_argument("--skew", type=float, default=0.5, help="Higher means a few people do most of the talking")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    bench(args.members, args.rate, args.seconds, args.spammers, args.skew, args.seed)
@@ -0,0 +1,139 @@
+# Startup benchmark
+# Starts EasyMod in fresh processes and times each part of a cold start: importing
+# main.py, loading the command extensions, syncing slash commands (against a fake
+# Discord that answers after --latency ms, with and without a saved command hash) and
+# the on_startup work (database, scheduler, automod). Logging in and the gateway
+# aren't included since those depend on Discord, not us
+# Run from the repo root: python benchmarks/startup_bench.py
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ("import", "load", "sync", "services", "ready")
+
+
+def child(command_set: str, latency: float, sync_cache: str):
+    # Runs in its own process so every import is cold
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import config
+
+    tmp = tempfile.mkdtemp(prefix="easymod-startup-")
+    config.DATABASE_PATH = os.path.join(tmp, "startup.db")
+    config.METRICS_PORT = None
+    config.COMMAND_SYNC_CACHE = sync_cache
+
+    import asyncio
+
+    from interactions.api.http.http_client import HTTPClient
+    from interactions.models.discord.application import Application
+
+    async def request(_http, route, payload=None, *args, **kwargs):
+        await asyncio.sleep(latency)
+        if route.method == "PUT":
+            # Command overwrite, Discord echoes the commands back with ids
+            return [dict(command, id=str(i + 1)) for i, command in enumerate(payload)]
+        return []
+
+    HTTPClient.request = request
+
+    import main
+
+    imported = time.perf_counter()
+    main.load_commands(command_set)
+    loaded = time.perf_counter()
+
+    async def go():
+        owner = {"id": "2", "username": "owner", "discriminator": "0", "avatar": None}
+        main.bot._app = Application.from_dict(
+            {
+                "id": 1, "name": "EasyMod", "description": "", "summary": "", "icon": None,
+                "bot_public": True, "bot_require_code_grant": False, "flags": 0,
+                "verify_key": "", "owner": owner,
+            },
+            main.bot,
+        )  # fmt: skip
+        await main.bot._init_interactions()
+        synced = time.perf_counter()
+        await main.start_services()
+        return synced
+
+    synced = asyncio.run(go())
+    ready = time.perf_counter()
+    main.db.close()
+    timings = {
+        "import": imported - start,
+        "load": loaded - imported,
+        "sync": synced - loaded,
+        "services": ready - synced,
+        "ready": ready - start,
+        "wikipedia_imported": "wikipedia" in sys.modules,
+    }
+    print("TIMINGS " + json.dumps(timings))
+
+
+def run_child(command_set: str, latency: float, sync_cache: str) -> dict:
+    result = subprocess.run(
+        [
+            sys.executable, __file__, "--child", command_set,
+            "--latency", str(latency * 1000), "--sync-cache", sync_cache,
+        ],
+        capture_output=True, text=True, cwd=ROOT,
+    )  # fmt: skip
+    for line in result.stdout.splitlines():
+        if line.startswith("TIMINGS "):
+            return json.loads(line[len("TIMINGS "):])
+    raise RuntimeError(f"Startup run failed:\n{result.stdout}\n{result.stderr}")
+
+
+def bench(runs: int, latency: float):
+    print(f"Median of {runs} cold starts, fake Discord latency {latency * 1000:.0f}ms")
+    print(f"{'':<32}" + "".join(f"{phase:>10}" for phase in PHASES) + "  wikipedia imported")
+    for command_set in ("all", "moderation"):
+        for warm in (False, True):
+            samples = []
+            for _ in range(runs):
+                sync_cache = os.path.join(tempfile.mkdtemp(), "command_sync.json")
+                if warm:
+                    # First start saves the command hashes, the timed one reuses them
+                    run_child(command_set, latency, sync_cache)
+                samples.append(run_child(command_set, latency, sync_cache))
+            label = f"{command_set}, {'commands unchanged' if warm else 'first sync'}"
+            print(
+                f"{label:<32}"
+                + "".join(
+                    f"{statistics.median(s[phase] for s in samples) * 1000:>8.0f}ms"
+                    for phase in PHASES
+                )
+                + f"  {'yes' if samples[0]['wikipedia_imported'] else 'no'}"
+            )
+
+    # What importing wikipedia up front would cost on top of that
+    code = (
+        f"import sys, time; sys.path.insert(0, {ROOT!r}); import main; "
+        "t = time.perf_counter(); import wikipedia; print(time.perf_counter() - t)"
+    )
+    eager = [
+        float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout)
+        for _ in range(runs)
+    ]
+    print(f"Importing wikipedia at startup would add {statistics.median(eager) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Starts per row (median is shown)")
+    parser.add_argument("--latency", type=float, default=80, help="Fake Discord latency in ms")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--sync-cache", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.latency / 1000, args.sync_cache)
+    else:
+        bench(args.runs, args.latency / 1000)
@@ -0,0 +1,94 @@
+# Warm restart benchmark
+# Fills the cooldowns, lockdowns and wikipedia cache like a busy bot would have them,
+# saves a snapshot the way shutting down does and loads it back the way the next start
+# does. Reports the file size and how long both sides take
+# Run from the repo root: python benchmarks/warm_start_bench.py
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+config.WARM_START_PATH = os.path.join(tempfile.mkdtemp(prefix="easymod-warm-"), "warm_start.bin")
+
+import antiraid  # noqa: E402
+import ratelimit  # noqa: E402
+import warm_start  # noqa: E402
+import wiki  # noqa: E402
+
+SNOWFLAKE = 1 << 50
+
+
+class FakeBot:
+    def get_guild(self, guild_id):
+        return object()
+
+
+def fill(args, rng: random.Random):
+    for command, limits in config.RATELIMITS.items():
+        ratelimit.limiters[command] = ratelimit.Limiter(command, limits)
+    commands = list(ratelimit.limiters.values())
+    for _ in range(args.users):
+        rng.choice(commands).check(SNOWFLAKE + rng.randrange(10**9), SNOWFLAKE + rng.randrange(args.guilds))
+    for i in range(args.lockdowns):
+        antiraid.start_lockdown(SNOWFLAKE + i, 300)
+        antiraid._guilds[SNOWFLAKE + i].pending.update(SNOWFLAKE + rng.randrange(10**9) for _ in range(200))
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(3000)]
+    for i in range(config.WIKI_CACHE_SIZE):
+        summary = " ".join(rng.choices(words, k=rng.randint(60, 300)))
+        wiki.summary_cache.put(f"3:title {i}", summary)
+
+
+def reset():
+    for limiter in ratelimit.limiters.values():
+        for _, bucket in limiter.buckets:
+            bucket._full_at.clear()
+    antiraid._guilds.clear()
+    wiki.summary_cache._entries.clear()
+
+
+async def restore() -> float:
+    start = time.perf_counter()
+    await warm_start.load(FakeBot())
+    # wiki is already imported here so it gets its summaries straight away
+    return time.perf_counter() - start
+
+
+def bench(args):
+    rng = random.Random(args.seed)
+    fill(args, rng)
+    cooldowns = ratelimit.tracked_total()
+    warm_start._loaded = True
+
+    start = time.perf_counter()
+    warm_start.save()
+    saved = time.perf_counter() - start
+    size = os.path.getsize(config.WARM_START_PATH)
+    print(
+        f"Saved {cooldowns:,} cooldowns, {args.lockdowns} lockdowns and "
+        f"{len(wiki.summary_cache._entries)} summaries: {size / 1e6:.2f} MB in {saved * 1000:.0f}ms"
+    )
+
+    reset()
+    loaded = asyncio.run(restore())
+    print(
+        f"Loaded in {loaded * 1000:.0f}ms: {ratelimit.tracked_total():,} cooldowns, "
+        f"{sum(1 for guild in range(args.lockdowns) if antiraid.lockdown_remaining(SNOWFLAKE + guild))} "
+        f"lockdowns, {len(wiki.summary_cache._entries)} summaries"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm restart benchmark")
+    parser.add_argument("--users", type=int, default=100_000, help="Command uses still cooling down")
+    parser.add_argument("--guilds", type=int, default=5_000)
+    parser.add_argument("--lockdowns", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    bench(parser.parse_args())
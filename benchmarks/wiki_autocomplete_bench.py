@@ -0,0 +1,84 @@
+# /wikipedia autocomplete benchmark
+# Fills the title index with --titles made up titles (popularity follows a Zipf curve
+# like real searches do), then types random titles one character at a time the way
+# Discord sends autocomplete requests and times each lookup
+# Run from the repo root: python benchmarks/wiki_autocomplete_bench.py
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+import wiki_titles  # noqa: E402
+
+
+def make_titles(count: int, rng: random.Random) -> list[str]:
+    words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))).capitalize()
+        for _ in range(5000)
+    ]
+    titles = set()
+    while len(titles) < count:
+        title = " ".join(rng.choices(words, k=rng.randint(1, 4)))
+        if rng.random() < 0.2:
+            title += f" ({rng.choice(words).lower()})"  # Like "Mercury (planet)"
+        titles.add(title)
+    return list(titles)
+
+
+def bench(args):
+    rng = random.Random(args.seed)
+    config.WIKI_TITLES_MAX = args.titles
+    titles = make_titles(args.titles, rng)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    wiki_titles.learn(titles)
+    built = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # A few titles get most of the searches
+    for rank, title in enumerate(rng.sample(titles, min(len(titles), 5000)), 1):
+        wiki_titles._hits[wiki_titles.normalize_title(title)] = int(10000 / rank)
+
+    times = []
+    empty = 0
+    for _ in range(args.queries):
+        title = rng.choice(titles)
+        # Every keystroke is its own autocomplete request
+        for end in range(1, min(len(title), 20) + 1):
+            start = time.perf_counter()
+            found = wiki_titles.complete(title[:end])
+            times.append(time.perf_counter() - start)
+            empty += not found
+
+    times.sort()
+    print(
+        f"{args.titles:,} titles indexed in {built * 1000:.0f}ms, "
+        f"{memory / 1e6:.1f} MB (keys, titles and hit counts)"
+    )
+    print(
+        f"{len(times):,} lookups: p50 {statistics.median(times) * 1e6:.1f}us, "
+        f"p99 {times[int(len(times) * 0.99)] * 1e6:.1f}us, max {times[-1] * 1e6:.1f}us "
+        f"({empty} came back empty)"
+    )
+
+    # Adding one title after the index is built (a search that just worked)
+    start = time.perf_counter()
+    for i in range(1000):
+        wiki_titles.found(f"Benchmark title {i}")
+    print(f"Adding a title: {(time.perf_counter() - start) / 1000 * 1e6:.1f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wikipedia autocomplete benchmark")
+    parser.add_argument("--titles", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=2_000, help="Titles typed out")
+    parser.add_argument("--seed", type=int, default=0)
+    bench(parser.parse_args())
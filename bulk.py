@@ -0,0 +1,156 @@
+# Bulk moderation
+# Runs one action on lots of users at once for dealing with raids. Work runs concurrently
+# under a small cap, interactions' http client still queues everything per Discord's
+# per-route rate limits (and retries 429s) so we never go over them
+import asyncio
+import re
+from typing import Awaitable, Callable
+
+from interactions import BulkBanResponse, Guild, Member, errors
+from interactions.api.http.route import Route
+
+import config
+import log
+from scheduler import scheduler
+
+USER_ID = re.compile(r"\d{17,20}")  # Raw ids and <@mentions> both work
+BAN_CHUNK = 200  # Max users per bulk ban request
+
+Progress = Callable[[int, int], Awaitable[None]]
+
+
+def parse_user_ids(text: str) -> list[int]:
+    # Keeps the order they were pasted in and drops duplicates
+    return list(dict.fromkeys(int(m) for m in USER_ID.findall(text)))
+
+
+def describe_error(e: Exception) -> str:
+    if isinstance(e, errors.Forbidden):
+        return "permission denied"
+    if isinstance(e, errors.NotFound):
+        return "not found"
+    if isinstance(e, errors.HTTPException):
+        return f"Discord API error {e.status}"
+    return str(e) or type(e).__name__
+
+
+class BulkResult:
+    __slots__ = ("succeeded", "failed")
+
+    def __init__(self):
+        self.succeeded: list[int] = []
+        self.failed: dict[int, str] = {}  # user id -> why
+
+
+async def _report_progress(progress: Progress, done: list[int], total: int):
+    # Ticks until cancelled, keeps edits off the workers and under Discord's edit limits
+    while True:
+        await asyncio.sleep(config.BULK_PROGRESS_INTERVAL)
+        try:
+            await progress(done[0], total)
+        except Exception as e:
+            log.warning("bulk_progress_failed", error=str(e))
+
+
+async def _run_jobs(jobs: list, worker, total: int, progress: Progress | None):
+    slots = asyncio.Semaphore(config.BULK_CONCURRENCY)
+    done = [0]
+
+    async def run_one(job):
+        async with slots:
+            done[0] += await worker(job)
+
+    ticker = (
+        asyncio.create_task(_report_progress(progress, done, total)) if progress else None
+    )
+    try:
+        await asyncio.gather(*(run_one(job) for job in jobs))
+    finally:
+        if ticker:
+            ticker.cancel()
+
+
+async def run(
+    user_ids: list[int],
+    action: Callable[[int], Awaitable[None]],
+    progress: Progress | None = None,
+) -> BulkResult:
+    # Calls action(user_id) for every user, concurrently
+    result = BulkResult()
+
+    async def worker(user_id: int) -> int:
+        try:
+            await action(user_id)
+            result.succeeded.append(user_id)
+        except Exception as e:
+            result.failed[user_id] = describe_error(e)
+        return 1
+
+    await _run_jobs(user_ids, worker, len(user_ids), progress)
+    return result
+
+
+async def _bulk_ban(
+    guild: Guild, user_ids: list[int], delete_message_seconds: int, reason: str
+) -> BulkBanResponse:
+    # guild.bulk_ban() sends delete_message_seconds as delete_message_days (interactions
+    # 5.16) so Discord ignores it, this is the same request with the right field.
+    # The endpoint needs MANAGE_GUILD on top of BAN_MEMBERS
+    client = guild.client
+    response = await client.http.request(
+        Route("POST", "/guilds/{guild_id}/bulk-ban", guild_id=guild.id),
+        payload={"user_ids": user_ids, "delete_message_seconds": delete_message_seconds},
+        reason=reason,
+    )
+    return BulkBanResponse.from_dict(response, client)
+
+
+async def ban_many(
+    guild: Guild,
+    user_ids: list[int],
+    reason: str,
+    delete_message_seconds: int = 0,
+    progress: Progress | None = None,
+) -> BulkResult:
+    # Uses the bulk ban endpoint, one request per 200 users instead of one each
+    result = BulkResult()
+    chunks = [user_ids[i : i + BAN_CHUNK] for i in range(0, len(user_ids), BAN_CHUNK)]
+
+    async def worker(chunk: list[int]) -> int:
+        try:
+            response = await _bulk_ban(guild, chunk, delete_message_seconds, reason)
+        except Exception as e:
+            why = describe_error(e)
+            result.failed.update(dict.fromkeys(chunk, why))
+            return len(chunk)
+        failed = {int(user_id) for user_id in response.failed_user_ids}
+        for user_id in chunk:
+            if user_id in failed:
+                result.failed[user_id] = "Discord refused the ban"
+            else:
+                result.succeeded.append(user_id)
+                # Same as a permanent /ban, any temp ban they already had is replaced
+                scheduler.cancel(guild.id, user_id, "unban")
+        return len(chunk)
+
+    await _run_jobs(chunks, worker, len(user_ids), progress)
+    return result
+
+
+async def fetch_members(guild: Guild, user_ids: list[int]) -> dict[int, Member | None]:
+    # Cached members come straight back, the rest get fetched concurrently
+    # None means they aren't in the server, ids we couldn't look up are left out
+    members: dict[int, Member | None] = {}
+    missing = []
+    for user_id in user_ids:
+        member = guild.get_member(user_id)
+        if member is None:
+            missing.append(user_id)
+        else:
+            members[user_id] = member
+
+    async def fetch(user_id: int):
+        members[user_id] = await guild.fetch_member(user_id)
+
+    await run(missing, fetch)
+    return members
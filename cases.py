@@ -0,0 +1,81 @@
+# Moderation cases
+# Every ban, kick and timeout gets recorded so there's a history that survives restarts
+import time
+
+from database import db
+
+db.add_schema(
+    """
+    CREATE TABLE IF NOT EXISTS cases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        target_id INTEGER NOT NULL,
+        moderator_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        reason TEXT,
+        duration INTEGER,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS cases_guild ON cases (guild_id, id);
+    CREATE INDEX IF NOT EXISTS cases_target ON cases (guild_id, target_id, id);
+    CREATE INDEX IF NOT EXISTS cases_moderator ON cases (guild_id, moderator_id, id);
+    """
+)
+
+_INSERT = (
+    "INSERT INTO cases (guild_id, target_id, moderator_id, action, reason, duration, created_at)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def log_case(
+    guild_id: int,
+    target_id: int,
+    moderator_id: int,
+    action: str,
+    reason: str | None = None,
+    duration: int | None = None,  # Seconds, for timeouts
+):
+    db.write(
+        _INSERT,
+        (
+            int(guild_id),
+            int(target_id),
+            int(moderator_id),
+            action,
+            reason,
+            duration,
+            time.time(),
+        ),
+    )
+
+
+def log_cases(
+    guild_id: int,
+    target_ids: list[int],
+    moderator_id: int,
+    action: str,
+    reason: str | None = None,
+):
+    # One case per target, written as a single batch entry (like the shared ban list
+    # banning thousands of people at once)
+    now = time.time()
+    db.write_many(
+        _INSERT,
+        [
+            (int(guild_id), int(target_id), int(moderator_id), action, reason, None, now)
+            for target_id in target_ids
+        ],
+    )
+
+
+async def user_cases(
+    guild_id: int, target_id: int, before: int | None = None, limit: int = 10
+) -> list[tuple]:
+    # Newest first, pass the last case id you got as before= for the next page
+    # (keyset pagination, stays fast no matter how deep you page)
+    return await db.read(
+        "SELECT id, moderator_id, action, reason, duration, created_at FROM cases"
+        " WHERE guild_id = ? AND target_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+        (int(guild_id), int(target_id), before or 2**63 - 1, limit),
+    )
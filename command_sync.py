@@ -0,0 +1,94 @@
+# Command sync
+# The library pushes every slash command to Discord on each start. Instead we hash the
+# command definitions for each scope (global and any guild only commands) and keep the
+# hashes in a small local file. Scopes whose hash matches what we pushed last time are
+# left alone, so a normal restart just looks up the command ids and moves on
+import hashlib
+import json
+import os
+import time
+
+from interactions import Client
+from interactions.models.internal.application_commands import application_commands_to_dict
+
+import config
+import log
+
+
+def definition_hashes(bot: Client) -> dict[str, str]:
+    # scope -> hash of everything Discord gets told about that scope's commands
+    commands = application_commands_to_dict(bot.interactions_by_scope, bot)
+    return {
+        str(scope): hashlib.sha256(
+            json.dumps(definitions, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        for scope, definitions in commands.items()
+    }
+
+
+def load(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        log.warning("command_sync_cache_unreadable", error=str(e))
+        return {}
+
+
+def save(path: str, data: dict):
+    # Written to a temp file first so a crash can't leave half a file behind
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def changed_scopes(saved: dict, hashes: dict[str, str], app_id: str) -> list[str]:
+    # Scopes that need pushing, including ones that lost all their commands
+    if saved.get("application_id") != app_id:
+        return sorted(hashes)  # Different bot, what we pushed before doesn't count
+    old = saved.get("scopes", {})
+    return sorted(scope for scope in set(hashes) | set(old) if hashes.get(scope) != old.get(scope))
+
+
+def install(bot: Client):
+    # Replaces the client's startup sync, call once before start
+    init_interactions = bot._init_interactions
+
+    async def init_if_changed():
+        path = config.COMMAND_SYNC_CACHE
+        if not path or not bot.sync_interactions:
+            return await init_interactions()
+
+        start = time.perf_counter()
+        app_id = str(bot.app.id)
+        saved = load(path)
+        hashes = definition_hashes(bot)
+        changed = changed_scopes(saved, hashes, app_id)
+        try:
+            if changed:
+                await bot.synchronise_interactions(scopes=[int(scope) for scope in changed])
+            else:
+                # Still need the command ids, that's one request per scope
+                await bot._cache_interactions(warn_missing=False)
+        except Exception as e:
+            # Don't remember hashes for a sync that didn't go through
+            log.error("command_sync_failed", exc=e)
+            return
+        took = time.perf_counter() - start
+
+        if changed:
+            log.info("commands_synced", scopes=len(changed), seconds=round(took, 3))
+            save(path, {"application_id": app_id, "scopes": hashes, "sync_seconds": took})
+        else:
+            last = saved.get("sync_seconds", 0.0)
+            log.info(
+                "commands_unchanged",
+                scopes=len(hashes),
+                seconds=round(took, 3),
+                saved_seconds=round(max(0.0, last - took), 3),
+            )
+
+    bot._init_interactions = init_if_changed
@@ -0,0 +1,153 @@
+# EasyMod settings
+# Change these to tune the bot for your server, no code changes needed
+
+# /wikipedia
+WIKI_WORKERS = 4  # Threads used for wikipedia lookups
+WIKI_MAX_CONCURRENT = 8  # Max lookups in flight at once, extra searches get turned away
+WIKI_TIMEOUT = 10  # Seconds before we stop waiting on wikipedia
+WIKI_CACHE_SIZE = 512  # Max summaries kept in memory
+WIKI_CACHE_TTL = 3600  # Seconds a found summary stays cached
+WIKI_CACHE_MISS_TTL = 300  # Seconds a "not found"/"be more specific" result stays cached
+WIKI_SENTENCES = 3  # Sentences per summary, servers can change it with /settings
+WIKI_MAX_CHARS = 1990  # Longest summary we send (Discord's limit is 2000)
+# Autocomplete for /wikipedia, suggests titles that worked before or came up as options
+WIKI_TITLES_MAX = 50000  # Max titles kept for suggestions, least searched get dropped
+WIKI_AUTOCOMPLETE_SEARCH = True  # Ask wikipedia in the background when we don't know many titles for what's typed
+WIKI_AUTOCOMPLETE_MIN_CHARS = 3  # Shortest input worth asking wikipedia about
+WIKI_AUTOCOMPLETE_MAX_SEARCHES = 2  # Background searches running at once, extra ones are skipped
+# Offline wikipedia, build the index with: python wiki_offline.py build <dump.xml> <index file>
+WIKI_OFFLINE_DUMP = None  # Path to an abstracts dump like enwiki-latest-abstract.xml
+WIKI_OFFLINE_INDEX = None  # Path to the index built from that dump
+WIKI_OFFLINE_ONLY = False  # Never reach out to wikipedia, titles missing from the dump just aren't found
+
+# Bulk moderation (/massban, /masskick, /masstimeout)
+BULK_MAX_USERS = 500  # Max users per bulk command
+BULK_CONCURRENCY = 5  # Requests in flight at once, the lib still queues per Discord's rate limits
+BULK_PROGRESS_INTERVAL = 2  # Seconds between progress updates
+
+# Scheduled actions (temp bans running out)
+SCHEDULER_RETRY_DELAY = 60  # Seconds before a failed scheduled action (like an unban) gets tried again, doubles every time
+SCHEDULER_MAX_RETRY_DELAY = 3600  # Longest wait between tries
+SCHEDULER_MAX_ATTEMPTS = 12  # Tries before giving up on it
+
+# Shared ban list (/banlist), for running EasyMod across a network of partner servers
+# Only servers listed here can use it, anyone can add the bot so it's off until you fill these in
+BANLIST_GUILDS = set()  # Server ids allowed to /banlist join and get the list's bans
+BANLIST_SHARE_GUILDS = set()  # Server ids trusted to put their /bans on the list (should also be in BANLIST_GUILDS)
+# Needs ban events (GATEWAY_PROFILE "moderation" or "full") to keep each server's snapshot fresh
+BANLIST_SYNC_INTERVAL = 30  # Seconds between checks for bans added from other workers
+BANLIST_SYNC_CONCURRENCY = 3  # Servers synced at once, each one still uses BULK_CONCURRENCY
+BANLIST_REASON = "Shared ban list"  # Shown in the audit log and /cases
+
+# Gateway profile, picks which Discord events we subscribe to and how much gets cached
+#   "full": every intent and the library's unbounded caches (the old behavior)
+#   "moderation": only what the loaded commands and automod need, bounded caches
+#   "minimal": slash commands only, no member events so cached members can go stale
+GATEWAY_PROFILE = "moderation"
+MEMBER_CACHE_SIZE = 5000  # Max members cached, least recently used ones get dropped first
+MEMBER_CACHE_TTL = 3600  # Seconds a member stays cached without being used
+MESSAGE_CACHE_SIZE = 250  # Max messages cached
+MESSAGE_CACHE_TTL = 600  # Seconds a message stays cached without being used
+
+# /ban
+BAN_DELETE_DAYS = 0  # Days of messages /ban and /massban delete when nobody picks
+
+# Per server settings (/settings), anything a server changes overrides the defaults in
+# here. Kept in this file and reloaded when it changes, no restart needed
+GUILD_SETTINGS_PATH = "guild_settings.json"
+GUILD_SETTINGS_RELOAD_INTERVAL = 5  # Seconds between checks for changes to the file
+
+# Register commands in just this one server instead of everywhere, they update instantly
+# there so it's handy for testing changes. None registers them globally
+DEBUG_GUILD_ID = None
+
+# Which commands get loaded, "all" or "moderation" (no /say or /wikipedia, starts faster)
+# python main.py --moderation-only does the same thing
+COMMAND_SET = "all"
+
+# Command rate limits, (uses, seconds) per user and per server, commands not listed here
+# aren't limited. Subcommands share their command's limits
+RATELIMITS = {
+    "wikipedia": {"user": (3, 30), "guild": (30, 60)},
+    "say": {"user": (5, 10)},
+    "ban": {"user": (10, 60), "guild": (30, 60)},
+    "kick": {"user": (10, 60), "guild": (30, 60)},
+    "timeout": {"user": (15, 60), "guild": (40, 60)},
+    "massban": {"user": (2, 300), "guild": (3, 300)},
+    "masskick": {"user": (2, 300), "guild": (3, 300)},
+    "masstimeout": {"user": (2, 300), "guild": (3, 300)},
+    "purge": {"user": (3, 60), "guild": (10, 60)},
+    "cases": {"user": (10, 30)},
+    "automod": {"user": (10, 60)},
+    "banlist": {"user": (5, 60)},
+    "settings": {"user": (10, 60)},
+}
+RATELIMIT_MAX_KEYS = 100000  # Max users/servers tracked per command, least recently active get dropped first
+
+# Slash command registration
+# Command definitions get hashed and only pushed to Discord when they change, delete the
+# file (or set this to None) to push them on every start like before
+COMMAND_SYNC_CACHE = "command_sync.json"
+
+# Sharding (python main.py --workers 4), for when one process can't keep up anymore
+SHARD_COUNT = None  # Total shards, None uses what Discord recommends
+SHARD_RESTART_MAX_DELAY = 60  # Max seconds to wait before restarting a worker that keeps crashing
+SHARD_STABLE_SECONDS = 60  # Workers that ran this long before crashing get restarted straight away
+
+# Logging, JSON lines written by a background thread so commands never wait on output
+LOG_LEVEL = "info"  # "debug", "info", "warning" or "error"
+LOG_FORMAT = "json"  # "json" (one object per line) or "text" (easier to read in a terminal)
+LOG_FILE = None  # File to append logs to, None prints them
+LOG_BUFFER_SIZE = 10000  # Max records waiting to be written, the oldest get dropped past this
+LOG_BATCH_SIZE = 500  # This many waiting records wakes the writer early
+LOG_FLUSH_INTERVAL = 0.5  # Seconds between writes
+LOG_SAMPLE = {"wikipedia_search": 0.1}  # Only keep this fraction of noisy events
+
+# Warm restarts, shutting down (Ctrl+C or SIGTERM) saves cooldowns, lockdowns and cached
+# wikipedia summaries here and the next start picks them back up
+WARM_START_PATH = "warm_start.bin"  # None turns it off, sharding workers add their number
+WARM_START_MAX_AGE = 900  # Seconds, older snapshots get ignored
+
+# Database (moderation cases and other stuff that needs to survive restarts)
+DATABASE_PATH = "easymod.db"
+DATABASE_BATCH_SIZE = 200  # Max writes per transaction
+DATABASE_FLUSH_INTERVAL = 0.25  # Seconds to let writes pile up before flushing them
+DATABASE_RETRY_DELAY = 1  # Seconds before trying a batch again when the database is locked or erroring
+CASES_PAGE_SIZE = 10  # Cases per /cases page
+
+# Automod (/automod), needs the Message Content intent turned on in the developer portal
+AUTOMOD_MAX_TERMS = 500  # Max banned words/regexes per server
+AUTOMOD_MAX_REGEX_LENGTH = 200  # Max characters per regex
+AUTOMOD_REGEX_TIMEOUT = 0.5  # Seconds a server's regexes get per message, slower ones get turned off until the terms change
+AUTOMOD_TIMEOUT = 600  # Seconds people get timed out for with the "timeout" action
+
+# Spam detection, floods and repeated messages get the sender timed out
+# Servers can change these for themselves with /settings (spam_messages and so on)
+SPAM_DEFAULTS = {
+    "messages": 5,  # This many messages...
+    "seconds": 5,  # ...within this many seconds is a flood
+    "duplicates": 3,  # Same message this many times is spam (0 turns it off)
+    "timeout": 300,  # Seconds spammers get timed out for
+}
+SPAM_DUPLICATE_WINDOW = 30  # Seconds a repeated message counts for
+SPAM_IDLE_SECONDS = 60  # Users quiet for this long stop being tracked, keep it above "seconds" and SPAM_DUPLICATE_WINDOW
+SPAM_MAX_TRACKED_USERS = 50000  # Hard cap on tracked users, least recently active get dropped
+
+# Anti-raid, too many joins at once locks the server down and handles everyone joining
+RAID_WINDOW = 10  # Seconds of joins to look at
+RAID_JOIN_THRESHOLD = 15  # This many joins within the window starts a lockdown...
+RAID_YOUNG_THRESHOLD = 8  # ...or this many joins from young accounts
+RAID_ACCOUNT_AGE = 7 * 86400  # Accounts newer than this many seconds count as young
+RAID_LOCKDOWN_SECONDS = 300  # Lockdowns end after this long without new joins
+RAID_ACTION = "kick"  # What happens to raiders: "kick", "timeout" or "ban"
+RAID_TIMEOUT = 3600  # Seconds raiders get timed out for with the "timeout" action
+RAID_BATCH_DELAY = 1  # Seconds to let joins pile up before handling them as one batch
+
+# /purge
+PURGE_MAX_COUNT = 1000  # Max messages deleted per /purge
+PURGE_MAX_SCAN = 5000  # Max messages looked through per /purge
+
+# Metrics (/stats and a Prometheus endpoint)
+METRICS_HOST = "127.0.0.1"  # Keep it local unless you know what you're doing
+METRICS_PORT = 9464  # Set to None to turn the endpoint off
+METRICS_LAG_INTERVAL = 0.5  # Seconds between event loop lag checks
@@ -0,0 +1,138 @@
+# Database
+# SQLite in WAL mode so reads don't wait on writes. Writes go on a queue and a background
+# task commits them in batches on its own thread, so command handlers never wait on disk
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import log
+
+
+class Database:
+    def __init__(self, path: str):
+        self.path = path
+        self._schemas: list[str] = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Writes taken off the queue that aren't committed yet, kept here instead of in
+        # the writer task so close() still finds them if the task gets cancelled
+        self._batch: list[tuple[str, list[tuple]]] = []
+        # One thread each so a big write batch never holds up reads
+        self._write_thread = ThreadPoolExecutor(1, thread_name_prefix="db-write")
+        self._read_thread = ThreadPoolExecutor(1, thread_name_prefix="db-read")
+        self._write_conn: sqlite3.Connection | None = None
+        self._read_conn: sqlite3.Connection | None = None
+        self._writer: asyncio.Task | None = None
+
+    def add_schema(self, schema: str):
+        # Modules register their tables before start()
+        self._schemas.append(schema)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Sharded workers share the file, wait on each other's writes instead of failing
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL and a lot faster
+        return conn
+
+    def _open(self):
+        self._write_conn = self._connect()
+        for schema in self._schemas:
+            self._write_conn.executescript(schema)
+        self._write_conn.commit()
+        self._read_conn = self._connect()
+
+    async def start(self):
+        if self._writer is not None:
+            return
+        await asyncio.get_running_loop().run_in_executor(self._write_thread, self._open)
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def write(self, sql: str, params: tuple = ()):
+        # Never blocks, the write happens in the next batch
+        self._queue.put_nowait((sql, (params,)))
+
+    def write_many(self, sql: str, rows: list[tuple]):
+        # Same as write() for every row but it only takes up one spot in a batch, for
+        # when thousands of rows change at once
+        if rows:
+            self._queue.put_nowait((sql, rows))
+
+    def _commit_batch(self, batch: list[tuple[str, list[tuple]]]):
+        with self._write_conn:  # One transaction per batch
+            # Runs of the same statement go through executemany
+            start = 0
+            while start < len(batch):
+                sql = batch[start][0]
+                end = start
+                while end < len(batch) and batch[end][0] == sql:
+                    end += 1
+                self._write_conn.executemany(
+                    sql, [params for _, rows in batch[start:end] for params in rows]
+                )
+                start = end
+
+    def _flush(self):
+        # Runs on the write thread, the batch only gets cleared once it's been dealt with.
+        # OperationalError (locked for too long, disk trouble) is raised so the whole
+        # batch gets tried again later
+        batch = self._batch
+        if not batch:
+            return
+        try:
+            self._commit_batch(batch)
+        except sqlite3.OperationalError:
+            raise
+        except Exception as e:
+            # Like a constraint failing, one bad write shouldn't take the rest down with it
+            log.warning("database_batch_failed", writes=len(batch), error=str(e))
+            for entry in batch:
+                try:
+                    self._commit_batch([entry])
+                except Exception as e:
+                    log.error("database_write_failed", sql=entry[0], rows=len(entry[1]), exc=e)
+        self._batch = []
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._batch:
+                self._batch.append(await self._queue.get())
+                # Give other writes a moment to pile up so they share the commit
+                await asyncio.sleep(config.DATABASE_FLUSH_INTERVAL)
+            while len(self._batch) < config.DATABASE_BATCH_SIZE and not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+            try:
+                await loop.run_in_executor(self._write_thread, self._flush)
+            except sqlite3.OperationalError as e:
+                log.warning("database_write_retrying", writes=len(self._batch), error=str(e))
+                await asyncio.sleep(config.DATABASE_RETRY_DELAY)
+
+    async def read(self, sql: str, params: tuple = ()) -> list[tuple]:
+        def run():
+            return self._read_conn.execute(sql, params).fetchall()
+
+        return await asyncio.get_running_loop().run_in_executor(self._read_thread, run)
+
+    def close(self):
+        # Sync so it can run after the event loop is gone, flushes anything still queued
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        # A commit that's already running on the write thread finishes first, it's using
+        # the same connection
+        self._write_thread.shutdown(wait=True)
+        while not self._queue.empty():
+            self._batch.append(self._queue.get_nowait())
+        if self._write_conn is not None:
+            try:
+                self._flush()
+            except sqlite3.OperationalError as e:
+                log.error("database_write_failed", lost=len(self._batch), exc=e)
+        for conn in (self._write_conn, self._read_conn):
+            if conn is not None:
+                conn.close()
+        self._write_conn = self._read_conn = None
+
+
+db = Database(config.DATABASE_PATH)
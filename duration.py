@@ -0,0 +1,119 @@
+# Duration parsing
+# Turns "1h30m", "90m", "1.5h", "2 days 4 hours" or ISO-8601 "PT1H30M" into a Duration
+# Everything is compiled once at import and units come from one lookup table
+# Results are immutable so repeat inputs (most of them, "10m" and "1h" come up a lot)
+# are served straight from a small LRU cache without parsing again. New inputs mostly
+# look like ones we've seen with different numbers ("2h15m" is "1h30m" again), so the
+# regexes run once per shape of input and turn it into a plan of where the numbers are
+# and what they're multiplied by. After that parsing is slicing out a few ints
+import datetime
+import functools
+import re
+from typing import NamedTuple
+
+# Every unit alias -> seconds
+UNITS = {
+    alias: seconds
+    for aliases, seconds in (
+        (("s", "sec", "secs", "second", "seconds"), 1),
+        (("m", "min", "mins", "minute", "minutes"), 60),
+        (("h", "hr", "hrs", "hour", "hours"), 3600),  # 60 * 60
+        (("d", "day", "days"), 86400),  # 24 * 60 * 60
+        (("w", "wk", "wks", "week", "weeks"), 604800),  # 7 * 24 * 60 * 60
+    )
+    for alias in aliases
+}
+MAX_SECONDS = int(datetime.timedelta.max.total_seconds())  # Biggest a timedelta can hold
+MAX_LENGTH = 100  # Longer input isn't a duration anyone typed on purpose
+_SHAPE = bytes.maketrans(b"123456789", b"000000000")  # Same shape, same plan
+
+# "<number><unit>" chunks split by spaces, commas or "and", all matched in one go. Each
+# unit can only come up once so there's one nested optional group per unit, that caps
+# how far a failed match can backtrack (it used to take seconds on "1h"*20+"!"). The
+# separator only goes between chunks so "1h," doesn't parse
+_CHUNK = r"(\d+(?:\.\d*)?|\.\d+)\s*([a-z]+)"
+_SEPARATOR = r"(?:|\s+|\s*,\s*(?:and\s+)?|\s+and\s+)"  # Most common first
+_CHUNKS = re.compile(
+    _CHUNK + f"(?:{_SEPARATOR}{_CHUNK}" * (len(set(UNITS.values())) - 1)
+    + ")?" * (len(set(UNITS.values())) - 1)
+)
+# The lookaheads turn away "P", "PT" and "P1DT"
+_ISO = re.compile(
+    r"p(?=\d|t\d)(?:(\d+(?:\.\d+)?)w)?(?:(\d+(?:\.\d+)?)d)?"
+    r"(?:t(?=\d)(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s)?)?"
+)
+_ISO_UNITS = (604800, 86400, 3600, 60, 1)  # Seconds for each of _ISO's groups in order
+_new_duration = tuple.__new__  # Skips the NamedTuple constructor, it's a good chunk of a parse
+
+
+class Duration(NamedTuple):
+    seconds: int
+
+    @property
+    def delta(self) -> datetime.timedelta:
+        return datetime.timedelta(seconds=self.seconds)
+
+    def __str__(self) -> str:
+        return format_delta(self.delta)
+
+
+def format_delta(delta: datetime.timedelta) -> str:
+    # "2 days, 0:00:00" reads better as "2 days"
+    return str(delta).replace(", 0:00:00", "")
+
+
+_Plan = tuple[tuple[int, int, type, int], ...]  # (start, end, int or float, unit seconds)
+
+
+@functools.lru_cache(maxsize=1024)
+def _plan(shape: bytes) -> _Plan | None:
+    # Where the numbers are in every input shaped like this one, None if it isn't a duration.
+    # Shapes are bytes since bytes.translate is a lot quicker, the regexes want it back as str
+    shape = shape.decode()
+    if shape[0] == "p":
+        match = _ISO.fullmatch(shape)
+        if match is None:
+            return None
+        return tuple(
+            (*match.span(group), float if "." in match[group] else int, unit_seconds)
+            for group, unit_seconds in enumerate(_ISO_UNITS, 1)
+            if match[group] is not None
+        )
+
+    match = _CHUNKS.fullmatch(shape)
+    if match is None:
+        return None  # Junk like "5x" or "soon" in there
+    groups = match.groups()
+    plan = []
+    seen = []
+    for group in range(0, match.lastindex, 2):
+        unit_seconds = UNITS.get(groups[group + 1])
+        if unit_seconds is None or unit_seconds in seen:
+            return None  # Not a unit, or the same one twice like "1h1h"
+        seen.append(unit_seconds)
+        start, end = match.span(group + 1)
+        plan.append((start, end, float if "." in groups[group] else int, unit_seconds))
+    return tuple(plan)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_duration(text: str) -> Duration | None:
+    # None if it isn't a valid, positive duration
+    text = text.strip().lower()
+    if not text or len(text) > MAX_LENGTH:
+        return None
+    plan = _plan(text.encode().translate(_SHAPE))
+    if plan is None:
+        return None
+    total = 0
+    for start, end, number, unit_seconds in plan:
+        total += number(text[start:end]) * unit_seconds
+
+    # Also catches stuff like "9999...9w" that turns into inf
+    if not 0 < total <= MAX_SECONDS:
+        return None
+    if type(total) is float:
+        total = round(total)
+        if total <= 0:
+            return None
+    return _new_duration(Duration, (total,))
@@ -0,0 +1,23 @@
+# Command extensions
+# Each module is an interactions Extension with a slice of the commands, main.py loads
+# the set picked by config.COMMAND_SET (or --moderation-only)
+SETS = {
+    "all": [
+        "extensions.moderation",
+        "extensions.bulk_moderation",
+        "extensions.protection",
+        "extensions.shared_bans",
+        "extensions.settings",
+        "extensions.owner",
+        "extensions.fun",
+    ],
+    # Just the moderation tools, no /say or /wikipedia
+    "moderation": [
+        "extensions.moderation",
+        "extensions.bulk_moderation",
+        "extensions.protection",
+        "extensions.shared_bans",
+        "extensions.settings",
+        "extensions.owner",
+    ],
+}
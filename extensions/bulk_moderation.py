@@ -0,0 +1,285 @@
+# Bulk moderation
+# /massban, /masskick and /masstimeout. For raids, takes a pasted list of ids/mentions,
+# checks everyone in one go and then runs the actions concurrently while updating one
+# response with progress
+import datetime
+
+from interactions import (
+    Extension,
+    slash_command,
+    SlashContext,
+    OptionType,
+    slash_option,
+    Permissions,
+    Member,
+)
+
+import bulk
+import cases
+import config
+import guild_settings
+import hierarchy
+import log
+import ratelimit
+from actions import timeout_time_logic
+
+BULK_PROBLEMS = {
+    hierarchy.TARGET_OWNER: "that's the server owner",
+    hierarchy.AUTHOR_TOO_LOW: "your role isn't high enough",
+    hierarchy.BOT_TOO_LOW: "my role isn't high enough",
+}
+
+
+def bulk_report(
+    done_verb: str, result: bulk.BulkResult, skipped: dict[int, str]
+) -> str:
+    failed = skipped | result.failed
+    report = f"✅ {done_verb} {len(result.succeeded)} users"
+    if failed:
+        report += f"\n❌ {len(failed)} failed:\n" + "\n".join(
+            f"- <@{user_id}>: {why}" for user_id, why in failed.items()
+        )
+    if len(report) > 1990:  # Keep under Discord limits (2000 char)
+        report = report[:1990] + "..."
+    return report
+
+
+async def run_bulk_command(
+    ctx: SlashContext,
+    users: str,
+    verb: str,
+    done_verb: str,
+    members_only: bool,
+    execute,
+    case_action: str,
+    reason: str | None = None,
+    case_duration: int | None = None,
+):
+    if not ctx.guild or not isinstance(ctx.author, Member):
+        await ctx.send(
+            "❌ Command must be run in a server and you need perms/roles",
+            ephemeral=True,
+        )
+        return
+    user_ids = bulk.parse_user_ids(users)
+    if not user_ids:
+        await ctx.send("❌ Couldn't find any user ids in that list", ephemeral=True)
+        return
+    if len(user_ids) > config.BULK_MAX_USERS:
+        await ctx.send(
+            f"❌ That's too many users at once ({config.BULK_MAX_USERS} max)",
+            ephemeral=True,
+        )
+        return
+
+    # Fetching members can take a bit
+    await ctx.defer()
+
+    # Check everyone in one pass
+    try:
+        checker = await hierarchy.checker(ctx.guild, ctx.author)
+        members = await bulk.fetch_members(ctx.guild, user_ids)
+    except Exception as e:
+        log.error("hierarchy_check_failed", command=f"mass{case_action}", exc=e)
+        await ctx.send("❌ An error occurred while checking roles")
+        return
+
+    targets: list[int] = []
+    skipped: dict[int, str] = {}
+    for user_id in user_ids:
+        if user_id in (ctx.author.id, ctx.bot.user.id):
+            skipped[user_id] = "that's you or me lol"
+        elif user_id not in members:
+            skipped[user_id] = "couldn't check their roles"
+        elif members[user_id] is None and members_only:
+            skipped[user_id] = "not in the server"
+        elif problem := checker.check(members[user_id], user_id):
+            skipped[user_id] = BULK_PROBLEMS[problem]
+        else:
+            targets.append(user_id)
+
+    await ctx.send(f"⏳ {verb} {len(targets)} users...")
+
+    async def progress(done: int, total: int):
+        await ctx.edit(content=f"⏳ {verb} users... {done}/{total}")
+
+    try:
+        result = await execute(targets, members, progress)
+    except Exception as e:
+        log.error("bulk_failed", command=f"mass{case_action}", exc=e)
+        await ctx.edit(
+            content="❌ An unexpected error occurred please report this on the GitHub in my bio if it persists"
+        )
+        return
+
+    await ctx.edit(content=bulk_report(done_verb, result, skipped))
+    for user_id in result.succeeded:
+        cases.log_case(
+            ctx.guild.id, user_id, ctx.author.id, case_action, reason, case_duration
+        )
+    log.info(
+        "bulk_done",
+        command=f"mass{case_action}",
+        guild_id=ctx.guild_id,
+        moderator_id=ctx.author_id,
+        done=len(result.succeeded),
+        failed=len(result.failed),
+        skipped=len(skipped),
+    )
+
+
+class BulkModeration(Extension):
+    # /massban
+    @slash_command(
+        name="massban",
+        description="Bans a bunch of users at once (the bot needs Ban Members and Manage Server)",
+        default_member_permissions=Permissions.BAN_MEMBERS,
+    )
+    @slash_option(
+        name="users",
+        description="User ids or mentions separated by spaces, commas or new lines",
+        required=True,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="reason",
+        description="Your reason for the bans (optional)",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="delete_messages",
+        description="Number of days of messages you wanna delete (0-7, default is the server's ban_delete_days)",
+        required=False,
+        opt_type=OptionType.INTEGER,
+        min_value=0,
+        max_value=7,
+    )
+    @ratelimit.limit("massban")
+    async def massban_command(
+        self,
+        ctx: SlashContext,
+        users: str,
+        reason: str | None = None,
+        delete_messages: int | None = None,  # Default is the server's setting
+    ):
+        if delete_messages is None:
+            delete_messages = guild_settings.get(ctx.guild_id)["ban_delete_days"]
+
+        async def execute(targets, members, progress):
+            return await bulk.ban_many(
+                ctx.guild,
+                targets,
+                reason=reason or f"Mass banned by {ctx.author.display_name}",
+                delete_message_seconds=delete_messages * 86400,
+                progress=progress,
+            )
+
+        await run_bulk_command(
+            ctx,
+            users,
+            "Banning",
+            "Banned",
+            members_only=False,
+            execute=execute,
+            case_action="ban",
+            reason=reason,
+        )
+
+    # /masskick
+    @slash_command(
+        name="masskick",
+        description="Kicks a bunch of users at once",
+        default_member_permissions=Permissions.KICK_MEMBERS,
+    )
+    @slash_option(
+        name="users",
+        description="User ids or mentions separated by spaces, commas or new lines",
+        required=True,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="reason",
+        description="Your reason for the kicks (optional)",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @ratelimit.limit("masskick")
+    async def masskick_command(self, ctx: SlashContext, users: str, reason: str | None = None):
+        async def execute(targets, members, progress):
+            async def kick(user_id: int):
+                await ctx.guild.kick(
+                    user_id, reason=reason or f"Mass kicked by {ctx.author.display_name}"
+                )
+
+            return await bulk.run(targets, kick, progress)
+
+        await run_bulk_command(
+            ctx,
+            users,
+            "Kicking",
+            "Kicked",
+            members_only=True,
+            execute=execute,
+            case_action="kick",
+            reason=reason,
+        )
+
+    # /masstimeout
+    @slash_command(
+        name="masstimeout",
+        description="Times out a bunch of users at once",
+        default_member_permissions=Permissions.MODERATE_MEMBERS,
+    )
+    @slash_option(
+        name="users",
+        description="User ids or mentions separated by spaces, commas or new lines",
+        required=True,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="duration",
+        description="Amount of time (like 30m, 1h30m, 1.5h, 2d, 1w, 28 days max)",
+        required=True,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="reason",
+        description="Timeout reason (optional)",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @ratelimit.limit("masstimeout")
+    async def masstimeout_command(
+        self, ctx: SlashContext, users: str, duration: str, reason: str | None = None
+    ):
+        max_timeout = guild_settings.get(ctx.guild_id)["max_timeout"]
+        delta = timeout_time_logic(duration, max_timeout)
+        if delta is None:
+            await ctx.send(
+                "❌ Invalid time format or duration (like 30m, 1h30m, 1.5h, 2d, 1w,"
+                f" {guild_settings.show('max_timeout', max_timeout)} max)",
+                ephemeral=True,
+            )
+            return
+        end_time = datetime.datetime.now(datetime.timezone.utc) + delta
+
+        async def execute(targets, members, progress):
+            async def timeout(user_id: int):
+                await members[user_id].timeout(
+                    communication_disabled_until=end_time, reason=reason
+                )
+
+            return await bulk.run(targets, timeout, progress)
+
+        await run_bulk_command(
+            ctx,
+            users,
+            "Timing out",
+            "Timed out",
+            members_only=True,
+            execute=execute,
+            case_action="timeout",
+            reason=reason,
+            case_duration=int(delta.total_seconds()),
+        )
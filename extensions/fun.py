@@ -0,0 +1,145 @@
+# Fun commands lol
+# /say, /wikipedia and the wikipedia cache stats. Not loaded with the "moderation" set
+from interactions import (
+    AutocompleteContext,
+    Extension,
+    slash_command,
+    SlashContext,
+    OptionType,
+    slash_option,
+    check,
+    is_owner,
+)
+
+import guild_settings
+import log
+import metrics
+import ratelimit
+import wiki_titles
+
+
+class Fun(Extension):
+    # /say
+    @slash_command(
+        name="say", description="Makes the bot say what its owner wants it to say"
+    )
+    @check(is_owner())
+    @slash_option(
+        name="text",
+        description="Adds text",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @ratelimit.limit("say")
+    async def say_command(self, ctx: SlashContext, text: str = None):
+        if not text:
+            log.warning("say_empty", user_id=ctx.author_id)
+            await ctx.send("❌ Please select an option", ephemeral=True)
+        elif text:
+            log.info("say", user_id=ctx.author_id, text=text)
+            await ctx.send(text)
+
+    # /wikipedia
+    @slash_command(name="wikipedia", description="Search wikipedia")
+    @slash_option(
+        name="query",
+        description="What do you wanna search on wikipedia?",
+        required=True,
+        opt_type=OptionType.STRING,
+        autocomplete=True,
+    )
+    @ratelimit.limit("wikipedia")
+    async def wikipedia_search(self, ctx: SlashContext, query: str):
+        # Defer response cause wikipedia search takes awhile sometimes
+        await ctx.defer()
+        # Imported the first time someone searches, wikipedia drags in requests and
+        # BeautifulSoup which would slow down every start
+        import wiki
+        from wikipedia import exceptions as wiki_exceptions
+
+        log.info("wikipedia_search", user_id=ctx.author_id, query=query)
+        settings = guild_settings.get(ctx.guild_id)
+        try:
+            # Get summary (cached, misses run on the wiki thread pool so the bot doesn't freeze)
+            with metrics.phase("wikipedia"):
+                summary = await wiki.get_summary(query, sentences=settings["wiki_sentences"])
+            max_chars = settings["wiki_max_chars"]  # Never more than Discord's 2000 char limit
+            if len(summary) > max_chars:
+                summary = summary[:max_chars] + "..."
+            await ctx.send(f"**{query}**:\n{summary}")  # Sends the summary
+            wiki_titles.found(query)  # Suggested to whoever types it next
+
+        # Error Handling
+        except wiki.WikiBusy:
+            # For when too many searches are already running
+            log.warning("wikipedia_busy", query=query)
+            await ctx.send(
+                "❌ Too many wikipedia searches are running right now try again in a bit",
+                ephemeral=True,
+            )
+        except TimeoutError:
+            # For when wikipedia takes too long
+            log.warning("wikipedia_timeout", query=query)
+            await ctx.send(
+                "❌ Wikipedia took too long to respond try again later",
+                ephemeral=True,
+            )
+        except wiki_exceptions.DisambiguationError as e:
+            # For when you're not specific enough
+            log.info("wikipedia_ambiguous", query=query, options=e.options[:5])  # Logs the first few options
+            options_list = "\n- ".join(e.options[:5])  # Shows the first 5 suggestions
+            wiki_titles.learn(e.options)  # All real titles, good autocomplete material
+            await ctx.send(
+                f"❌ Your query '{query}' could refer to multiple pages. Please be more specific\n"
+                f"Did you mean:\n- {options_list}",
+                ephemeral=True,
+            )
+        except wiki_exceptions.PageError:
+            # For when the page doesn't exist
+            log.info("wikipedia_not_found", query=query)
+            await ctx.send(
+                f"❌ Couldn't find a wikipedia page for '{query}' try different wording?",
+                ephemeral=True,
+            )
+        except wiki_exceptions.wikipediaException as e:
+            # Find other errors from the wikipedia lib
+            log.warning("wikipedia_error", query=query, error=str(e))
+            await ctx.send(
+                "❌ An error occurred while contacting wikipedia try again later",
+                ephemeral=True,
+            )
+        except Exception as e:
+            # Find other unexpected errors
+            log.error("wikipedia_failed", query=query, exc=e)
+            await ctx.send(
+                "❌ An unexpected error occurred please report this on the GitHub in my bio if it persists",
+                ephemeral=True,
+            )
+
+    @wikipedia_search.autocomplete("query")
+    async def wikipedia_autocomplete(self, ctx: AutocompleteContext):
+        # Has to answer within 3 seconds so it only ever looks at the local index, a
+        # wikipedia search for what's typed runs in the background if there's not much
+        await wiki_titles.load()
+        titles = wiki_titles.complete(ctx.input_text)
+        wiki_titles.search_upstream(ctx.input_text, len(titles))
+        await ctx.send(choices=titles)
+
+    # /wikistats
+    @slash_command(
+        name="wikistats", description="Shows the wikipedia cache stats (owner only)"
+    )
+    @check(is_owner())
+    async def wikistats_command(self, ctx: SlashContext):
+        import wiki
+
+        stats = wiki.cache_stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0
+        await ctx.send(
+            f"📚 Wikipedia cache: {stats['size']}/{stats['max_size']} entries\n"
+            f"Hits: {stats['hits']} Misses: {stats['misses']} ({hit_rate:.1f}% hit rate)\n"
+            f"Coalesced lookups: {stats['coalesced']}\n"
+            f"Titles for autocomplete: {wiki_titles.size()}",
+            ephemeral=True,
+        )
@@ -0,0 +1,659 @@
+# Moderation commands
+# /timeout, /ban, /kick, /purge and /cases
+import datetime
+
+import interactions
+from interactions import (
+    Extension,
+    slash_command,
+    SlashContext,
+    OptionType,
+    slash_option,
+    Permissions,
+    Member,
+    errors,
+)
+
+import banlist
+import cases
+import config
+import guild_settings
+import hierarchy
+import log
+import purge
+import ratelimit
+from actions import ban_user, timeout_member, timeout_time_logic
+from duration import format_delta, parse_duration
+
+
+class Moderation(Extension):
+    # /timeout
+    @slash_command(
+        name="timeout",
+        description="Manages user timeouts",
+        default_member_permissions=Permissions.MODERATE_MEMBERS,
+    )
+    async def timeout_base_command(self, ctx: SlashContext):
+        # The main /timeout command itself won't be called directly by the secondary commands
+        pass
+
+    # /timeout add
+    @timeout_base_command.subcommand(
+        sub_cmd_name="add",
+        sub_cmd_description="Timesout a user for a set amount of time",
+    )
+    # /timeout add command options
+    @slash_option(
+        name="user",
+        description="Who do you wanna timeout?",
+        required=True,
+        opt_type=OptionType.USER,
+    )
+    @slash_option(
+        name="duration",
+        description="Amount of time (like 30m, 1h30m, 1.5h, 2d, 1w, 28 days max)",  # Timestamp format
+        required=True,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="reason",
+        description="Timeout reason (optional)",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @ratelimit.limit("timeout")
+    async def timeout_add_subcommand(
+        self, ctx: SlashContext, user: Member, duration: str, reason: str | None = None
+    ):
+        # /timeout add logic
+        if not ctx.guild or not isinstance(ctx.author, Member):
+            await ctx.send(
+                "❌ Command must be run in a server and you need mod perms", ephemeral=True
+            )
+            return
+        # Stops you from doing a stupid lol
+        if user == ctx.author or user.id == ctx.bot.user.id:
+            await ctx.send("❌ You can't time yourself or the bot out lmao", ephemeral=True)
+            return
+
+        max_timeout = guild_settings.get(ctx.guild_id)["max_timeout"]
+        delta = timeout_time_logic(duration, max_timeout)
+        if delta is None:
+            await ctx.send(
+                "❌ Invalid time format or duration (like 30m, 1h30m, 1.5h, 2d, 1w,"
+                f" {guild_settings.show('max_timeout', max_timeout)} max)",
+                ephemeral=True,
+            )
+            return
+
+        # Perm checks
+        try:
+            # Owner, author and bot ranks are cached so this is just comparing numbers
+            checker = await hierarchy.checker(ctx.guild, ctx.author)
+            problem = checker.check(user)
+            # Stops you from timing out the server owner
+            if problem == hierarchy.TARGET_OWNER:
+                await ctx.send("❌ You can't timeout the server owner", ephemeral=True)
+                return
+            # Check author's perms
+            if problem == hierarchy.AUTHOR_TOO_LOW:
+                await ctx.send(
+                    "❌ Your role isn't high enough to timeout that user", ephemeral=True
+                )
+                return
+            # Check bot's perms
+            if problem == hierarchy.BOT_TOO_LOW:
+                await ctx.send(
+                    "❌ My role isn't high enough to timeout that user", ephemeral=True
+                )
+                return
+
+        except Exception as e:
+            # Log and report errors during checks
+            log.error("hierarchy_check_failed", command="timeout", exc=e)
+            await ctx.send("❌ An error occurred while checking roles", ephemeral=True)
+            return
+
+        try:
+            tend_time = await timeout_member(
+                ctx.guild.id, user, delta, ctx.author.id, reason
+            )
+
+            # Format confirmation message
+            reason_text = f" because {reason}" if reason else ""
+            delta_text = format_delta(delta)
+
+            await ctx.send(
+                f"✅ Timeout added for {user.mention} for {delta_text}{reason_text}"
+            )
+            log.info(
+                "timeout_added",
+                guild_id=ctx.guild_id,
+                user_id=user.id,
+                moderator_id=ctx.author_id,
+                until=tend_time.isoformat(),
+            )
+
+        # Error Handling
+        except errors.Forbidden:
+            await ctx.send(
+                "❌ Permission denied: Check my perms and roles",
+                ephemeral=True,
+            )
+            log.warning("missing_permissions", command="timeout", guild_id=ctx.guild_id, user_id=user.id)
+        except errors.HTTPException as e:
+            await ctx.send(f"❌ Discord API error: {e.status} - {e.text}", ephemeral=True)
+            log.warning("discord_error", command="timeout", status=e.status, error=e.text)
+        except OverflowError:  # Should be less likely with delta check
+            await ctx.send(
+                "❌ Invalid date calculation (duration likely too long)", ephemeral=True
+            )
+            log.warning("timeout_overflow", duration=duration)
+        except Exception as e:
+            log.error("timeout_failed", exc=e)
+            await ctx.send(
+                "❌ An unexpected error occurred please report this on the GitHub in my bio if it persists",
+                ephemeral=True,
+            )
+
+    # /timeout remove
+    @timeout_base_command.subcommand(
+        sub_cmd_name="remove",
+        sub_cmd_description="Removes a users timeout",
+    )
+    # /timeout remove command options
+    @slash_option(
+        name="user",
+        description="Whos timeout do you wanna remove?",
+        required=True,
+        opt_type=OptionType.USER,
+    )
+    @slash_option(
+        name="reason",
+        description="Reason for removing timeout (optional)",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @ratelimit.limit("timeout")
+    async def timeout_remove_subcommand(
+        self, ctx: SlashContext, user: Member, reason: str | None = None
+    ):
+        if not ctx.guild or not isinstance(ctx.author, Member):
+            await ctx.send(
+                "❌ Command must be run in a server and you need mod perms", ephemeral=True
+            )
+            return
+
+        # Check if the user is actually timedout
+        if user.communication_disabled_until is None:
+            await ctx.send(f"❌ {user.mention} isn't timedout", ephemeral=True)
+            return
+
+        # Perm checks
+        author: Member = ctx.author
+        try:
+            checker = await hierarchy.checker(ctx.guild, author)
+            problem = checker.check(user)
+            # Check author's roles (the owner can't be timed out so they land here too)
+            if problem in (hierarchy.TARGET_OWNER, hierarchy.AUTHOR_TOO_LOW):
+                await ctx.send(
+                    "❌ Your role is not high enough to manage this user's timeout",
+                    ephemeral=True,
+                )
+                return
+            # Check bot's roles
+            if problem == hierarchy.BOT_TOO_LOW:
+                await ctx.send(
+                    "❌ My role isn't high enough to remove that users timeout",
+                    ephemeral=True,
+                )
+                return
+
+        except Exception as e:
+            log.error("hierarchy_check_failed", command="untimeout", exc=e)
+            await ctx.send("❌ An error occurred while checking roles", ephemeral=True)
+            return
+
+        # Remove timeout
+        try:
+            await user.timeout(
+                communication_disabled_until=None,
+                reason=reason or f"Timeout removed by {author}]",
+            )
+
+            reason_text = f" because {reason}" if reason else ""
+            await ctx.send(f"✅ Timeout removed for {user.mention}{reason_text}")
+            log.info(
+                "timeout_removed", guild_id=ctx.guild_id, user_id=user.id, moderator_id=author.id
+            )
+            cases.log_case(ctx.guild.id, user.id, author.id, "untimeout", reason)
+
+        # Error Handling
+        except errors.Forbidden:
+            await ctx.send(
+                "❌ Permission denied: Check my permissions and roles",
+                ephemeral=True,
+            )
+            log.warning("missing_permissions", command="untimeout", guild_id=ctx.guild_id, user_id=user.id)
+        except errors.HTTPException as e:
+            await ctx.send(f"❌ Discord API error: {e.status} - {e.text}", ephemeral=True)
+            log.warning("discord_error", command="untimeout", status=e.status, error=e.text)
+        except Exception as e:
+            log.error("untimeout_failed", exc=e)
+            await ctx.send(
+                "❌ An unexpected error occurred please report this on the GitHub in my bio if it persists",
+                ephemeral=True,
+            )
+
+    # /ban
+    @slash_command(
+        name="ban",
+        description="Bans a user from the server",
+        # Requires the Ban Members permission
+        default_member_permissions=Permissions.BAN_MEMBERS,
+    )
+    @slash_option(
+        name="user",
+        description="The user you wanna ban",
+        required=True,
+        opt_type=OptionType.USER,
+    )
+    @slash_option(
+        name="reason",
+        description="Your reason for the ban (optional)",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="delete_messages",
+        description="Number of days of messages you wanna delete (0-7, default is the server's ban_delete_days)",
+        required=False,
+        opt_type=OptionType.INTEGER,
+        min_value=0,
+        max_value=7,
+    )
+    @slash_option(
+        name="duration",
+        description="How long the ban lasts (like 1h, 7d, 2w), leave empty for forever",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @ratelimit.limit("ban")
+    async def ban_command(
+        self, ctx: SlashContext,
+        user: interactions.User | Member,
+        reason: str | None = None,
+        delete_messages: int | None = None,  # Default is the server's setting
+        duration: str | None = None,  # Default is forever
+    ):
+        # Initial checks
+        if not ctx.guild or not isinstance(ctx.author, Member):
+            await ctx.send(
+                "❌ Command must be run in a server and you need perms/roles",
+                ephemeral=True,
+            )
+            return
+        # stops you from doing another stupid lol
+        if user.id == ctx.author.id or user.id == ctx.bot.user.id:
+            await ctx.send("❌ You cannot ban yourself or the bot", ephemeral=True)
+            return
+        if delete_messages is None:
+            delete_messages = guild_settings.get(ctx.guild_id)["ban_delete_days"]
+        # Temp bans use the same duration format as timeouts
+        ban_length = parse_duration(duration) if duration else None
+        if duration and ban_length is None:
+            await ctx.send(
+                "❌ Invalid ban duration (like 1h, 7d, 2w or leave it empty for forever)",
+                ephemeral=True,
+            )
+            return
+
+        # Perm/role checks
+        target_member: Member | None = None
+        if isinstance(user, Member):
+            target_member = user
+        else:
+            try:
+                target_member = await ctx.guild.fetch_member(user.id)
+            except errors.NotFound:
+                pass
+            except Exception as e:
+                log.warning("member_fetch_failed", command="ban", user_id=user.id, error=str(e))
+                await ctx.send(
+                    "❌ Could not verify target user's status in the server",
+                    ephemeral=True,
+                )
+                return
+
+        try:
+            checker = await hierarchy.checker(ctx.guild, ctx.author)
+            # Users that aren't in the server only get the owner check
+            problem = checker.check(target_member, user.id)
+            # Stops you from trying to ban the server owner lol
+            if problem == hierarchy.TARGET_OWNER:
+                await ctx.send("❌ You can't ban the server owner", ephemeral=True)
+                return
+            # Check author roles
+            if problem == hierarchy.AUTHOR_TOO_LOW:
+                await ctx.send(
+                    "❌ Your role isn't high enough to ban that user", ephemeral=True
+                )
+                return
+            # Check bot perms
+            if problem == hierarchy.BOT_TOO_LOW:
+                await ctx.send(
+                    "❌ My role isn't high enough to ban that user", ephemeral=True
+                )
+                return
+
+        except Exception as e:
+            log.error("hierarchy_check_failed", command="ban", exc=e)
+            await ctx.send(
+                "❌ An error occurred while checking roles if this presists please report it on the GitHub in my bio",
+                ephemeral=True,
+            )
+            return
+        try:
+            # Ban them
+            await ban_user(
+                ctx.guild,
+                user.id,
+                ctx.author.id,
+                reason,
+                audit_reason=reason or f"Banned by {ctx.author.display_name}",
+                delete_message_seconds=delete_messages * 86400,
+                ban_length=ban_length,
+            )
+
+            # Permanent bans go on the shared ban list if this server shares
+            shared = not ban_length and banlist.publish(
+                ctx.guild_id, user.id, ctx.author_id, reason
+            )
+            length_clause = f" for {ban_length}" if ban_length else ""
+            reason_clause = f" because {reason}" if reason else "."
+            delete_clause = (
+                f" and messages from last {delete_messages} days were deleted"
+                if delete_messages > 0
+                else ""
+            )
+            shared_clause = " (added to the shared ban list)" if shared else ""
+            await ctx.send(
+                f"✅ Banned {user.mention}{length_clause}{reason_clause}{delete_clause}{shared_clause}"
+            )
+            log.info(
+                "banned",
+                guild_id=ctx.guild_id,
+                user_id=user.id,
+                moderator_id=ctx.author_id,
+                duration=duration,
+                delete_days=delete_messages,
+                shared=shared,
+            )
+
+        # Error handling
+        except errors.Forbidden:
+            await ctx.send(
+                "❌ Permission denied: Check if I have the 'Ban Members' perm and that my role is high enough",
+                ephemeral=True,
+            )
+            log.warning("missing_permissions", command="ban", guild_id=ctx.guild_id, user_id=user.id)
+        except errors.HTTPException as e:
+            await ctx.send(f"❌ Discord API error: {e.status} - {e.text}", ephemeral=True)
+            log.warning("discord_error", command="ban", status=e.status, error=e.text)
+        except Exception as e:
+            log.error("ban_failed", exc=e)
+            await ctx.send(
+                "❌ An unexpected error occurred while trying to ban if this presists report it on the GitHub in my bio",
+                ephemeral=True,
+            )
+
+    # /kick
+    @slash_command(
+        name="kick",
+        description="Kicks a user from the server",
+        # Requires the Kick Members permission
+        default_member_permissions=Permissions.KICK_MEMBERS,
+    )
+    @slash_option(
+        name="user",
+        description="The user you wanna kick",
+        required=True,
+        opt_type=OptionType.USER,  # Kicking requires the user to be a member
+    )
+    @slash_option(
+        name="reason",
+        description="Your reason for the kick (optional)",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @ratelimit.limit("kick")
+    async def kick_command(
+        self, ctx: SlashContext,
+        user: Member,  # Kick target must be a member currently in the server
+        reason: str | None = None,
+    ):
+        # Initial checks
+        if not ctx.guild or not isinstance(ctx.author, Member):
+            await ctx.send(
+                "❌ Command must be run in a server and you need perms/roles",
+                ephemeral=True,
+            )
+            return
+        # Can't kick yourself or bot
+        if user.id == ctx.author.id or user.id == ctx.bot.user.id:
+            await ctx.send("❌ You cannot kick yourself or the bot", ephemeral=True)
+            return
+
+        # Perm/role checks
+        try:
+            checker = await hierarchy.checker(ctx.guild, ctx.author)
+            problem = checker.check(user)
+            # Can't kick the server owner
+            if problem == hierarchy.TARGET_OWNER:
+                await ctx.send("❌ You can't kick the server owner", ephemeral=True)
+                return
+            # Check author roles vs target roles
+            if problem == hierarchy.AUTHOR_TOO_LOW:
+                await ctx.send(
+                    "❌ Your role isn't high enough to kick that user", ephemeral=True
+                )
+                return
+            # Check bot roles vs target roles
+            if problem == hierarchy.BOT_TOO_LOW:
+                await ctx.send(
+                    "❌ My role isn't high enough to kick that user", ephemeral=True
+                )
+                return
+
+        except Exception as e:
+            log.error("hierarchy_check_failed", command="kick", exc=e)
+            await ctx.send(
+                "❌ An error occurred while checking roles report it on GitHub if it persists",
+                ephemeral=True,
+            )
+            return
+
+        try:
+            # Kick them using guild.kick()
+            await ctx.guild.kick(
+                user.id,  # Pass the user ID as the first argument
+                reason=reason or f"Kicked by {ctx.author.display_name}",  # Default reason
+            )
+
+            reason_clause = f" because {reason}" if reason else "."
+            await ctx.send(f"✅ Kicked {user.mention}{reason_clause}")
+            log.info("kicked", guild_id=ctx.guild_id, user_id=user.id, moderator_id=ctx.author_id)
+            cases.log_case(ctx.guild.id, user.id, ctx.author.id, "kick", reason)
+
+        # Error handling
+        except errors.Forbidden:
+            await ctx.send(
+                "❌ Permission denied: Check if I have the 'Kick Members' perm and that my role is high enough",
+                ephemeral=True,
+            )
+            log.warning("missing_permissions", command="kick", guild_id=ctx.guild_id, user_id=user.id)
+        except errors.HTTPException as e:
+            await ctx.send(f"❌ Discord API error: {e.status} - {e.text}", ephemeral=True)
+            log.warning("discord_error", command="kick", status=e.status, error=e.text)
+        except Exception as e:
+            log.error("kick_failed", exc=e)
+            await ctx.send(
+                "❌ An unexpected error occurred while trying to kick report it on GitHub if it's persistent",
+                ephemeral=True,
+            )
+
+    # /purge
+    @slash_command(
+        name="purge",
+        description="Deletes a bunch of messages in this channel",
+        default_member_permissions=Permissions.MANAGE_MESSAGES,
+    )
+    @slash_option(
+        name="count",
+        description=f"How many messages to delete (max {config.PURGE_MAX_COUNT})",
+        required=True,
+        opt_type=OptionType.INTEGER,
+        min_value=1,
+        max_value=config.PURGE_MAX_COUNT,
+    )
+    @slash_option(
+        name="user",
+        description="Only delete messages from this user (optional)",
+        required=False,
+        opt_type=OptionType.USER,
+    )
+    @slash_option(
+        name="contains",
+        description="Only delete messages with this text in them (optional)",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="bots",
+        description="Only delete messages from bots (optional)",
+        required=False,
+        opt_type=OptionType.BOOLEAN,
+    )
+    @ratelimit.limit("purge")
+    async def purge_command(
+        self, ctx: SlashContext,
+        count: int,
+        user: interactions.User | Member | None = None,
+        contains: str | None = None,
+        bots: bool = False,
+    ):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+
+        # Ephemeral so the response isn't a message in the channel we're purging
+        await ctx.defer(ephemeral=True)
+        matcher = purge.PurgeFilter(
+            user.id if user else None, contains.casefold() if contains else None, bots
+        )
+        await ctx.send(f"⏳ Purging up to {count} messages...")
+
+        async def progress(deleted: int, scanned: int):
+            await ctx.edit(content=f"⏳ Purging... {deleted} deleted, {scanned} looked at")
+
+        try:
+            # Only messages sent before the command
+            result = await purge.purge(
+                ctx.bot,
+                ctx.channel_id,
+                count,
+                matcher,
+                before=ctx.id,
+                reason=f"Purged by {ctx.author.display_name}",
+                progress=progress,
+            )
+        except errors.Forbidden:
+            await ctx.edit(
+                content="❌ Permission denied: Check if I have the 'Manage Messages' and 'Read Message History' perms"
+            )
+            log.warning("missing_permissions", command="purge", guild_id=ctx.guild_id, channel_id=ctx.channel_id)
+            return
+        except Exception as e:
+            log.error("purge_failed", exc=e)
+            await ctx.edit(
+                content="❌ An unexpected error occurred please report this on the GitHub in my bio if it persists"
+            )
+            return
+
+        report = (
+            f"✅ Deleted {result.deleted} messages (looked at {result.scanned}) "
+            f"in {result.elapsed:.1f}s, {result.rate:.0f} messages/s"
+        )
+        if result.failed:
+            report += f"\n❌ {result.failed} failed: " + ", ".join(
+                f"{why} ({n})" for why, n in result.errors.items()
+            )
+        await ctx.edit(content=report)
+        log.info(
+            "purged",
+            guild_id=ctx.guild_id,
+            channel_id=ctx.channel_id,
+            moderator_id=ctx.author_id,
+            deleted=result.deleted,
+            scanned=result.scanned,
+            failed=result.failed,
+            rate=round(result.rate),
+        )
+
+    # /cases
+    @slash_command(
+        name="cases",
+        description="Shows a user's moderation history",
+        default_member_permissions=Permissions.MODERATE_MEMBERS,
+    )
+    @slash_option(
+        name="user",
+        description="Whos history do you wanna see?",
+        required=True,
+        opt_type=OptionType.USER,
+    )
+    @slash_option(
+        name="before",
+        description="Only show cases older than this case number (for the next page)",
+        required=False,
+        opt_type=OptionType.INTEGER,
+        min_value=1,
+    )
+    @ratelimit.limit("cases")
+    async def cases_command(
+        self, ctx: SlashContext, user: interactions.User | Member, before: int | None = None
+    ):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+
+        try:
+            # Grab one extra to know if there's another page
+            rows = await cases.user_cases(
+                ctx.guild.id, user.id, before, limit=config.CASES_PAGE_SIZE + 1
+            )
+        except Exception as e:
+            log.error("cases_lookup_failed", exc=e)
+            await ctx.send("❌ Couldn't load cases try again later", ephemeral=True)
+            return
+
+        if not rows:
+            await ctx.send(f"📁 No cases found for {user.mention}", ephemeral=True)
+            return
+
+        page = rows[: config.CASES_PAGE_SIZE]
+        lines = [f"📁 Cases for {user.mention}:"]
+        for case_id, moderator_id, action, reason, duration, created_at in page:
+            line = f"**#{case_id}** {action} by <@{moderator_id}> <t:{int(created_at)}:R>"
+            if duration:
+                line += f" for {format_delta(datetime.timedelta(seconds=duration))}"
+            if reason:
+                line += f" because {reason}"
+            lines.append(line)
+        if len(rows) > config.CASES_PAGE_SIZE:
+            lines.append(f"More: /cases user:{user.id} before:{page[-1][0]}")
+
+        text = "\n".join(lines)
+        if len(text) > 1990:  # Keep under Discord limits (2000 char)
+            text = text[:1990] + "..."
+        await ctx.send(text, ephemeral=True)
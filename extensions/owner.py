@@ -0,0 +1,43 @@
+# Owner commands
+# /stats, latency and error numbers from metrics.py
+from interactions import Extension, slash_command, SlashContext, check, is_owner
+
+import metrics
+
+
+class Owner(Extension):
+    # /stats
+    @slash_command(name="stats", description="Shows command latency stats (owner only)")
+    @check(is_owner())
+    async def stats_command(self, ctx: SlashContext):
+        lines = ["📊 Command latency (p50 / p95 / p99, ms)"]
+        for command, phases in sorted(metrics.summary().items()):
+            total = phases[metrics.TOTAL]
+            quantiles = " / ".join(
+                f"{total.quantile(q) * 1000:.0f}" for q in (0.5, 0.95, 0.99)
+            )
+            # Where the time goes on average
+            breakdown = ", ".join(
+                f"{name} {histogram.sum / histogram.count * 1000:.0f}"
+                for name, histogram in sorted(phases.items())
+                if name != metrics.TOTAL and histogram.count
+            )
+            lines.append(f"/{command}: {total.count} runs, {quantiles} ({breakdown})")
+        if len(lines) == 1:
+            lines.append("No commands run yet")
+
+        if metrics.errors:
+            errors_text = ", ".join(
+                f"{source} {error} x{count}"
+                for (source, error), count in sorted(metrics.errors.items())
+            )
+            lines.append(f"❌ Errors: {errors_text}")
+        lag = metrics.loop_lag
+        lines.append(
+            f"⏱️ Event loop lag: p50 {lag.quantile(0.5) * 1000:.1f}ms, "
+            f"p99 {lag.quantile(0.99) * 1000:.1f}ms"
+        )
+        report = "\n".join(lines)
+        if len(report) > 1990:  # Keep under Discord limits (2000 char)
+            report = report[:1990] + "..."
+        await ctx.send(report, ephemeral=True)
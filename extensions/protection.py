@@ -0,0 +1,346 @@
+# Protection
+# Automod, spam detection and anti-raid: the message and join listeners that feed them,
+# what happens when they catch someone and the /automod and /lockdown commands
+import datetime
+
+import interactions
+from interactions import (
+    Extension,
+    slash_command,
+    SlashContext,
+    OptionType,
+    slash_option,
+    Permissions,
+    Member,
+    SlashCommandChoice,
+    errors,
+)
+
+import antiraid
+import automod
+import bulk
+import cases
+import config
+from actions import ban_user, timeout_member
+from duration import format_delta
+import guild_cache
+import guild_settings
+import hierarchy
+import log
+import ratelimit
+import spam
+
+SPAM_REASONS = {
+    spam.FLOOD: "Automod: sending messages too fast",
+    spam.DUPLICATE: "Automod: sending the same message over and over",
+}
+
+
+def automod_exempt(author) -> bool:
+    # Mods can say whatever
+    return isinstance(author, Member) and author.has_permission(
+        Permissions.MANAGE_MESSAGES
+    )
+
+
+async def bot_can_act_on(guild: interactions.Guild, member: Member) -> bool:
+    # Same checks as the commands but with the bot as the moderator
+    guild_info = await guild_cache.get(guild)
+    checker = await hierarchy.checker(guild, guild_info.bot_member)
+    return checker.check(member) is None
+
+
+class Protection(Extension):
+    def __init__(self, bot: interactions.Client):
+        # Lockdown batches from antiraid come back here
+        antiraid.set_handler(self.raid_action)
+
+    # Anti-raid, watches for join bursts
+    @interactions.listen()
+    async def on_member_add(self, event: interactions.events.MemberAdd):
+        if event.member.bot:
+            return
+        joined = antiraid.member_joined(event.guild_id, event.member.id)
+        if joined.started:
+            log.warning("raid_detected", guild_id=event.guild_id, queued=joined.queued)
+            channel = event.guild.system_channel
+            if channel is not None:
+                try:
+                    await channel.send(
+                        f"🚨 Raid detected, lockdown is on and new joins get {antiraid.DONE_VERBS[config.RAID_ACTION]} "
+                        "(mods can end it with /lockdown end)"
+                    )
+                except Exception as e:
+                    log.warning("raid_alert_failed", guild_id=event.guild_id, error=str(e))
+
+    # Automod, every message gets checked against the server's banned terms and for spam
+    @interactions.listen()
+    async def on_message_create(self, event: interactions.events.MessageCreate):
+        message = event.message
+        if message._guild_id is None or message.author.bot:
+            return
+        rule = automod.check(message._guild_id, message.content)
+        if rule is None and automod.has_regexes(message._guild_id):
+            rule = await automod.check_regexes(message._guild_id, message.content)
+        if rule is not None:
+            await self.automod_action(message, rule)
+            return
+        problem = spam.tracker.check(message._guild_id, message.author.id, message.content)
+        if problem is not None:
+            await self.spam_action(message, problem)
+
+    async def automod_action(self, message: interactions.Message, rule: automod.Rule):
+        guild = message.guild
+        author = message.author
+        if automod_exempt(author):
+            return
+        reason = f"Automod: said a banned term ({rule.term})"
+        try:
+            await message.delete()
+            log.info("automod_deleted", guild_id=guild.id, user_id=author.id, term=rule.term)
+            if rule.action == "delete" or not isinstance(author, Member):
+                return
+
+            if not await bot_can_act_on(guild, author):
+                log.info("automod_outranked", guild_id=guild.id, user_id=author.id, action=rule.action)
+                return
+            if rule.action == "timeout":
+                delta = datetime.timedelta(
+                    seconds=guild_settings.get(guild.id)["automod_timeout"]
+                )
+                await timeout_member(guild.id, author, delta, self.bot.user.id, reason)
+            elif rule.action == "ban":
+                await ban_user(guild, author.id, self.bot.user.id, reason)
+            log.info("automod_action", guild_id=guild.id, user_id=author.id, action=rule.action)
+
+        # Error handling
+        except errors.NotFound:
+            pass  # Message already gone
+        except errors.Forbidden:
+            log.warning(
+                "missing_permissions", command="automod", guild_id=guild.id, user_id=author.id
+            )
+        except Exception as e:
+            log.error("automod_failed", guild_id=guild.id, exc=e)
+
+    async def spam_action(self, message: interactions.Message, problem: str):
+        guild = message.guild
+        author = message.author
+        if not isinstance(author, Member) or automod_exempt(author):
+            return
+        try:
+            if not await bot_can_act_on(guild, author):
+                log.info("automod_outranked", guild_id=guild.id, user_id=author.id, action="timeout")
+                return
+            delta = datetime.timedelta(seconds=spam.settings(guild.id)["timeout"])
+            await timeout_member(
+                guild.id, author, delta, self.bot.user.id, SPAM_REASONS[problem]
+            )
+            log.info("spam_timeout", guild_id=guild.id, user_id=author.id, problem=problem)
+
+        # Error handling
+        except errors.Forbidden:
+            log.warning("missing_permissions", command="spam", guild_id=guild.id, user_id=author.id)
+        except Exception as e:
+            log.error("spam_timeout_failed", guild_id=guild.id, exc=e)
+
+    # Lockdown batches from antiraid
+    async def raid_action(self, guild_id: int, user_ids: list[int]):
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+        reason = "Anti-raid lockdown"
+        guild_info = await guild_cache.get(guild)
+        checker = await hierarchy.checker(guild, guild_info.bot_member)
+        members = await bulk.fetch_members(guild, user_ids)
+        # Only people still in the server the bot outranks
+        targets = [
+            user_id
+            for user_id in user_ids
+            if members.get(user_id) is not None and checker.check(members[user_id]) is None
+        ]
+
+        duration = None
+        if config.RAID_ACTION == "ban":
+            result = await bulk.ban_many(guild, targets, reason)
+        else:
+            if config.RAID_ACTION == "timeout":
+                duration = config.RAID_TIMEOUT
+                end_time = datetime.datetime.now(
+                    datetime.timezone.utc
+                ) + datetime.timedelta(seconds=duration)
+
+                async def act(user_id: int):
+                    await members[user_id].timeout(
+                        communication_disabled_until=end_time, reason=reason
+                    )
+            else:
+
+                async def act(user_id: int):
+                    await guild.kick(user_id, reason=reason)
+
+            result = await bulk.run(targets, act)
+
+        for user_id in result.succeeded:
+            cases.log_case(
+                guild_id, user_id, self.bot.user.id, config.RAID_ACTION, reason, duration
+            )
+        log.info(
+            "raid_action",
+            guild_id=guild_id,
+            action=config.RAID_ACTION,
+            done=len(result.succeeded),
+            failed=len(result.failed),
+            skipped=len(user_ids) - len(targets),
+        )
+
+    # /automod
+    @slash_command(
+        name="automod",
+        description="Manages the server's banned words",
+        default_member_permissions=Permissions.MANAGE_GUILD,
+    )
+    async def automod_base_command(self, ctx: SlashContext):
+        pass
+
+    # /automod add
+    @automod_base_command.subcommand(
+        sub_cmd_name="add",
+        sub_cmd_description="Adds a banned word (or a regex starting with re:)",
+    )
+    @slash_option(
+        name="term",
+        description="Word or phrase to block, start it with re: for a regex",
+        required=True,
+        opt_type=OptionType.STRING,
+        max_length=200,
+    )
+    @slash_option(
+        name="action",
+        description="What happens when someone says it (default is delete)",
+        required=False,
+        opt_type=OptionType.STRING,
+        choices=[
+            SlashCommandChoice(name="Delete the message", value="delete"),
+            SlashCommandChoice(name="Delete and timeout", value="timeout"),
+            SlashCommandChoice(name="Delete and ban", value="ban"),
+        ],
+    )
+    @ratelimit.limit("automod")
+    async def automod_add_subcommand(self, ctx: SlashContext, term: str, action: str = "delete"):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        try:
+            term = automod.add_term(ctx.guild.id, term, action)
+        except automod.AutomodError as e:
+            await ctx.send(f"❌ {e}", ephemeral=True)
+            return
+        await ctx.send(f"✅ Added `{term}` ({action})", ephemeral=True)
+        log.info("automod_term_added", guild_id=ctx.guild_id, moderator_id=ctx.author_id, action=action)
+
+    # /automod remove
+    @automod_base_command.subcommand(
+        sub_cmd_name="remove",
+        sub_cmd_description="Removes a banned word",
+    )
+    @slash_option(
+        name="term",
+        description="The word or regex to remove",
+        required=True,
+        opt_type=OptionType.STRING,
+    )
+    @ratelimit.limit("automod")
+    async def automod_remove_subcommand(self, ctx: SlashContext, term: str):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        if not automod.remove_term(ctx.guild.id, term):
+            await ctx.send("❌ That term isn't on the list", ephemeral=True)
+            return
+        await ctx.send("✅ Removed it", ephemeral=True)
+        log.info("automod_term_removed", guild_id=ctx.guild_id, moderator_id=ctx.author_id)
+
+    # /automod list
+    @automod_base_command.subcommand(
+        sub_cmd_name="list",
+        sub_cmd_description="Shows the server's banned words",
+    )
+    @ratelimit.limit("automod")
+    async def automod_list_subcommand(self, ctx: SlashContext):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        rules = automod.terms(ctx.guild.id)
+        if not rules:
+            await ctx.send("No banned words yet, add some with /automod add", ephemeral=True)
+            return
+        report = f"🛡️ {len(rules)} banned terms:\n" + "\n".join(
+            f"- `{rule.term}` ({rule.action})" for rule in rules
+        )
+        if len(report) > 1990:  # Keep under Discord limits (2000 char)
+            report = report[:1990] + "..."
+        await ctx.send(report, ephemeral=True)
+
+    # /lockdown
+    @slash_command(
+        name="lockdown",
+        description="Manages raid lockdown",
+        default_member_permissions=Permissions.KICK_MEMBERS,
+    )
+    async def lockdown_base_command(self, ctx: SlashContext):
+        pass
+
+    # /lockdown start
+    @lockdown_base_command.subcommand(
+        sub_cmd_name="start",
+        sub_cmd_description="Starts a lockdown, everyone who joins gets handled like a raider",
+    )
+    @slash_option(
+        name="minutes",
+        description="How long it lasts without new joins (default is 5)",
+        required=False,
+        opt_type=OptionType.INTEGER,
+        min_value=1,
+        max_value=1440,
+    )
+    async def lockdown_start_subcommand(self, ctx: SlashContext, minutes: int = 5):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        antiraid.start_lockdown(ctx.guild.id, minutes * 60)
+        await ctx.send(
+            f"🔒 Lockdown started, new joins get {antiraid.DONE_VERBS[config.RAID_ACTION]} for {minutes} minutes"
+        )
+        log.info("lockdown_started", guild_id=ctx.guild_id, moderator_id=ctx.author_id)
+
+    # /lockdown end
+    @lockdown_base_command.subcommand(
+        sub_cmd_name="end",
+        sub_cmd_description="Ends the lockdown",
+    )
+    async def lockdown_end_subcommand(self, ctx: SlashContext):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        if not antiraid.end_lockdown(ctx.guild.id):
+            await ctx.send("❌ There's no lockdown right now", ephemeral=True)
+            return
+        await ctx.send("🔓 Lockdown ended")
+        log.info("lockdown_ended", guild_id=ctx.guild_id, moderator_id=ctx.author_id)
+
+    # /lockdown status
+    @lockdown_base_command.subcommand(
+        sub_cmd_name="status",
+        sub_cmd_description="Shows if there's a lockdown",
+    )
+    async def lockdown_status_subcommand(self, ctx: SlashContext):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        remaining = antiraid.lockdown_remaining(ctx.guild.id)
+        if not remaining:
+            await ctx.send("🔓 No lockdown right now", ephemeral=True)
+            return
+        left = format_delta(datetime.timedelta(seconds=int(remaining)))
+        await ctx.send(f"🔒 Locked down, ends in {left} if joins stop", ephemeral=True)
@@ -0,0 +1,145 @@
+# Server settings
+# /settings show, set, reset and reload, the settings themselves live in guild_settings.py
+from interactions import (
+    Extension,
+    slash_command,
+    SlashContext,
+    OptionType,
+    slash_option,
+    Permissions,
+    SlashCommandChoice,
+    check,
+    is_owner,
+)
+
+import guild_settings
+import log
+import ratelimit
+
+SETTING_CHOICES = [SlashCommandChoice(name=key, value=key) for key in guild_settings.SETTINGS]
+
+
+class Settings(Extension):
+    # /settings
+    @slash_command(
+        name="settings",
+        description="Changes how EasyMod works in this server",
+        default_member_permissions=Permissions.MANAGE_GUILD,
+    )
+    async def settings_base_command(self, ctx: SlashContext):
+        pass
+
+    # /settings show
+    @settings_base_command.subcommand(
+        sub_cmd_name="show",
+        sub_cmd_description="Shows this server's settings",
+    )
+    @ratelimit.limit("settings")
+    async def settings_show_subcommand(self, ctx: SlashContext):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        changed = guild_settings.overrides(ctx.guild_id)
+        lines = ["⚙️ Settings (change them with /settings set)"]
+        for key, value in guild_settings.get(ctx.guild_id).items():
+            marker = "" if key in changed else " (default)"
+            lines.append(
+                f"- `{key}`: {guild_settings.show(key, value)}{marker}, "
+                f"{guild_settings.SETTINGS[key].description.lower()}"
+            )
+        await ctx.send("\n".join(lines), ephemeral=True)
+
+    # /settings set
+    @settings_base_command.subcommand(
+        sub_cmd_name="set",
+        sub_cmd_description="Changes a setting",
+    )
+    @slash_option(
+        name="setting",
+        description="Which one",
+        required=True,
+        opt_type=OptionType.STRING,
+        choices=SETTING_CHOICES,
+    )
+    @slash_option(
+        name="value",
+        description="The new value (a number, or a duration like 10m or 7d for times)",
+        required=True,
+        opt_type=OptionType.STRING,
+        max_length=50,
+    )
+    @ratelimit.limit("settings")
+    async def settings_set_subcommand(self, ctx: SlashContext, setting: str, value: str):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        try:
+            new = await guild_settings.change(ctx.guild_id, setting, value)
+        except guild_settings.SettingError as e:
+            await ctx.send(f"❌ {e}", ephemeral=True)
+            return
+        except Exception as e:
+            log.error("guild_settings_save_failed", guild_id=ctx.guild_id, exc=e)
+            await ctx.send("❌ Couldn't save the setting try again later", ephemeral=True)
+            return
+        await ctx.send(
+            f"✅ `{setting}` is now {guild_settings.show(setting, new)}", ephemeral=True
+        )
+        log.info(
+            "guild_setting_changed",
+            guild_id=ctx.guild_id,
+            moderator_id=ctx.author_id,
+            key=setting,
+            value=new,
+        )
+
+    # /settings reset
+    @settings_base_command.subcommand(
+        sub_cmd_name="reset",
+        sub_cmd_description="Puts a setting (or all of them) back to the default",
+    )
+    @slash_option(
+        name="setting",
+        description="Which one, leave it empty to reset everything",
+        required=False,
+        opt_type=OptionType.STRING,
+        choices=SETTING_CHOICES,
+    )
+    @ratelimit.limit("settings")
+    async def settings_reset_subcommand(self, ctx: SlashContext, setting: str | None = None):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        try:
+            if setting is None:
+                await guild_settings.reset(ctx.guild_id)
+            else:
+                default = await guild_settings.change(ctx.guild_id, setting, None)
+        except Exception as e:
+            log.error("guild_settings_save_failed", guild_id=ctx.guild_id, exc=e)
+            await ctx.send("❌ Couldn't save the setting try again later", ephemeral=True)
+            return
+        if setting is None:
+            await ctx.send("✅ Everything's back to the defaults", ephemeral=True)
+        else:
+            await ctx.send(
+                f"✅ `{setting}` is back to the default ({guild_settings.show(setting, default)})",
+                ephemeral=True,
+            )
+        log.info("guild_settings_reset", guild_id=ctx.guild_id, moderator_id=ctx.author_id, key=setting)
+
+    # /settings reload
+    @settings_base_command.subcommand(
+        sub_cmd_name="reload",
+        sub_cmd_description="Reloads the settings file right away (owner only)",
+    )
+    @check(is_owner())
+    async def settings_reload_subcommand(self, ctx: SlashContext):
+        try:
+            count = await guild_settings.reload()
+        except Exception as e:
+            log.error("guild_settings_reload_failed", exc=e)
+            await ctx.send(f"❌ Couldn't reload the settings file: {e}", ephemeral=True)
+            return
+        await ctx.send(f"✅ Reloaded, {count} servers have their own settings", ephemeral=True)
+        log.info("guild_settings_reloaded", guilds=count)
@@ -0,0 +1,115 @@
+# Shared ban list
+# /banlist join, leave and status, the syncing itself lives in banlist.py
+from interactions import (
+    Extension,
+    slash_command,
+    SlashContext,
+    OptionType,
+    slash_option,
+    Permissions,
+)
+
+import banlist
+import log
+import ratelimit
+
+
+class SharedBans(Extension):
+    # /banlist
+    @slash_command(
+        name="banlist",
+        description="Manages this server's spot on the shared ban list",
+        default_member_permissions=Permissions.ADMINISTRATOR,
+    )
+    async def banlist_base_command(self, ctx: SlashContext):
+        pass
+
+    # /banlist join
+    @banlist_base_command.subcommand(
+        sub_cmd_name="join",
+        sub_cmd_description="Bans everyone on the shared ban list here and keeps it that way",
+    )
+    @slash_option(
+        name="share",
+        description="Add this server's permanent /bans to the list too (default is no)",
+        required=False,
+        opt_type=OptionType.BOOLEAN,
+    )
+    @ratelimit.limit("banlist")
+    async def banlist_join_subcommand(self, ctx: SlashContext, share: bool = False):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        # Partner servers are picked by the bot owner, anyone else could ban people everywhere
+        if not banlist.can_join(ctx.guild_id):
+            await ctx.send(
+                "❌ This server isn't one of the bot's partner servers, ask the bot owner to add it",
+                ephemeral=True,
+            )
+            log.warning("banlist_join_denied", guild_id=ctx.guild_id, moderator_id=ctx.author_id)
+            return
+        if share and not banlist.can_share(ctx.guild_id):
+            await ctx.send(
+                "❌ This server can't add bans to the shared list, ask the bot owner or join"
+                " with share off",
+                ephemeral=True,
+            )
+            log.warning("banlist_share_denied", guild_id=ctx.guild_id, moderator_id=ctx.author_id)
+            return
+        new = banlist.subscribe(ctx.guild_id, share)
+        sharing = "and this server's bans get shared" if share else "without sharing this server's bans"
+        if new:
+            await ctx.send(
+                f"✅ Joined the shared ban list {sharing}, the {banlist.size()} users on it"
+                " will get banned here over the next few minutes",
+                ephemeral=True,
+            )
+        else:
+            await ctx.send(f"✅ Updated, still on the shared ban list {sharing}", ephemeral=True)
+        log.info("banlist_joined", guild_id=ctx.guild_id, moderator_id=ctx.author_id, share=share)
+
+    # /banlist leave
+    @banlist_base_command.subcommand(
+        sub_cmd_name="leave",
+        sub_cmd_description="Stops syncing the shared ban list (bans it already made stay)",
+    )
+    @ratelimit.limit("banlist")
+    async def banlist_leave_subcommand(self, ctx: SlashContext):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        if not banlist.unsubscribe(ctx.guild_id):
+            await ctx.send("❌ This server isn't on the shared ban list", ephemeral=True)
+            return
+        await ctx.send("✅ Left the shared ban list", ephemeral=True)
+        log.info("banlist_left", guild_id=ctx.guild_id, moderator_id=ctx.author_id)
+
+    # /banlist status
+    @banlist_base_command.subcommand(
+        sub_cmd_name="status",
+        sub_cmd_description="Shows how this server is doing with the shared ban list",
+    )
+    @ratelimit.limit("banlist")
+    async def banlist_status_subcommand(self, ctx: SlashContext):
+        if not ctx.guild:
+            await ctx.send("❌ Command must be run in a server", ephemeral=True)
+            return
+        sub = banlist.subscriber(ctx.guild_id)
+        if sub is None:
+            await ctx.send(
+                f"This server isn't on the shared ban list ({banlist.size()} users on it),"
+                " join with /banlist join",
+                ephemeral=True,
+            )
+            return
+        if banlist.is_syncing(ctx.guild_id) or sub.full or sub.todo:
+            state = "syncing"
+        else:
+            state = "in sync"
+        await ctx.send(
+            f"🛡️ Shared ban list: {banlist.size()} users, {state}\n"
+            f"- Banned here by the list: {len(sub.applied)}\n"
+            f"- Unbanned here by hand (won't be banned again): {len(sub.pardoned)}\n"
+            f"- Sharing this server's bans: {'yes' if sub.share else 'no'}",
+            ephemeral=True,
+        )
@@ -0,0 +1,106 @@
+# Gateway profiles
+# Works out which intents to subscribe to from what the bot actually uses, and sizes the
+# library caches. Presence and typing events alone can be most of a big guild's traffic
+# and EasyMod never looks at them
+from interactions import Client, Intents, smart_cache
+
+import config
+
+# What each part of the bot needs from the gateway
+FEATURE_INTENTS = {
+    # Guild and role events keep the guild cache and hierarchy table fresh
+    "commands": Intents.GUILDS,
+    # Member updates keep cached members (and the bot's own roles) fresh, ban events
+    # cancel pending temp ban expiries when someone gets unbanned by hand
+    "moderation": Intents.GUILDS | Intents.GUILD_MEMBERS | Intents.GUILD_MODERATION,
+    # Automod reads every message (Message Content is privileged)
+    "automod": Intents.GUILD_MESSAGES | Intents.MESSAGE_CONTENT,
+}
+
+PROFILES = {
+    "full": None,  # Everything, with the library's default caches
+    "moderation": ("commands", "moderation", "automod"),
+    "minimal": ("commands",),
+}
+
+# Rough gateway events per member per hour for a typical active server, only used for
+# the startup report so it doesn't need to be exact
+EVENT_RATES = {
+    Intents.GUILD_PRESENCES: 20.0,
+    Intents.GUILD_MESSAGE_TYPING: 3.0,
+    Intents.GUILD_MESSAGES: 2.0,
+    Intents.GUILD_MESSAGE_REACTIONS: 1.0,
+    Intents.GUILD_VOICE_STATES: 0.5,
+    Intents.GUILD_MEMBERS: 0.05,
+    Intents.GUILD_MESSAGE_POLLS: 0.01,
+    Intents.GUILDS: 0.01,
+}
+# Rough bytes per cached object
+MEMBER_BYTES = 1200
+MESSAGE_BYTES = 2500
+
+
+def _profile(name: str):
+    if name not in PROFILES:
+        raise ValueError(
+            f"Unknown GATEWAY_PROFILE '{name}' (pick one of {', '.join(PROFILES)})"
+        )
+    return PROFILES[name]
+
+
+def intents_for(name: str) -> Intents:
+    features = _profile(name)
+    if features is None:
+        return Intents.ALL
+    intents = Intents.NONE
+    for feature in features:
+        intents |= FEATURE_INTENTS[feature]
+    return intents
+
+
+def cache_settings(name: str) -> dict:
+    # Extra Client() kwargs for the profile's caches
+    if _profile(name) is None:
+        return {}
+    return {
+        # TTLCache moves entries to the back when they're used so this evicts LRU
+        "member_cache": smart_cache.create_cache(
+            ttl=config.MEMBER_CACHE_TTL, hard_limit=config.MEMBER_CACHE_SIZE
+        ),
+        "message_cache": smart_cache.create_cache(
+            ttl=config.MESSAGE_CACHE_TTL, hard_limit=config.MESSAGE_CACHE_SIZE
+        ),
+    }
+
+
+def client_kwargs(name: str) -> dict:
+    return {"intents": intents_for(name), **cache_settings(name)}
+
+
+def _events_per_hour(intents: Intents, members: int) -> float:
+    return sum(rate for flag, rate in EVENT_RATES.items() if flag in intents) * members
+
+
+def startup_report(bot: Client, name: str) -> str:
+    intents = intents_for(name)
+    guilds = bot.guilds or []
+    members = sum(guild.member_count for guild in guilds)
+    events = _events_per_hour(intents, members)
+    full_events = _events_per_hour(Intents.ALL, members)
+
+    # Read the limits off the real caches so this is right for every profile
+    member_limit = getattr(bot.cache.member_cache, "hard_limit", None)
+    message_limit = getattr(bot.cache.message_cache, "hard_limit", None)
+    member_cap = f"<= {member_limit:,}" if member_limit else "unbounded"
+    message_cap = f"<= {message_limit:,}" if message_limit else "unbounded"
+    member_mb = min(members, member_limit or members) * MEMBER_BYTES / 1e6
+    message_mb = (message_limit or len(bot.cache.message_cache)) * MESSAGE_BYTES / 1e6
+
+    intent_names = ", ".join(flag.name for flag in Intents if flag in intents)
+    return (
+        f"Gateway profile '{name}': {intent_names}\n"
+        f"Estimated gateway events: ~{events:,.0f}/hour for {len(guilds)} guilds "
+        f"({members:,} members), the full profile would be ~{full_events:,.0f}/hour\n"
+        f"Estimated cache footprint: members {member_cap} (~{member_mb:.1f} MB), "
+        f"messages {message_cap} (~{message_mb:.1f} MB)"
+    )
@@ -0,0 +1,61 @@
+# Guild cache
+# Moderation commands used to fetch the server owner and the bot's own member on every
+# run, that's two REST calls per command. This keeps both per guild and listeners in
+# main.py keep them fresh from gateway events (role ranks live in hierarchy.py)
+from interactions import Guild, Member, errors
+
+
+class GuildInfo:
+    __slots__ = ("owner_id", "bot_member")
+
+    def __init__(self, owner_id: int, bot_member: Member | None):
+        self.owner_id = owner_id
+        self.bot_member = bot_member
+
+
+_guilds: dict[int, GuildInfo] = {}
+
+
+async def get(guild: Guild) -> GuildInfo:
+    info = _guilds.get(guild.id)
+    if info is not None and info.bot_member is not None:
+        return info
+
+    # The owner id comes with the guild itself, no need to fetch the owner's member
+    owner_id = int(guild._owner_id)
+    # guild.me is served from the client cache, only go to REST when it's missing
+    bot_member = guild.me
+    if bot_member is None:
+        try:
+            bot_member = await guild.fetch_member(guild._client.user.id)
+        except errors.NotFound:
+            bot_member = None
+    info = GuildInfo(owner_id, bot_member)
+    _guilds[guild.id] = info
+    return info
+
+
+# Gateway event hooks
+def guild_updated(guild: Guild):
+    info = _guilds.get(guild.id)
+    if info is not None:
+        # Ownership transfers come through here
+        info.owner_id = int(guild._owner_id)
+
+
+def guild_removed(guild_id: int):
+    _guilds.pop(guild_id, None)
+
+
+def member_updated(guild_id: int, member: Member):
+    info = _guilds.get(guild_id)
+    if info is not None and member.id == member._client.user.id:
+        # Our roles (and so our place in the hierarchy) might have changed
+        info.bot_member = member
+
+
+def guild_available(guild: Guild):
+    # GUILD_CREATE comes with the bot's own member, keep it now so a bounded member cache
+    # dropping it later doesn't cost a fetch on the first command after a restart
+    if guild.id not in _guilds and guild.me is not None:
+        _guilds[guild.id] = GuildInfo(int(guild._owner_id), guild.me)
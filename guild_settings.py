@@ -0,0 +1,246 @@
+# Per server settings
+# Servers can change a few things for themselves with /settings (how many days of
+# messages /ban deletes, the longest timeout mods can give, spam thresholds and so on),
+# anything they haven't touched falls back to config.py. Everything's kept in one JSON
+# file that gets loaded into memory at startup so lookups are just dict lookups and
+# never touch the disk. A background task checks the file every few seconds and reloads
+# it when it changes so hand edits (or another worker saving) apply without a restart,
+# /settings reload does it right away
+import asyncio
+import datetime
+import json
+import os
+from typing import NamedTuple
+
+import config
+import log
+from duration import format_delta, parse_duration
+
+DISCORD_MAX_TIMEOUT = 28 * 86400  # Discord won't time anyone out for longer
+
+
+class SettingError(Exception):
+    # Raised for values that aren't allowed
+    pass
+
+
+class Setting(NamedTuple):
+    description: str
+    low: int
+    high: int
+    duration: bool = False  # Takes durations like 10m or 7d instead of plain numbers
+
+
+SETTINGS = {
+    "ban_delete_days": Setting("Days of messages /ban and /massban delete by default", 0, 7),
+    "max_timeout": Setting("Longest timeout mods can give", 60, DISCORD_MAX_TIMEOUT, True),
+    "automod_timeout": Setting("How long automod times people out for", 60, DISCORD_MAX_TIMEOUT, True),
+    "spam_messages": Setting("Messages within spam_seconds that count as a flood", 2, 50),
+    "spam_seconds": Setting("Seconds spam_messages have to be sent in to be a flood", 1, 60),
+    "spam_duplicates": Setting("Same message this many times is spam (0 turns it off)", 0, 20),
+    "spam_timeout": Setting("How long spammers get timed out for", 60, DISCORD_MAX_TIMEOUT, True),
+    "wiki_sentences": Setting("Sentences /wikipedia shows", 1, 10),
+    "wiki_max_chars": Setting("Max characters /wikipedia shows", 100, 1990),
+}  # fmt: skip
+
+
+def defaults() -> dict[str, int]:
+    return {
+        "ban_delete_days": config.BAN_DELETE_DAYS,
+        "max_timeout": DISCORD_MAX_TIMEOUT,
+        "automod_timeout": config.AUTOMOD_TIMEOUT,
+        "spam_messages": config.SPAM_DEFAULTS["messages"],
+        "spam_seconds": config.SPAM_DEFAULTS["seconds"],
+        "spam_duplicates": config.SPAM_DEFAULTS["duplicates"],
+        "spam_timeout": config.SPAM_DEFAULTS["timeout"],
+        "wiki_sentences": config.WIKI_SENTENCES,
+        "wiki_max_chars": config.WIKI_MAX_CHARS,
+    }
+
+
+def parse(key: str, value: str | int) -> int:
+    # Values from /settings come in as text, from the file as numbers
+    setting = SETTINGS.get(key)
+    if setting is None:
+        raise SettingError(f"There's no setting called {key}")
+    if isinstance(value, str):
+        value = value.strip()
+        if setting.duration and not value.isdigit():
+            parsed = parse_duration(value)
+            if parsed is None:
+                raise SettingError(f"{key} takes a duration like 10m, 1h or 7d")
+            value = parsed.seconds
+        else:
+            try:
+                value = int(value)
+            except ValueError:
+                raise SettingError(f"{key} takes a whole number")
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise SettingError(f"{key} takes a whole number")
+    if not setting.low <= value <= setting.high:
+        raise SettingError(f"{key} has to be between {show(key, setting.low)} and {show(key, setting.high)}")
+    return value
+
+
+def show(key: str, value: int) -> str:
+    if SETTINGS[key].duration:
+        return format_delta(datetime.timedelta(seconds=value))
+    return str(value)
+
+
+_defaults = defaults()
+_overrides: dict[int, dict[str, int]] = {}  # guild id -> only what they changed
+_resolved: dict[int, dict[str, int]] = {}  # guild id -> every setting, built on first use
+_sections: dict[tuple[int | None, str], dict[str, int]] = {}
+_stamp: tuple[int, int] | None = None  # mtime and size of the file when we last read it
+_save_lock = asyncio.Lock()
+_task: asyncio.Task | None = None
+
+
+def get(guild_id: int | None) -> dict[str, int]:
+    # Every setting for the server, the dict is shared so don't change it
+    resolved = _resolved.get(guild_id)
+    if resolved is not None:
+        return resolved
+    overrides = _overrides.get(guild_id)
+    if overrides is None:
+        return _defaults  # Most servers, nothing worth caching
+    resolved = _resolved[guild_id] = {**_defaults, **overrides}
+    return resolved
+
+
+def section(guild_id: int | None, prefix: str) -> dict[str, int]:
+    # The settings starting with prefix with it cut off, like section(id, "spam_")["timeout"]
+    key = (guild_id if guild_id in _overrides else None, prefix)
+    found = _sections.get(key)
+    if found is None:
+        found = _sections[key] = {
+            name[len(prefix):]: value
+            for name, value in get(guild_id).items()
+            if name.startswith(prefix)
+        }
+    return found
+
+
+def overrides(guild_id: int) -> dict[str, int]:
+    return dict(_overrides.get(guild_id, {}))
+
+
+def _clear_caches():
+    _resolved.clear()
+    _sections.clear()
+
+
+# The file
+def _file_stamp() -> tuple[int, int] | None:
+    try:
+        stat = os.stat(config.GUILD_SETTINGS_PATH)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read() -> tuple[tuple[int, int] | None, dict[int, dict[str, int]]]:
+    # Runs on a thread, bad entries get logged and skipped instead of breaking everything
+    stamp = _file_stamp()
+    if stamp is None:
+        return None, {}
+    with open(config.GUILD_SETTINGS_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    loaded = {}
+    for guild_id, values in data.items():
+        good = {}
+        for key, value in values.items():
+            try:
+                good[key] = parse(key, value)
+            except SettingError as e:
+                log.warning("guild_setting_invalid", guild_id=guild_id, key=key, error=str(e))
+        if good:
+            loaded[int(guild_id)] = good
+    return stamp, loaded
+
+
+def _write(data: dict) -> tuple[int, int] | None:
+    # Same trick as command_sync, write a temp file and swap it in so a crash halfway
+    # (or the watcher reading at the wrong moment) never sees half a file
+    path = config.GUILD_SETTINGS_PATH
+    tmp = f"{path}.{os.getpid()}.tmp"  # Workers could be saving at the same time
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return _file_stamp()
+
+
+async def reload() -> int:
+    # Returns how many servers have settings
+    global _defaults, _overrides, _stamp
+    stamp, loaded = await asyncio.to_thread(_read)
+    _defaults = defaults()
+    _overrides = loaded
+    _stamp = stamp
+    _clear_caches()
+    return len(loaded)
+
+
+async def _save():
+    global _stamp
+    data = {str(guild_id): values for guild_id, values in _overrides.items()}
+    _stamp = await asyncio.to_thread(_write, data)
+
+
+async def change(guild_id: int, key: str, value: str | None) -> int:
+    # Sets a setting (None resets it to the default), returns the new value
+    new = None if value is None else parse(key, value)
+    async with _save_lock:
+        # Pick up anything another worker or a hand edit saved first so it isn't lost
+        if await asyncio.to_thread(_file_stamp) != _stamp:
+            await reload()
+        values = dict(_overrides.get(guild_id, {}))
+        if new is None:
+            values.pop(key, None)
+        else:
+            values[key] = new
+        if values:
+            _overrides[guild_id] = values
+        else:
+            _overrides.pop(guild_id, None)
+        _clear_caches()
+        await _save()
+    return new if new is not None else _defaults[key]
+
+
+async def reset(guild_id: int):
+    # Back to the defaults for everything
+    async with _save_lock:
+        if await asyncio.to_thread(_file_stamp) != _stamp:
+            await reload()
+        if _overrides.pop(guild_id, None) is None:
+            return
+        _clear_caches()
+        await _save()
+
+
+async def _watch():
+    global _stamp
+    while True:
+        await asyncio.sleep(config.GUILD_SETTINGS_RELOAD_INTERVAL)
+        try:
+            if _save_lock.locked() or await asyncio.to_thread(_file_stamp) == _stamp:
+                continue
+            count = await reload()
+            log.info("guild_settings_reloaded", guilds=count)
+        except Exception as e:
+            # Like a hand edit that isn't valid JSON, keep what we had until it changes again
+            log.warning("guild_settings_reload_failed", error=str(e))
+            _stamp = await asyncio.to_thread(_file_stamp)
+
+
+async def start():
+    global _task
+    if _task is not None:
+        return
+    try:
+        await reload()
+    except Exception as e:
+        log.error("guild_settings_reload_failed", exc=e)
+    _task = asyncio.create_task(_watch())
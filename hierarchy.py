@@ -0,0 +1,118 @@
+# Role hierarchy checks
+# Keeps a role id -> rank table per guild (kept up to date by the role listeners in
+# main.py) so "can X act on Y" is just comparing two ints instead of sorting role objects
+# Ranks sort the same way interactions' Role comparisons do: by position, then by id
+from interactions import Guild, Member, Role
+
+import guild_cache
+
+# check() results
+TARGET_OWNER = "owner"  # Target owns the server
+AUTHOR_TOO_LOW = "author"  # Target's top role is >= the author's
+BOT_TOO_LOW = "bot"  # Target's top role is >= the bot's
+
+_UNKNOWN_TARGET_RANK = float("inf")  # Unknown roles count as high for targets...
+_UNKNOWN_ACTOR_RANK = -1  # ...and low for actors, so a stale table never lets anything through
+
+_ranks: dict[int, dict[int, int]] = {}  # guild id -> {role id: rank}
+
+
+class HierarchyError(Exception):
+    # Raised when a check can't be done (like the bot not being found in the server)
+    pass
+
+
+def role_rank(role: Role) -> int:
+    if role.id == role._guild_id:
+        return 0  # @everyone is always at the bottom
+    return (role.position << 64) | int(role.id)
+
+
+def _table(guild: Guild) -> dict[int, int]:
+    table = _ranks.get(guild.id)
+    if table is None:
+        table = {}
+        for role_id in guild._role_ids:
+            role = guild._client.cache.get_role(role_id)
+            if role is not None:
+                table[int(role_id)] = role_rank(role)
+        _ranks[guild.id] = table
+    return table
+
+
+def _member_rank(guild: Guild, table: dict[int, int], member: Member, unknown) -> int:
+    # Top role rank, only looks at the member's own role ids
+    best = 0
+    for role_id in member._role_ids:
+        rank = table.get(role_id)
+        if rank is None:
+            role = guild._client.cache.get_role(role_id)
+            if role is None:
+                return unknown
+            rank = table[int(role_id)] = role_rank(role)
+        if rank > best:
+            best = rank
+    return best
+
+
+class Checker:
+    # Precomputed owner/author/bot ranks for one guild, checking a target is O(1) after
+    # its top role is known so this can be reused to check lots of targets at once
+    __slots__ = ("_guild", "_table", "owner_id", "actor_id", "actor_rank", "bot_rank")
+
+    def __init__(self, guild: Guild, actor: Member, guild_info: guild_cache.GuildInfo):
+        self._guild = guild
+        self._table = _table(guild)
+        self.owner_id = guild_info.owner_id
+        self.actor_id = actor.id
+        self.actor_rank = _member_rank(
+            guild, self._table, actor, _UNKNOWN_ACTOR_RANK
+        )
+        self.bot_rank = _member_rank(
+            guild, self._table, guild_info.bot_member, _UNKNOWN_ACTOR_RANK
+        )
+
+    def rank(self, member: Member) -> int:
+        return _member_rank(self._guild, self._table, member, _UNKNOWN_TARGET_RANK)
+
+    def check_rank(self, target_id: int, target_rank: int) -> str | None:
+        if target_id == self.owner_id:
+            return TARGET_OWNER
+        # Owner bypasses the author check
+        if self.actor_id != self.owner_id and target_rank >= self.actor_rank:
+            return AUTHOR_TOO_LOW
+        if target_rank >= self.bot_rank:
+            return BOT_TOO_LOW
+        return None
+
+    def check(self, target: Member | None, target_id: int | None = None) -> str | None:
+        # Pass target=None with a target_id for users that aren't in the server,
+        # only the owner check applies to them
+        if target is None:
+            return TARGET_OWNER if target_id == self.owner_id else None
+        return self.check_rank(target.id, self.rank(target))
+
+
+async def checker(guild: Guild, actor: Member) -> Checker:
+    guild_info = await guild_cache.get(guild)
+    if not guild_info.bot_member:
+        raise HierarchyError("Bot id object not found")
+    return Checker(guild, actor, guild_info)
+
+
+# Role event hooks
+def role_updated(guild_id: int, role: Role):
+    # Covers created roles too, reorders send an update for every role that moved
+    table = _ranks.get(guild_id)
+    if table is not None:
+        table[int(role.id)] = role_rank(role)
+
+
+def role_deleted(guild_id: int, role_id: int):
+    table = _ranks.get(guild_id)
+    if table is not None:
+        table.pop(int(role_id), None)
+
+
+def guild_removed(guild_id: int):
+    _ranks.pop(guild_id, None)
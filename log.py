@@ -0,0 +1,158 @@
+# Logging
+# Structured logs (one JSON object per line) that never make a command wait on stdout.
+# log.info("timeout_added", guild_id=..., user_id=...) just puts the record in an
+# in-memory ring buffer, a background thread turns them into lines and writes them out
+# in batches. When the buffer's full the oldest records get dropped (and counted) so a
+# stuck pipe can't stall moderation. Levels below LOG_LEVEL are thrown away before
+# anything else happens and noisy events can be sampled with LOG_SAMPLE
+import atexit
+import json
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import config
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+_min_level = LEVELS[config.LOG_LEVEL]
+_buffer: deque = deque(maxlen=config.LOG_BUFFER_SIZE)
+_wake = threading.Event()
+_lock = threading.Lock()  # Only held while writing, so close() doesn't write over the thread
+_writer: threading.Thread | None = None
+dropped = 0  # Records thrown out because the buffer was full
+_dropped_reported = 0
+
+
+def _emit(level: int, event: str, fields: dict):
+    global dropped
+    if level < _min_level:
+        return
+    rate = config.LOG_SAMPLE.get(event)
+    if rate is not None and random.random() >= rate:
+        return
+    if len(_buffer) == _buffer.maxlen:
+        dropped += 1  # The append below pushes the oldest one out
+    # Formatting waits for the writer thread, this is just a tuple
+    _buffer.append((time.time(), level, event, fields))
+    if _writer is None:
+        _start()
+    elif len(_buffer) >= config.LOG_BATCH_SIZE:
+        _wake.set()
+
+
+def debug(event: str, **fields):
+    _emit(DEBUG, event, fields)
+
+
+def info(event: str, **fields):
+    _emit(INFO, event, fields)
+
+
+def warning(event: str, **fields):
+    _emit(WARNING, event, fields)
+
+
+def error(event: str, **fields):
+    # exc=e adds the error and its traceback (formatted later on the writer thread)
+    _emit(ERROR, event, fields)
+
+
+def _record(stamp: float, level: int, event: str, fields: dict) -> dict:
+    record = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(stamp)) + f".{int(stamp % 1 * 1000):03d}Z",
+        "level": LEVEL_NAMES[level],
+        "event": event,
+    }
+    exc = fields.pop("exc", None)
+    record.update(fields)
+    if exc is not None:
+        record["error"] = f"{type(exc).__name__}: {exc}"
+        record["traceback"] = "".join(traceback.format_exception(exc))
+    return record
+
+
+def _format(record: dict) -> str:
+    if config.LOG_FORMAT == "json":
+        return json.dumps(record, default=str, ensure_ascii=False)
+    # Easier on the eyes in a terminal
+    extra = " ".join(
+        f"{key}={value}"
+        for key, value in record.items()
+        if key not in ("time", "level", "event", "traceback")
+    )
+    line = f"{record['time']} {record['level'].upper():<7} {record['event']} {extra}".rstrip()
+    if "traceback" in record:
+        line += "\n" + record["traceback"].rstrip()
+    return line
+
+
+def flush():
+    # Writes out everything queued so far, runs on the writer thread (or at exit)
+    global _dropped_reported
+    with _lock:
+        lines = []
+        while _buffer:
+            try:
+                lines.append(_format(_record(*_buffer.popleft())))
+            except IndexError:
+                break
+            except Exception as e:
+                lines.append(_format(_record(time.time(), ERROR, "log_format_failed", {"error": str(e)})))
+        if dropped != _dropped_reported:
+            lines.append(
+                _format(_record(time.time(), WARNING, "log_dropped", {"count": dropped - _dropped_reported}))
+            )
+            _dropped_reported = dropped
+        if not lines:
+            return
+        stream = _stream()
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except Exception:
+            pass  # Nowhere left to complain to
+
+
+_file = None
+
+
+def _stream():
+    global _file
+    if not config.LOG_FILE:
+        return sys.stdout
+    if _file is None:
+        _file = open(config.LOG_FILE, "a", encoding="utf-8")
+    return _file
+
+
+def _run():
+    while True:
+        # Wakes early when a full batch is waiting
+        _wake.wait(config.LOG_FLUSH_INTERVAL)
+        _wake.clear()
+        flush()
+
+
+def _start():
+    global _writer
+    _writer = threading.Thread(target=_run, name="log-writer", daemon=True)
+    _writer.start()
+
+
+def close():
+    # Flush whatever's left, call on the way out
+    flush()
+    if _file is not None:
+        _file.flush()
+
+
+atexit.register(close)
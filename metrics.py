@@ -0,0 +1,243 @@
+# Metrics
+# Times every slash command and splits the time into phases: answering the interaction
+# (defer/send/edit), fetching from Discord, doing the action (ban/kick/timeout/etc.)
+# and whatever's left (our own code, wikipedia, the database...). Discord calls get
+# sorted into phases automatically by wrapping the http client, the command being
+# timed is tracked with a context variable so it follows into tasks the command starts
+# Also counts errors by type and watches event loop lag. Everything's served in the
+# Prometheus text format on a local port and summed up by the owner-only /stats
+import asyncio
+import bisect
+import contextvars
+import time
+from time import perf_counter
+
+import config
+import log
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Phases
+RESPOND = "respond"  # Interaction responses: defer, send, edit
+FETCH = "fetch"  # GETs
+ACTION = "action"  # Everything else sent to Discord
+HANDLER = "handler"  # Time not spent waiting on Discord
+TOTAL = "total"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        # Estimated by assuming values are spread evenly inside each bucket
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]  # Somewhere past the last bucket
+                low = BUCKETS[i - 1] if i else 0.0
+                return low + (BUCKETS[i] - low) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+
+class CommandTimer:
+    __slots__ = ("command", "phases")
+
+    def __init__(self, command: str):
+        self.command = command
+        self.phases: dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+_current: contextvars.ContextVar[CommandTimer | None] = contextvars.ContextVar(
+    "easymod_command", default=None
+)
+latencies: dict[tuple[str, str], Histogram] = {}  # (command, phase) -> histogram
+errors: dict[tuple[str, str], int] = {}  # (command or "discord", error type) -> count
+loop_lag = Histogram()
+_started = time.time()
+_lag_task: asyncio.Task | None = None
+_server: asyncio.AbstractServer | None = None
+
+
+def _observe(command: str, phase: str, seconds: float):
+    histogram = latencies.get((command, phase))
+    if histogram is None:
+        histogram = latencies[(command, phase)] = Histogram()
+    histogram.observe(seconds)
+
+
+def count_error(source: str, e: BaseException):
+    key = (source, type(e).__name__)
+    errors[key] = errors.get(key, 0) + 1
+
+
+class phase:
+    # with metrics.phase("wikipedia"): ... times a block as its own phase
+    __slots__ = ("_name", "_start")
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __enter__(self):
+        self._start = perf_counter()
+
+    def __exit__(self, *exc):
+        timer = _current.get()
+        if timer is not None:
+            timer.add(self._name, perf_counter() - self._start)
+
+
+def _route_phase(route) -> str:
+    if route.path.startswith(("/interactions/", "/webhooks/")):
+        return RESPOND
+    return FETCH if route.method == "GET" else ACTION
+
+
+def instrument(bot):
+    # Wraps the client's slash command runner and http client, call once before start
+    run_command = bot._run_slash_command
+    request = bot.http.request
+
+    async def timed_command(command, ctx):
+        timer = CommandTimer(command.resolved_name)
+        token = _current.set(timer)
+        start = perf_counter()
+        try:
+            return await run_command(command, ctx)
+        except Exception as e:
+            count_error(timer.command, e)
+            raise
+        finally:
+            total = perf_counter() - start
+            _current.reset(token)
+            waited = 0.0
+            for name, seconds in timer.phases.items():
+                _observe(timer.command, name, seconds)
+                waited += seconds
+            _observe(timer.command, TOTAL, total)
+            # Concurrent requests can add up to more than the total
+            _observe(timer.command, HANDLER, max(0.0, total - waited))
+
+    async def timed_request(route, *args, **kwargs):
+        timer = _current.get()
+        if timer is None:
+            return await request(route, *args, **kwargs)
+        start = perf_counter()
+        try:
+            return await request(route, *args, **kwargs)
+        except Exception as e:
+            count_error("discord", e)
+            raise
+        finally:
+            timer.add(_route_phase(route), perf_counter() - start)
+
+    bot._run_slash_command = timed_command
+    bot.http.request = timed_request
+
+
+async def watch_loop_lag():
+    # Sleeps a fixed amount and records how late it woke up
+    loop = asyncio.get_running_loop()
+    interval = config.METRICS_LAG_INTERVAL
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        loop_lag.observe(max(0.0, loop.time() - start - interval))
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels: str) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=str(bound))} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def render(extra: dict[str, float] | None = None) -> str:
+    # Prometheus text format, extra is {metric name: value} for simple gauges
+    lines = ["# TYPE easymod_command_seconds histogram"]
+    for (command, name), histogram in sorted(latencies.items()):
+        lines += _histogram_lines(
+            "easymod_command_seconds", histogram, command=command, phase=name
+        )
+    lines.append("# TYPE easymod_errors_total counter")
+    for (source, error), count in sorted(errors.items()):
+        lines.append(f"easymod_errors_total{_labels(source=source, error=error)} {count}")
+    lines.append("# TYPE easymod_loop_lag_seconds histogram")
+    lines += _histogram_lines("easymod_loop_lag_seconds", loop_lag)
+    lines.append("# TYPE easymod_uptime_seconds gauge")
+    lines.append(f"easymod_uptime_seconds {time.time() - _started:.0f}")
+    for name, value in (extra or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+async def start(extra=None):
+    # Starts the lag watcher and the endpoint, extra is a function returning more
+    # gauges that gets called on every scrape
+    global _lag_task, _server
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(watch_loop_lag())
+    if _server is None and config.METRICS_PORT:
+        _server = await _serve(extra)
+
+
+async def _serve(extra) -> asyncio.AbstractServer:
+    # Tiny HTTP server for Prometheus to scrape, every path gets the metrics
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # Read the request (we don't care what it says)
+            while (await reader.readline()).strip():
+                pass
+            body = render(extra() if extra else None).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\n".encode()
+                + b"Connection: close\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+        except Exception as e:
+            log.warning("metrics_request_failed", error=str(e))
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, config.METRICS_HOST, config.METRICS_PORT)
+    log.info("metrics_listening", url=f"http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+    return server
+
+
+def summary() -> dict[str, dict[str, Histogram]]:
+    # command -> {phase: histogram}, for /stats
+    commands: dict[str, dict[str, Histogram]] = {}
+    for (command, name), histogram in latencies.items():
+        commands.setdefault(command, {})[name] = histogram
+    return commands
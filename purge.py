@@ -0,0 +1,148 @@
+# Purge
+# Deletes lots of messages fast. History gets streamed a page (100 messages) at a time
+# as raw data (no message objects or cache churn) and matches go out through the bulk
+# delete endpoint 100 at a time while the next page is being read. Discord won't bulk
+# delete messages older than 14 days so those fall back to single deletes, a few at a
+# time. Single deletes share the library's per-route rate limiting like everything else
+import asyncio
+import time
+from typing import Awaitable, Callable, NamedTuple
+
+from interactions import Client
+
+import config
+import log
+from bulk import describe_error
+
+PAGE_SIZE = 100  # Max messages per history request
+BULK_DELETE_MAX = 100  # Max messages per bulk delete
+# Discord refuses bulk deletes for messages older than 14 days, keep a little margin
+BULK_DELETE_MAX_AGE = 14 * 86400 - 60
+DISCORD_EPOCH_MS = 1420070400000
+
+Progress = Callable[[int, int], Awaitable[None]]  # (deleted, scanned)
+
+
+def message_time(message_id: int) -> float:
+    return ((int(message_id) >> 22) + DISCORD_EPOCH_MS) / 1000
+
+
+class PurgeFilter(NamedTuple):
+    user_id: int | None = None
+    contains: str | None = None  # Casefolded
+    bots_only: bool = False
+
+    def matches(self, data: dict) -> bool:
+        if data.get("pinned"):
+            return False  # Pins are usually there on purpose
+        author = data.get("author") or {}
+        if self.user_id is not None and int(author.get("id", 0)) != self.user_id:
+            return False
+        if self.bots_only and not author.get("bot"):
+            return False
+        if self.contains and self.contains not in data.get("content", "").casefold():
+            return False
+        return True
+
+
+class PurgeResult:
+    __slots__ = ("scanned", "deleted", "failed", "errors", "elapsed")
+
+    def __init__(self):
+        self.scanned = 0
+        self.deleted = 0
+        self.failed = 0
+        self.errors: dict[str, int] = {}  # why -> how many
+        self.elapsed = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.deleted / self.elapsed if self.elapsed else 0.0
+
+
+async def _tick(progress: Progress, result: PurgeResult):
+    # Ticks until cancelled, same as bulk.py's progress updates
+    while True:
+        await asyncio.sleep(config.BULK_PROGRESS_INTERVAL)
+        try:
+            await progress(result.deleted, result.scanned)
+        except Exception as e:
+            log.warning("purge_progress_failed", error=str(e))
+
+
+async def purge(
+    bot: Client,
+    channel_id: int,
+    count: int,
+    matcher: PurgeFilter,
+    before: int,
+    reason: str | None = None,
+    progress: Progress | None = None,
+) -> PurgeResult:
+    # Deletes up to count matching messages sent before the message/interaction id before
+    result = PurgeResult()
+    http = bot.http
+    slots = asyncio.Semaphore(config.BULK_CONCURRENCY)  # For old message single deletes
+    deletes: list[asyncio.Task] = []
+    bulk_cutoff = time.time() - BULK_DELETE_MAX_AGE
+
+    def failed(ids: list[int], e: Exception):
+        result.failed += len(ids)
+        why = describe_error(e)
+        result.errors[why] = result.errors.get(why, 0) + len(ids)
+
+    async def delete_bulk(ids: list[int]):
+        try:
+            if len(ids) == 1:
+                # Bulk delete needs at least 2
+                await http.delete_message(channel_id, ids[0], reason=reason)
+            else:
+                await http.bulk_delete_messages(channel_id, ids, reason)
+            result.deleted += len(ids)
+        except Exception as e:
+            failed(ids, e)
+
+    async def delete_one(message_id: int):
+        async with slots:
+            try:
+                await http.delete_message(channel_id, message_id, reason=reason)
+                result.deleted += 1
+            except Exception as e:
+                failed([message_id], e)
+
+    start = time.perf_counter()
+    ticker = asyncio.create_task(_tick(progress, result)) if progress else None
+    try:
+        batch: list[int] = []
+        matched = 0
+        cursor = before
+        while matched < count and result.scanned < config.PURGE_MAX_SCAN:
+            page = await http.get_channel_messages(channel_id, PAGE_SIZE, before=cursor)
+            if not page:
+                break  # Start of the channel
+            result.scanned += len(page)
+            cursor = page[-1]["id"]  # Newest first, so the last one is the oldest
+            for data in page:
+                if not matcher.matches(data):
+                    continue
+                message_id = int(data["id"])
+                if message_time(message_id) >= bulk_cutoff:
+                    batch.append(message_id)
+                    if len(batch) == BULK_DELETE_MAX:
+                        deletes.append(asyncio.create_task(delete_bulk(batch)))
+                        batch = []
+                else:
+                    deletes.append(asyncio.create_task(delete_one(message_id)))
+                matched += 1
+                if matched == count:
+                    break
+        if batch:
+            deletes.append(asyncio.create_task(delete_bulk(batch)))
+        await asyncio.gather(*deletes)
+    finally:
+        if ticker:
+            ticker.cancel()
+        for task in deletes:
+            task.cancel()  # Only does anything if the scan blew up
+        result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,182 @@
+# Command rate limits
+# Token buckets per (user, command) and (server, command) so one person (or one
+# compromised mod account) can't spam /wikipedia or /ban. Each bucket is stored as a
+# single float, the time it'll be completely full again (the GCRA way of doing token
+# buckets), so refilling is just math when it's checked and a bucket that's full again
+# is the same as one that doesn't exist and gets dropped. Rejections are decided before
+# the command runs, the first one gets a "slow down" reply and any more while still
+# limited are dropped without a single request going out
+import functools
+import time
+from collections import OrderedDict
+
+from interactions import BaseContext
+
+import config
+
+# Which buckets a command gets checked against, in this order
+USER = "user"
+GUILD = "guild"
+
+
+class Bucket:
+    # Every bucket of one kind for one command, like "user buckets for /wikipedia"
+    __slots__ = ("capacity", "interval", "_full_at", "_told")
+
+    def __init__(self, uses: int, seconds: float):
+        self.capacity = seconds  # Seconds it takes to refill completely
+        self.interval = seconds / uses  # Seconds to get one use back
+        # id -> when the bucket is full again, least recently used first
+        self._full_at: OrderedDict[int, float] = OrderedDict()
+        self._told: dict[int, float] = {}  # id -> when their "slow down" reply runs out
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+    def _evict(self, now: float):
+        # Recently used ids are at the back so stop at the first one still refilling
+        full_at = self._full_at
+        while full_at:
+            key = next(iter(full_at))
+            if full_at[key] > now and len(full_at) <= config.RATELIMIT_MAX_KEYS:
+                break
+            del full_at[key]
+            self._told.pop(key, None)
+
+    def take(self, key: int, now: float) -> float:
+        # Uses one token, returns 0 if that worked or the seconds until one is back
+        full_at = self._full_at.get(key, now)
+        if full_at < now:
+            full_at = now
+        # Taking one more pushes it out by an interval, too far out means it's empty
+        wait = full_at + self.interval - now - self.capacity
+        if wait > 0:
+            return wait
+        self._full_at[key] = full_at + self.interval
+        self._full_at.move_to_end(key)
+        self._evict(now)
+        return 0.0
+
+    def give_back(self, key: int):
+        # For when a later bucket said no, so a rejected use doesn't count
+        if key in self._full_at:
+            self._full_at[key] -= self.interval
+
+    def snapshot(self, now: float) -> tuple[list[int], list[float]]:
+        # Ids still refilling and the seconds until they're full, for warm_start.py
+        # (monotonic times mean nothing to the next process)
+        keys = []
+        waits = []
+        for key, full_at in self._full_at.items():
+            if full_at > now:
+                keys.append(key)
+                waits.append(full_at - now)
+        return keys, waits
+
+    def restore(self, keys: list[int], waits: list[float], now: float):
+        for key, wait in zip(keys, waits):
+            if wait > 0 and key not in self._full_at:
+                self._full_at[key] = now + wait
+        self._evict(now)
+
+    def should_tell(self, key: int, now: float, wait: float) -> bool:
+        # Only the first rejection gets a reply, the rest are dropped for free
+        if self._told.get(key, 0.0) > now:
+            return False
+        self._told[key] = now + wait
+        return True
+
+
+class Limiter:
+    __slots__ = ("command", "buckets", "rejected")
+
+    def __init__(self, command: str, limits: dict[str, tuple[int, float]]):
+        self.command = command
+        self.buckets = [(kind, Bucket(*limits[kind])) for kind in (USER, GUILD) if kind in limits]
+        self.rejected = 0
+
+    def check(
+        self, user_id: int, guild_id: int | None, now: float | None = None
+    ) -> tuple[float, bool] | None:
+        # None if the command can run, otherwise (seconds to wait, whether to reply)
+        now = time.monotonic() if now is None else now
+        taken = []
+        for kind, bucket in self.buckets:
+            key = user_id if kind == USER else guild_id
+            if key is None:
+                continue  # DMs only have user limits
+            wait = bucket.take(key, now)
+            if wait:
+                for earlier, earlier_key in taken:
+                    earlier.give_back(earlier_key)
+                self.rejected += 1
+                return wait, bucket.should_tell(key, now, wait)
+            taken.append((bucket, key))
+        return None
+
+
+limiters: dict[str, Limiter] = {}
+
+
+def limit(command: str):
+    # Decorator for slash command callbacks, goes right above the function so it runs
+    # before anything else. Limits come from config.RATELIMITS[command]
+    def decorator(func):
+        limits = config.RATELIMITS.get(command)
+        if not limits:
+            return func
+        # Subcommands using the same name share buckets (like /timeout add and remove)
+        limiter = limiters.get(command)
+        if limiter is None:
+            limiter = limiters[command] = Limiter(command, limits)
+
+        @functools.wraps(func)
+        async def limited(*args, **kwargs):
+            # Extension commands get self first
+            ctx = args[0] if isinstance(args[0], BaseContext) else args[1]
+            rejected = limiter.check(ctx.author_id, ctx.guild_id)
+            if rejected is None:
+                return await func(*args, **kwargs)
+            wait, reply = rejected
+            if reply:
+                await ctx.send(
+                    f"❌ Slow down, you can use /{command} again in {max(1, round(wait))}s",
+                    ephemeral=True,
+                )
+
+        return limited
+
+    return decorator
+
+
+def rejected_total() -> int:
+    return sum(limiter.rejected for limiter in limiters.values())
+
+
+def tracked_total() -> int:
+    return sum(len(bucket) for limiter in limiters.values() for _, bucket in limiter.buckets)
+
+
+# Warm restarts (warm_start.py)
+def snapshot() -> list[tuple[str, str, float, float, list[int], list[float]]]:
+    now = time.monotonic()
+    return [
+        (limiter.command, kind, bucket.capacity, bucket.interval, *bucket.snapshot(now))
+        for limiter in limiters.values()
+        for kind, bucket in limiter.buckets
+    ]
+
+
+def restore(
+    command: str, kind: str, capacity: float, interval: float, keys: list[int], waits: list[float]
+) -> bool:
+    # False if the command or its limits aren't the same anymore, old buckets don't
+    # mean anything then
+    limiter = limiters.get(command)
+    if limiter is None:
+        return False
+    for bucket_kind, bucket in limiter.buckets:
+        if bucket_kind == kind and bucket.capacity == capacity and bucket.interval == interval:
+            bucket.restore(keys, waits, time.monotonic())
+            return True
+    return False
@@ -0,0 +1,120 @@
+# Regex worker
+# Regexes from /automod run in a separate process. Python's re can take minutes on a
+# pattern like (a+)+$ or .*.*x against a long message and nothing can interrupt it, on
+# the event loop that would freeze every server. Here the bot just stops waiting after
+# AUTOMOD_REGEX_TIMEOUT, kills the process and starts a fresh one for the next check.
+# One request at a time over stdin/stdout (JSON lines)
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+
+class RegexTimeout(Exception):
+    # Raised when a check took too long, the worker gets restarted
+    pass
+
+
+class RegexWorker:
+    # A plain Popen with reads on a thread instead of asyncio's subprocess, that one
+    # belongs to the event loop and can't be cleaned up after it's gone (main.py
+    # closes us on the way out)
+    def __init__(self):
+        self._proc: subprocess.Popen | None = None
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="regex")
+        self._lock = asyncio.Lock()
+        self._patterns: dict[int, list[str]] = {}  # guild id -> regexes
+        self._sent: set[int] = set()  # Guilds the running process has the patterns for
+
+    def set_patterns(self, guild_id: int, patterns: list[str]):
+        if patterns:
+            self._patterns[guild_id] = patterns
+        else:
+            self._patterns.pop(guild_id, None)
+        self._sent.discard(guild_id)  # Sent again before the next check
+
+    def _start(self):
+        self._proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self._sent = set()
+
+    def _send(self, request: dict):
+        # The process is always waiting on stdin when we write so this doesn't block
+        self._proc.stdin.write(json.dumps(request).encode() + b"\n")
+        self._proc.stdin.flush()
+
+    def close(self):
+        # Killing it also wakes up a read that's still waiting
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            proc.kill()
+            proc.wait()
+            proc.stdin.close()
+            proc.stdout.close()
+
+    async def match(self, guild_id: int, text: str) -> int | None:
+        # Index of the first of the guild's regexes that matches, or None
+        patterns = self._patterns.get(guild_id)
+        if not patterns:
+            return None
+        async with self._lock:
+            try:
+                if self._proc is None or self._proc.poll() is not None:
+                    self.close()
+                    self._start()
+                if guild_id not in self._sent:
+                    self._send({"op": "set", "guild": guild_id, "patterns": patterns})
+                    self._sent.add(guild_id)
+                self._send({"op": "match", "guild": guild_id, "text": text})
+                read = asyncio.get_running_loop().run_in_executor(
+                    self._reader, self._proc.stdout.readline
+                )
+                line = await asyncio.wait_for(read, config.AUTOMOD_REGEX_TIMEOUT)
+                if not line:
+                    raise ConnectionError("regex worker exited")
+            except asyncio.TimeoutError:
+                self.close()
+                raise RegexTimeout()
+            except (ConnectionError, OSError):
+                # Died some other way, the next check starts a new one
+                self.close()
+                raise
+            return json.loads(line)["hit"]
+
+
+def _compile(pattern: str) -> re.Pattern | None:
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        return None  # Keeps the indexes lined up, never matches
+
+
+def serve():
+    # The worker process
+    compiled: dict[int, list[re.Pattern | None]] = {}
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request["op"] == "set":
+            compiled[request["guild"]] = [_compile(pattern) for pattern in request["patterns"]]
+            continue
+        hit = None
+        for i, pattern in enumerate(compiled.get(request["guild"], ())):
+            if pattern is not None and pattern.search(request["text"]):
+                hit = i
+                break
+        sys.stdout.write(json.dumps({"hit": hit}) + "\n")
+        sys.stdout.flush()
+
+
+worker = RegexWorker()
+
+if __name__ == "__main__":
+    serve()
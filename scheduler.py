@@ -0,0 +1,184 @@
+# Scheduled actions
+# Stuff that needs undoing later (like temp bans) goes in one min-heap ordered by
+# deadline. A single task sleeps until the soonest one is due instead of polling or
+# keeping a task per item. Everything's saved in the database so pending actions
+# survive restarts, overdue ones get caught up in one batch at startup. One that fails
+# (Discord having a bad minute) gets tried again later, waiting longer each time
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable
+
+import config
+import log
+import sharding
+from database import db
+
+db.add_schema(
+    """
+    CREATE TABLE IF NOT EXISTS scheduled_actions (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        run_at REAL NOT NULL,
+        PRIMARY KEY (guild_id, user_id, action)
+    );
+    """
+)
+
+Handler = Callable[[int, int], Awaitable[None]]
+Key = tuple[int, int, str]  # guild id, user id, action
+
+
+class Scheduler:
+    def __init__(self):
+        self._heap: list[tuple[float, int, int, str]] = []
+        # The real deadline for each key, heap entries that don't match are stale and
+        # get skipped when they come up (cheaper than removing them from the heap)
+        self._pending: dict[Key, float] = {}
+        self._handlers: dict[str, Handler] = {}
+        self._failures: dict[Key, int] = {}  # Times in a row it failed, not saved
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def register(self, action: str, handler: Handler):
+        self._handlers[action] = handler
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        # With several workers each one only runs the actions for its own shards
+        rows = await db.read(
+            "SELECT guild_id, user_id, action, run_at FROM scheduled_actions"
+            f" WHERE {sharding.owned_sql('guild_id')}"
+        )
+        for guild_id, user_id, action, run_at in rows:
+            self._pending[(guild_id, user_id, action)] = run_at
+        # heapify is O(n) so loading tens of thousands at once is fine
+        self._heap = [(run_at, *key) for key, run_at in self._pending.items()]
+        heapq.heapify(self._heap)
+        if rows:
+            log.info("scheduled_actions_loaded", count=len(rows))
+        self._task = asyncio.create_task(self._run())
+
+    def schedule(self, guild_id: int, user_id: int, action: str, run_at: float):
+        key = (int(guild_id), int(user_id), action)
+        self._pending[key] = run_at
+        heapq.heappush(self._heap, (run_at, *key))
+        db.write(
+            "INSERT OR REPLACE INTO scheduled_actions (guild_id, user_id, action, run_at)"
+            " VALUES (?, ?, ?, ?)",
+            (*key, run_at),
+        )
+        # Only need to wake the runner if this is the new soonest deadline
+        if self._heap[0][0] == run_at:
+            self._wake.set()
+
+    def cancel(self, guild_id: int, user_id: int, action: str) -> bool:
+        key = (int(guild_id), int(user_id), action)
+        self._failures.pop(key, None)
+        if self._pending.pop(key, None) is None:
+            return False
+        self._forget(key)
+        return True
+
+    def _forget(self, key: Key):
+        db.write(
+            "DELETE FROM scheduled_actions WHERE guild_id = ? AND user_id = ? AND action = ?",
+            key,
+        )
+
+    def _pop_due(self, now: float) -> list[Key]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            run_at, *key = heapq.heappop(self._heap)
+            key = tuple(key)
+            if self._pending.get(key) == run_at:
+                del self._pending[key]
+                due.append(key)
+        return due
+
+    async def _run_one(self, key: Key):
+        guild_id, user_id, action = key
+        handler = self._handlers.get(action)
+        if handler is None:
+            log.error("scheduled_action_unknown", action=action, guild_id=guild_id, user_id=user_id)
+            self._forget(key)
+            return
+        try:
+            await handler(guild_id, user_id)
+        except Exception as e:
+            if key in self._pending:
+                return  # Scheduled again while we were running it, that one wins
+            failures = self._failures.get(key, 0) + 1
+            if failures < config.SCHEDULER_MAX_ATTEMPTS:
+                self._failures[key] = failures
+                delay = min(
+                    config.SCHEDULER_RETRY_DELAY * 2 ** (failures - 1),
+                    config.SCHEDULER_MAX_RETRY_DELAY,
+                )
+                log.warning(
+                    "scheduled_action_retrying",
+                    action=action,
+                    guild_id=guild_id,
+                    user_id=user_id,
+                    attempt=failures,
+                    retry_in=delay,
+                    error=str(e),
+                )
+                self.schedule(guild_id, user_id, action, time.time() + delay)
+                return
+            self._failures.pop(key, None)
+            log.error(
+                "scheduled_action_failed",
+                action=action,
+                guild_id=guild_id,
+                user_id=user_id,
+                attempts=failures,
+                exc=e,
+            )
+        else:
+            self._failures.pop(key, None)
+        # Unless it got scheduled again while we were running it
+        if key not in self._pending:
+            self._forget(key)
+
+    async def _run_batch(self, due: list[Key]):
+        # A few workers share one iterator so even a huge catch-up batch doesn't
+        # spin up a task per item
+        pending = iter(due)
+
+        async def worker():
+            for key in pending:
+                await self._run_one(key)
+
+        workers = min(config.BULK_CONCURRENCY, len(due))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                await self._wake.wait()
+                self._wake.clear()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                # Sleep until the next deadline, or until something sooner gets scheduled
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            # Everything that's due goes out as one batch
+            due = self._pop_due(time.time())
+            if due:
+                await self._run_batch(due)
+
+
+scheduler = Scheduler()
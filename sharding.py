@@ -0,0 +1,171 @@
+# Sharding
+# python main.py --workers 4 runs a supervisor that splits the bot's shards across that
+# many worker processes (each one a normal EasyMod with an AutoShardedClient running
+# its share) and restarts any worker that dies. Every guild belongs to exactly one
+# shard so per guild state (caches, spam tracking, lockdowns, scheduled unbans) lives
+# in the worker that owns it, and the database is shared so cases and settings look the
+# same from every worker. The supervisor hands each worker its shards through the
+# environment so main.py can build the right client when it's imported
+import json
+import math
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import NamedTuple
+
+import config
+
+API = "https://discord.com/api/v10"
+IDENTIFY_INTERVAL = 5.1  # Discord allows max_concurrency identifies per 5 seconds
+
+# Environment variables the supervisor sets for its workers
+WORKER_ENV = "EASYMOD_WORKER"
+SHARDS_ENV = "EASYMOD_SHARDS"
+TOTAL_SHARDS_ENV = "EASYMOD_TOTAL_SHARDS"
+
+
+class Worker(NamedTuple):
+    index: int
+    shard_ids: tuple[int, ...]
+    total_shards: int
+
+
+def _from_env() -> Worker | None:
+    if WORKER_ENV not in os.environ:
+        return None
+    return Worker(
+        int(os.environ[WORKER_ENV]),
+        tuple(int(shard) for shard in os.environ[SHARDS_ENV].split(",")),
+        int(os.environ[TOTAL_SHARDS_ENV]),
+    )
+
+
+worker = _from_env()  # None unless we're one of the supervisor's workers
+
+
+def shard_for(guild_id: int, total_shards: int) -> int:
+    # Discord's formula
+    return (int(guild_id) >> 22) % total_shards
+
+
+def owns(guild_id: int) -> bool:
+    return worker is None or shard_for(guild_id, worker.total_shards) in worker.shard_ids
+
+
+def owned_sql(column: str = "guild_id") -> str:
+    # WHERE clause for rows this worker is in charge of
+    if worker is None:
+        return "1"
+    shards = ",".join(str(shard) for shard in worker.shard_ids)
+    return f"(({column} >> 22) % {worker.total_shards}) IN ({shards})"
+
+
+def gateway_info(token: str) -> tuple[int, int]:
+    # Discord's recommended shard count and how many shards can identify at once
+    request = urllib.request.Request(
+        f"{API}/gateway/bot",
+        headers={
+            "Authorization": f"Bot {token}",
+            "User-Agent": "EasyMod (https://github.com/sumfall/EasyMod)",
+        },
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        data = json.load(response)
+    return data["shards"], data["session_start_limit"]["max_concurrency"]
+
+
+def split(total_shards: int, workers: int) -> list[tuple[int, ...]]:
+    # Round robin so big and small guilds spread out evenly
+    return [tuple(range(i, total_shards, workers)) for i in range(workers)]
+
+
+class Supervisor:
+    def __init__(self, total_shards: int, workers: int, max_concurrency: int, args: list[str]):
+        self.plan = split(total_shards, min(workers, total_shards))
+        self.total_shards = total_shards
+        self.max_concurrency = max_concurrency
+        self.args = args  # Passed through to every worker (like --moderation-only)
+        self.procs: dict[int, subprocess.Popen] = {}
+        self.started: dict[int, float] = {}
+        self.crashes: dict[int, int] = {}  # Crashes in a row, for the backoff
+        self.restart_at: dict[int, float] = {}
+        self.next_identify = 0.0
+        self.stopping = False
+
+    def launch(self, index: int):
+        # Workers identify one after another, same as shards inside one process would
+        shards = self.plan[index]
+        wait = self.next_identify - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self.next_identify = time.monotonic() + IDENTIFY_INTERVAL * math.ceil(
+            len(shards) / self.max_concurrency
+        )
+        env = os.environ | {
+            WORKER_ENV: str(index),
+            SHARDS_ENV: ",".join(str(shard) for shard in shards),
+            TOTAL_SHARDS_ENV: str(self.total_shards),
+        }
+        main = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+        self.procs[index] = subprocess.Popen([sys.executable, main, *self.args], env=env)
+        self.started[index] = time.monotonic()
+        print(f"Started worker {index} (pid {self.procs[index].pid}) with shards {list(shards)}")
+
+    def check(self):
+        now = time.monotonic()
+        for index, proc in list(self.procs.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+            del self.procs[index]
+            # Reset the backoff if it ran fine for a while before dying
+            if now - self.started[index] >= config.SHARD_STABLE_SECONDS:
+                self.crashes[index] = 0
+            self.crashes[index] = self.crashes.get(index, 0) + 1
+            delay = min(config.SHARD_RESTART_MAX_DELAY, 2 ** (self.crashes[index] - 1))
+            self.restart_at[index] = now + delay
+            print(f"ERROR: Worker {index} exited with code {code}, restarting in {delay}s")
+        for index, when in list(self.restart_at.items()):
+            if when <= now:
+                del self.restart_at[index]
+                self.launch(index)
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        print(
+            f"Running {self.total_shards} shards on {len(self.plan)} workers "
+            f"(max concurrency {self.max_concurrency})"
+        )
+        try:
+            for index in range(len(self.plan)):
+                self.launch(index)
+            while not self.stopping:
+                time.sleep(1)
+                self.check()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        print("Stopping workers")
+        for proc in self.procs.values():
+            proc.terminate()
+        deadline = time.monotonic() + 10
+        for proc in self.procs.values():
+            try:
+                proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def supervise(token: str, workers: int, shards: int | None, args: list[str]):
+    # shards=None asks Discord how many we need
+    recommended, max_concurrency = gateway_info(token)
+    Supervisor(shards or recommended, workers, max_concurrency, args).run()
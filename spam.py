@@ -0,0 +1,121 @@
+# Spam detection
+# Catches people sending messages too fast or sending the same thing over and over.
+# Memory stays bounded no matter how big the server is: each active user gets a small
+# ring buffer of their last few messages (when they were sent and a 64 bit hash of what
+# they said), users that go quiet get evicted (least recently active first) and there's
+# a hard cap. Repeats are only counted against the same user's own recent messages so
+# nobody gets timed out because of what other people said
+import math
+import time
+from array import array
+from collections import OrderedDict
+
+import config
+import guild_settings
+
+FLOOD = "flood"  # Too many messages too fast
+DUPLICATE = "duplicate"  # Same message too many times
+
+
+def settings(guild_id: int) -> dict:
+    # Per guild thresholds from /settings, cached so it's one lookup per message
+    return guild_settings.section(int(guild_id), "spam_")
+
+
+class History:
+    # One user's last few messages in fixed size arrays (a lot smaller than a deque)
+    __slots__ = ("times", "hashes", "next")
+
+    def __init__(self, size: int):
+        self.times = array("d", [-math.inf]) * size
+        self.hashes = array("q", [0]) * size  # 0 for messages without text
+        self.next = 0  # Slot the next message goes in, which is also the oldest one
+
+    def add(self, now: float, fingerprint: int):
+        self.times[self.next] = now
+        self.hashes[self.next] = fingerprint
+        self.next = (self.next + 1) % len(self.times)
+
+    def sent(self, back: int) -> float:
+        # When the message back messages ago was sent, 1 is the one just added
+        return self.times[(self.next - back) % len(self.times)]
+
+    def repeats(self, fingerprint: int, since: float) -> int:
+        # How many of the kept messages since then were this one
+        count = 0
+        for sent, other in zip(self.times, self.hashes):
+            if other == fingerprint and sent >= since:
+                count += 1
+        return count
+
+    @property
+    def last(self) -> float:
+        return self.sent(1)
+
+
+class SpamTracker:
+    def __init__(self):
+        # (guild id, user id) -> recent messages, most recently active last
+        self._windows: OrderedDict[tuple[int, int], History] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _evict(self, now: float):
+        windows = self._windows
+        # Oldest activity is at the front so stop at the first user that isn't idle
+        while windows:
+            key, window = next(iter(windows.items()))
+            if len(windows) <= config.SPAM_MAX_TRACKED_USERS and (
+                now - window.last < config.SPAM_IDLE_SECONDS
+            ):
+                break
+            del windows[key]
+
+    def check(
+        self, guild_id: int, user_id: int, content: str, now: float | None = None
+    ) -> str | None:
+        # Returns FLOOD or DUPLICATE if this message crosses a threshold
+        now = time.monotonic() if now is None else now
+        limits = settings(guild_id)
+        key = (guild_id, user_id)
+        # Enough history for whichever check needs more messages
+        size = max(limits["messages"], limits["duplicates"])
+
+        text = content.strip().casefold() if content else ""
+        fingerprint = hash(text) if text else 0
+        window = self._windows.get(key)
+        if window is None or len(window.times) != size:
+            window = self._windows[key] = History(size)
+        self._windows.move_to_end(key)
+        window.add(now, fingerprint)
+        self._evict(now)
+
+        # The oldest of the last N messages is still inside the window
+        if now - window.sent(limits["messages"]) <= limits["seconds"]:
+            del self._windows[key]  # Start over so the same burst doesn't fire again
+            return FLOOD
+
+        if fingerprint and limits["duplicates"]:
+            if window.repeats(fingerprint, now - config.SPAM_DUPLICATE_WINDOW) >= limits["duplicates"]:
+                del self._windows[key]
+                return DUPLICATE
+        return None
+
+    def forget(self, guild_id: int):
+        for key in [key for key in self._windows if key[0] == guild_id]:
+            del self._windows[key]
+
+    def memory(self) -> int:
+        # Rough bytes used, for benchmarks and stats
+        if not self._windows:
+            return 0
+        sample = next(iter(self._windows.values()))
+        # History + its arrays + key tuple + ordered dict entry
+        per_user = (
+            sample.__sizeof__() + sample.times.__sizeof__() + sample.hashes.__sizeof__() + 64 + 100
+        )
+        return per_user * len(self._windows)
+
+
+tracker = SpamTracker()
@@ -0,0 +1,275 @@
+# Warm restarts
+# Shutting down (Ctrl+C, or SIGTERM from a deploy or the sharding supervisor) saves the
+# in-memory state that would otherwise start cold to a small binary file: command
+# cooldowns, lockdowns that are still going (and the raiders queued behind them) and
+# cached wikipedia summaries. The next start reads it back on a thread and hands each
+# part over when it can be used: cooldowns straight away, lockdowns once the gateway has
+# sent the server (and it's on our shards), summaries whenever wiki gets imported.
+# Times are saved as seconds left so nothing depends on the old process' clocks and
+# whatever ran out while we were down gets dropped. A snapshot only gets used once.
+# Scheduled actions and everything else in the database already survive restarts, and
+# the owner/role caches are built from the GUILD_CREATE events every start gets anyway
+import asyncio
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+from interactions import Client
+
+import antiraid
+import config
+import log
+import ratelimit
+import sharding
+
+MAGIC = b"EMWS"
+FORMAT = 1  # Bump when a layout changes, snapshots in an older format get ignored
+_HEADER = struct.Struct("<4sHd")  # Magic, format, when it was saved (unix time)
+_SECTION = struct.Struct("<BI")  # Section id, bytes
+_COUNT = struct.Struct("<I")
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+
+# Sections, each entry is a tuple laid out like this (the second field is always the
+# seconds left, except for cooldowns where that's the list at the end)
+# t = text, i = int, f = float, I = list of ints, F = list of floats
+RATELIMITS = 1  # command, kind, capacity, interval, ids, seconds until full
+LOCKDOWNS = 2  # guild id, seconds left, queued user ids
+WIKI = 3  # cache key, seconds left, summary
+LAYOUTS = {RATELIMITS: "ttffIF", LOCKDOWNS: "ifI", WIKI: "tft"}
+
+_lock = threading.Lock()  # wiki can get imported on a thread
+_restored: dict[int, list[tuple]] = {}  # Section -> entries nothing has taken yet
+_saved_at = 0.0  # When the restored snapshot was saved
+_waiting: dict[int, tuple[float, list[int]]] = {}  # Guild id -> (lockdown end, queued)
+_loaded = False
+
+
+def path() -> str | None:
+    # Every sharding worker gets its own file
+    if not config.WARM_START_PATH or sharding.worker is None:
+        return config.WARM_START_PATH
+    root, ext = os.path.splitext(config.WARM_START_PATH)
+    return f"{root}.{sharding.worker.index}{ext}"
+
+
+# Encoding, ids and times go in as arrays (native byte order, snapshots get read back
+# on the same machine) and the whole thing gets zlib'd, summaries shrink a lot
+def _encode(saved_at: float, sections: dict[int, list[tuple]]) -> bytes:
+    body = bytearray()
+    for section, entries in sections.items():
+        payload = bytearray(_COUNT.pack(len(entries)))
+        layout = LAYOUTS[section]
+        for entry in entries:
+            for kind, value in zip(layout, entry):
+                if kind == "t":
+                    data = value.encode()
+                    payload += _COUNT.pack(len(data)) + data
+                elif kind == "i":
+                    payload += _INT.pack(value)
+                elif kind == "f":
+                    payload += _FLOAT.pack(value)
+                else:
+                    payload += _COUNT.pack(len(value))
+                    payload += array("q" if kind == "I" else "d", value).tobytes()
+        body += _SECTION.pack(section, len(payload)) + payload
+    return _HEADER.pack(MAGIC, FORMAT, saved_at) + zlib.compress(body, 1)
+
+
+class _Reader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def take(self, size: int) -> memoryview:
+        if self.pos + size > len(self.data):
+            raise ValueError("snapshot is cut short")
+        chunk = self.data[self.pos : self.pos + size]
+        self.pos += size
+        return chunk
+
+    def unpack(self, layout: struct.Struct):
+        return layout.unpack(self.take(layout.size))[0]
+
+    def entry(self, layout: str) -> tuple:
+        values = []
+        for kind in layout:
+            if kind == "t":
+                values.append(str(self.take(self.unpack(_COUNT)), "utf-8"))
+            elif kind == "i":
+                values.append(self.unpack(_INT))
+            elif kind == "f":
+                values.append(self.unpack(_FLOAT))
+            else:
+                items = array("q" if kind == "I" else "d")
+                items.frombytes(self.take(self.unpack(_COUNT) * items.itemsize))
+                values.append(items.tolist())
+        return tuple(values)
+
+
+def _decode(data: bytes) -> tuple[float, dict[int, list[tuple]]]:
+    if len(data) < _HEADER.size:
+        raise ValueError("snapshot is cut short")
+    magic, version, saved_at = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT:
+        raise ValueError(f"not a format {FORMAT} snapshot")
+    body = _Reader(zlib.decompress(data[_HEADER.size :]))
+    sections = {}
+    while body.pos < len(body.data):
+        section, size = _SECTION.unpack(body.take(_SECTION.size))
+        payload = _Reader(body.take(size))
+        layout = LAYOUTS.get(section)
+        if layout is None:
+            continue  # Saved by a newer version, skip what we don't know
+        sections[section] = [payload.entry(layout) for _ in range(payload.unpack(_COUNT))]
+    return saved_at, sections
+
+
+def _read(file: str) -> tuple[float, dict[int, list[tuple]]]:
+    with open(file, "rb") as f:
+        data = f.read()
+    # Gone before anything uses it, a crash later on shouldn't restore it a second time
+    os.remove(file)
+    return _decode(data)
+
+
+def _write(file: str, data: bytes):
+    tmp = f"{file}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, file)
+
+
+def _age(entries: list[tuple], elapsed: float) -> list[tuple]:
+    # Takes elapsed off the seconds left, dropping whatever ran out
+    return [(entry[0], entry[1] - elapsed, *entry[2:]) for entry in entries if entry[1] > elapsed]
+
+
+def take(section: int) -> list[tuple] | None:
+    # Hands over a restored section once, with its times brought up to date
+    with _lock:
+        entries = _restored.pop(section, None)
+    if entries is None:
+        return None
+    return _age(entries, time.time() - _saved_at)
+
+
+# Restoring
+def _restore_ratelimits() -> int:
+    elapsed = time.time() - _saved_at
+    restored = 0
+    with _lock:
+        entries = _restored.pop(RATELIMITS, [])
+    for command, kind, capacity, interval, keys, waits in entries:
+        waits = [wait - elapsed for wait in waits]
+        if ratelimit.restore(command, kind, capacity, interval, keys, waits):
+            restored += sum(wait > 0 for wait in waits)
+    return restored
+
+
+def _restore_lockdowns(bot: Client) -> int:
+    restored = 0
+    for guild_id, seconds, pending in take(LOCKDOWNS) or []:
+        if not sharding.owns(guild_id):
+            continue  # Moved to another worker
+        if bot.get_guild(guild_id) is not None:
+            antiraid.restore_lockdown(guild_id, seconds, pending)
+            restored += 1
+        else:
+            # Unavailable right now, guild_available() picks it up if it comes back in time
+            _waiting[guild_id] = (time.time() + seconds, pending)
+    return restored
+
+
+def guild_available(guild_id: int):
+    # GUILD_CREATE for a server that was missing when the snapshot got loaded
+    waiting = _waiting.pop(guild_id, None)
+    if waiting is not None:
+        ends_at, pending = waiting
+        if ends_at > time.time():
+            antiraid.restore_lockdown(guild_id, ends_at - time.time(), pending)
+            log.info("warm_start_lockdown_restored", guild_id=guild_id)
+
+
+def _restore_wiki() -> int:
+    wiki = sys.modules.get("wiki")
+    if wiki is None or not hasattr(wiki, "summary_cache"):
+        return 0  # wiki takes them itself when it gets imported
+    entries = take(WIKI) or []
+    wiki.summary_cache.restore(entries)
+    return len(entries)
+
+
+async def load(bot: Client):
+    # Runs once at startup, after the extensions (and their rate limits) are loaded
+    global _loaded, _saved_at
+    _loaded = True
+    file = path()
+    if not file:
+        return
+    try:
+        saved_at, sections = await asyncio.to_thread(_read, file)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        log.warning("warm_start_unreadable", file=file, error=str(e))
+        return
+    age = time.time() - saved_at
+    if not 0 <= age <= config.WARM_START_MAX_AGE:
+        log.info("warm_start_skipped", file=file, age_seconds=round(age))
+        return
+    with _lock:
+        _restored.update(sections)
+        _saved_at = saved_at
+    log.info(
+        "warm_start_restored",
+        age_seconds=round(age, 1),
+        cooldowns=_restore_ratelimits(),
+        lockdowns=_restore_lockdowns(bot),
+        lockdowns_waiting=len(_waiting),
+        wiki_summaries=_restore_wiki(),
+    )
+
+
+# Saving
+def save():
+    # Sync so it can run on the way out after the event loop is gone
+    file = path()
+    if not _loaded or not file:
+        return  # Never got going, don't replace the last good snapshot with nothing
+    try:
+        start = time.perf_counter()
+        now = time.time()
+        wiki = sys.modules.get("wiki")
+        with _lock:
+            if wiki is not None and hasattr(wiki, "summary_cache"):
+                summaries = wiki.summary_cache.snapshot()
+            else:
+                # Nobody used /wikipedia this time, pass the old ones on
+                summaries = _age(_restored.get(WIKI, []), now - _saved_at)
+        lockdowns = antiraid.snapshot() + [
+            (guild_id, ends_at - now, pending)
+            for guild_id, (ends_at, pending) in _waiting.items()
+            if ends_at > now
+        ]
+        cooldowns = ratelimit.snapshot()
+        data = _encode(now, {RATELIMITS: cooldowns, LOCKDOWNS: lockdowns, WIKI: summaries})
+        _write(file, data)
+    except Exception as e:
+        log.error("warm_start_save_failed", file=file, exc=e)
+        return
+    log.info(
+        "warm_start_saved",
+        file=file,
+        bytes=len(data),
+        cooldowns=sum(len(entry[4]) for entry in cooldowns),
+        lockdowns=len(lockdowns),
+        wiki_summaries=len(summaries),
+        ms=round((time.perf_counter() - start) * 1000, 1),
+    )
@@ -0,0 +1,238 @@
+# Wikipedia lookups
+# The wikipedia lib is sync so lookups run on their own thread pool, that way a slow
+# search never blocks the event loop (and /ban, /kick, /timeout with it)
+# Results are cached so popular searches don't hit wikipedia every time
+# If an offline dump is set up in config.py it gets checked before going online
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import wikipedia
+from wikipedia import exceptions as wiki_exceptions
+
+import config
+import log
+import warm_start
+import wiki_offline
+
+_executor = ThreadPoolExecutor(
+    max_workers=config.WIKI_WORKERS, thread_name_prefix="wikipedia"
+)
+_in_flight = 0  # Lookups running or queued on the pool
+
+
+# Errors that are worth caching, they won't change if we ask again right away
+CACHEABLE_ERRORS = (wiki_exceptions.DisambiguationError, wiki_exceptions.PageError)
+
+
+class WikiBusy(Exception):
+    # Raised when too many lookups are already in flight
+    pass
+
+
+def _release(future: asyncio.Future):
+    global _in_flight
+    _in_flight -= 1
+    # Grab the result so lookups that finish after a timeout don't warn about it
+    if not future.cancelled():
+        future.exception()
+
+
+async def _run(func, limit: int):
+    # Runs a wikipedia call on the pool unless limit calls are already in flight
+    global _in_flight
+    if _in_flight >= limit:
+        raise WikiBusy()
+
+    future = asyncio.get_running_loop().run_in_executor(_executor, func)
+    # The slot is only freed once the thread is actually done, not when we stop waiting
+    _in_flight += 1
+    future.add_done_callback(_release)
+    # shield() so a timeout doesn't cancel the future and free the slot early
+    return await asyncio.wait_for(asyncio.shield(future), timeout=config.WIKI_TIMEOUT)
+
+
+async def fetch_summary(query: str, sentences: int = 3) -> str:
+    return await _run(
+        functools.partial(
+            wikipedia.summary, query, sentences=sentences, auto_suggest=False
+        ),  # auto_suggest=False stops the thing from giving dumb suggestions
+        config.WIKI_MAX_CONCURRENT,
+    )
+
+
+async def search_titles(query: str, results: int = 10) -> list[str]:
+    # Title search for /wikipedia autocomplete, it only gets half the pool so it can
+    # never crowd out people actually searching
+    return await _run(
+        functools.partial(wikipedia.search, query, results=results),
+        config.WIKI_MAX_CONCURRENT // 2,
+    )
+
+
+# Summary cache
+# LRU with separate TTLs for found summaries and negative results
+class SummaryCache:
+    def __init__(self, max_size: int, hit_ttl: float, miss_ttl: float):
+        self.max_size = max_size
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        # key -> (expires_at, summary, error)
+        self._entries: OrderedDict[str, tuple[float, str | None, Exception | None]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # Lookups that piggybacked on one already in flight
+
+    def get(self, key: str) -> tuple[str | None, Exception | None] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= time.monotonic():
+            # Expired
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, key: str, summary: str | None = None, error: Exception | None = None):
+        ttl = self.miss_ttl if error is not None else self.hit_ttl
+        self._entries[key] = (time.monotonic() + ttl, summary, error)
+        self._entries.move_to_end(key)
+        # Evict least recently used
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def snapshot(self) -> list[tuple[str, float, str]]:
+        # Found summaries with the seconds they have left, least recently used first.
+        # Cached errors are left out, they're exception objects and expire quickly anyway
+        now = time.monotonic()
+        return [
+            (key, expires_at - now, summary)
+            for key, (expires_at, summary, error) in self._entries.items()
+            if error is None and expires_at > now
+        ]
+
+    def restore(self, entries: list[tuple[str, float, str]]):
+        # Anything cached since the start is newer, it stays
+        now = time.monotonic()
+        restored = OrderedDict(
+            (key, (now + ttl, summary, None))
+            for key, ttl, summary in entries
+            if ttl > 0 and key not in self._entries
+        )
+        restored.update(self._entries)
+        self._entries = restored
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+summary_cache = SummaryCache(
+    config.WIKI_CACHE_SIZE, config.WIKI_CACHE_TTL, config.WIKI_CACHE_MISS_TTL
+)
+# Summaries cached before the last restart, if there was a snapshot
+summary_cache.restore(warm_start.take(warm_start.WIKI) or [])
+_pending: dict[str, asyncio.Task] = {}  # Lookups in flight by cache key
+
+
+def normalize_query(query: str) -> str:
+    # "  Python   " and "python" are the same search
+    return wiki_offline.normalize_title(query)
+
+
+# Offline index, opened the first time it's needed
+_offline_index: wiki_offline.OfflineIndex | None = None
+_offline_failed = False
+
+
+def get_offline_index() -> wiki_offline.OfflineIndex | None:
+    global _offline_index, _offline_failed
+    if _offline_index is not None or _offline_failed:
+        return _offline_index
+    if not config.WIKI_OFFLINE_DUMP or not config.WIKI_OFFLINE_INDEX:
+        _offline_failed = True
+        return None
+    try:
+        _offline_index = wiki_offline.OfflineIndex(
+            config.WIKI_OFFLINE_DUMP, config.WIKI_OFFLINE_INDEX
+        )
+        log.info("wiki_offline_loaded", titles=_offline_index.count)
+    except (OSError, wiki_offline.OfflineIndexError) as e:
+        # Don't keep retrying every search, just fall back to going online
+        _offline_failed = True
+        log.error("wiki_offline_failed", error=str(e))
+    return _offline_index
+
+
+async def _fetch(query: str, sentences: int) -> str:
+    index = get_offline_index()
+    if index is not None:
+        # Offline lookups are sub-millisecond so they're fine to do on the loop
+        summary = index.summary(query, sentences)
+        if summary is not None:
+            return summary
+        if config.WIKI_OFFLINE_ONLY:
+            raise wiki_exceptions.PageError(query)
+    return await fetch_summary(query, sentences)
+
+
+def _fresh(error: Exception) -> Exception:
+    # Copy of a cached error with no traceback. Raising the cached one itself would add
+    # to its traceback every time (and keep every caller's frames alive with it)
+    copy = BaseException.__new__(type(error), *error.args)
+    copy.__dict__.update(error.__dict__)
+    return copy
+
+
+async def _lookup(key: str, query: str, sentences: int) -> str:
+    try:
+        summary = await _fetch(query, sentences)
+    except CACHEABLE_ERRORS as e:
+        summary_cache.put(key, error=_fresh(e))
+        raise
+    finally:
+        _pending.pop(key, None)
+    summary_cache.put(key, summary)
+    return summary
+
+
+async def get_summary(query: str, sentences: int = 3) -> str:
+    # Cached version of fetch_summary, raises the same errors
+    key = f"{sentences}:{normalize_query(query)}"
+    cached = summary_cache.get(key)
+    if cached is not None:
+        summary, error = cached
+        if error is not None:
+            raise _fresh(error)
+        return summary
+
+    # Share one upstream fetch between identical searches
+    task = _pending.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_lookup(key, query, sentences))
+        # Keeps asyncio quiet if every caller gave up before the fetch finished
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        _pending[key] = task
+    else:
+        summary_cache.coalesced += 1
+    # shield() so one impatient caller can't cancel the fetch for everyone else
+    return await asyncio.shield(task)
+
+
+def cache_stats() -> dict[str, int]:
+    return summary_cache.stats()
@@ -0,0 +1,267 @@
+# Offline wikipedia summaries
+# Serves summaries from a local abstracts dump (like enwiki-latest-abstract.xml) so
+# /wikipedia works without reaching wikipedia. Both the dump and the index are mmapped,
+# lookups are a binary search over the index and nothing gets loaded into RAM
+#
+# Build the index once with:
+#   python wiki_offline.py build enwiki-latest-abstract.xml wiki.idx
+# Then set WIKI_OFFLINE_DUMP and WIKI_OFFLINE_INDEX in config.py
+import argparse
+import hashlib
+import html
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+
+# Index layout:
+#   header: magic, entry count, dump size (to catch a mismatched dump)
+#   entries sorted by title hash: hash, title offset, title length, abstract offset, abstract length
+# Offsets point into the dump itself so the index stays small
+MAGIC = b"EMWIKI01"
+HEADER = struct.Struct("<8sQQ")
+ENTRY = struct.Struct("<QQIQI")
+HASH = struct.Struct("<Q")
+SORT_BUCKET_BITS = 16  # Buckets the build sorts titles into by hash before sorting each one
+
+TITLE_PREFIX = b"Wikipedia: "  # Every title in the abstracts dump starts with this
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class OfflineIndexError(Exception):
+    # Raised when the index is missing, corrupt or doesn't match the dump
+    pass
+
+
+def normalize_title(title: str) -> str:
+    # Same normalization as the summary cache so both agree on what a "title" is
+    return " ".join(title.split()).casefold()
+
+
+def _title_key(raw: bytes | memoryview) -> str:
+    # Titles in the dump are XML escaped (&amp; and friends)
+    return normalize_title(html.unescape(str(raw, "utf-8", "replace")))
+
+
+def title_hash(key: str) -> int:
+    return HASH.unpack(hashlib.blake2b(key.encode(), digest_size=8).digest())[0]
+
+
+class OfflineIndex:
+    def __init__(self, dump_path: str, index_path: str):
+        # The maps stay valid after the files are closed, nothing else needs them open
+        with open(dump_path, "rb") as dump_file, open(index_path, "rb") as index_file:
+            try:
+                self._dump = mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Empty file
+                self.close()
+                raise OfflineIndexError("Dump or index file is empty")
+
+        if len(self._index) < HEADER.size:
+            self.close()
+            raise OfflineIndexError("Index file is too small")
+        magic, self.count, dump_size = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC:
+            self.close()
+            raise OfflineIndexError("Not an EasyMod wikipedia index")
+        if dump_size != len(self._dump):
+            self.close()
+            raise OfflineIndexError("Index was built from a different dump, rebuild it")
+        if len(self._index) != HEADER.size + self.count * ENTRY.size:
+            self.close()
+            raise OfflineIndexError("Index file is truncated, rebuild it")
+
+        # Zero-copy view of the dump, slicing this doesn't copy anything
+        self._dump_view = memoryview(self._dump)
+
+    def _hash_at(self, i: int) -> int:
+        return HASH.unpack_from(self._index, HEADER.size + i * ENTRY.size)[0]
+
+    def find(self, title: str) -> memoryview | None:
+        # Raw abstract bytes for a title or None if it isn't in the dump
+        key = normalize_title(title)
+        target = title_hash(key)
+
+        # Binary search for the first entry with this hash
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._hash_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        # Check every entry with the same hash (collisions are rare but possible)
+        while lo < self.count:
+            entry_hash, t_off, t_len, a_off, a_len = ENTRY.unpack_from(
+                self._index, HEADER.size + lo * ENTRY.size
+            )
+            if entry_hash != target:
+                break
+            if _title_key(self._dump_view[t_off : t_off + t_len]) == key:
+                return self._dump_view[a_off : a_off + a_len]
+            lo += 1
+        return None
+
+    def summary(self, title: str, sentences: int = 3) -> str | None:
+        raw = self.find(title)
+        if raw is None:
+            return None
+        text = html.unescape(str(raw, "utf-8", "replace")).strip()
+        if not text:
+            return None
+        return " ".join(SENTENCE_END.split(text)[:sentences])
+
+    def close(self):
+        # The view has to go before the mmap it points into
+        if getattr(self, "_dump_view", None) is not None:
+            self._dump_view.release()
+        for mapped in (getattr(self, "_dump", None), getattr(self, "_index", None)):
+            if mapped is not None:
+                mapped.close()
+
+
+# Index building
+def _starts_with(dump: mmap.mmap, prefix: bytes, pos: int) -> bool:
+    return dump[pos : pos + len(prefix)] == prefix
+
+
+def _iter_abstracts(dump: mmap.mmap):
+    # Yields (title offset, title length, abstract offset, abstract length) for each doc
+    # Walks the dump line by line instead of parsing the XML, it's a lot faster
+    title = None
+    pos = 0
+    size = len(dump)
+    while pos < size:
+        end = dump.find(b"\n", pos)
+        if end == -1:
+            end = size
+        line_start = pos
+        pos = end + 1
+
+        if _starts_with(dump, b"<title>", line_start):
+            t_start = line_start + len(b"<title>")
+            t_end = dump.find(b"</title>", t_start, end)
+            if t_end == -1:
+                title = None
+                continue
+            if _starts_with(dump, TITLE_PREFIX, t_start):
+                t_start += len(TITLE_PREFIX)
+            title = (t_start, t_end - t_start)
+        elif title and _starts_with(dump, b"<abstract>", line_start):
+            a_start = line_start + len(b"<abstract>")
+            a_end = dump.find(b"</abstract>", a_start)  # Some abstracts span lines
+            if a_end == -1:
+                break
+            pos = dump.find(b"\n", a_end)
+            pos = size if pos == -1 else pos + 1
+            if a_end > a_start:
+                yield title[0], title[1], a_start, a_end - a_start
+            title = None
+
+
+def _sorted_order(hashes: array):
+    # Yields entry numbers in hash order. sorted() over every entry would hold millions
+    # of int objects and their keys at once, so they get counting sorted into an array
+    # by the top bits of the hash first (hashes are uniform so the buckets come out
+    # even) and only one small bucket at a time goes through sorted()
+    shift = 64 - SORT_BUCKET_BITS
+    starts = array("Q", bytes(8 << SORT_BUCKET_BITS))
+    for entry_hash in hashes:
+        starts[entry_hash >> shift] += 1
+    total = 0
+    for bucket, count in enumerate(starts):
+        starts[bucket] = total
+        total += count
+
+    order = array("I", bytes(4 * len(hashes)))
+    ends = array("Q", starts)  # Where the next entry for each bucket goes
+    for i, entry_hash in enumerate(hashes):
+        bucket = entry_hash >> shift
+        order[ends[bucket]] = i
+        ends[bucket] += 1
+
+    for start, end in zip(starts, ends):
+        yield from sorted(order[start:end], key=hashes.__getitem__)
+
+
+def build_index(dump_path: str, index_path: str) -> int:
+    start = time.perf_counter()
+    with open(dump_path, "rb") as f:
+        dump = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # Parallel arrays keep memory down on big dumps
+            hashes = array("Q")
+            title_offsets = array("Q")
+            title_lengths = array("I")
+            abstract_offsets = array("Q")
+            abstract_lengths = array("I")
+
+            for t_off, t_len, a_off, a_len in _iter_abstracts(dump):
+                hashes.append(title_hash(_title_key(dump[t_off : t_off + t_len])))
+                title_offsets.append(t_off)
+                title_lengths.append(t_len)
+                abstract_offsets.append(a_off)
+                abstract_lengths.append(a_len)
+                if len(hashes) % 1_000_000 == 0:
+                    print(f"Indexed {len(hashes):,} titles...")
+
+            tmp_path = index_path + ".tmp"
+            with open(tmp_path, "wb") as out:
+                out.write(HEADER.pack(MAGIC, len(hashes), len(dump)))
+                for i in _sorted_order(hashes):
+                    out.write(
+                        ENTRY.pack(
+                            hashes[i],
+                            title_offsets[i],
+                            title_lengths[i],
+                            abstract_offsets[i],
+                            abstract_lengths[i],
+                        )
+                    )
+            os.replace(tmp_path, index_path)  # Don't leave a half written index around
+        finally:
+            dump.close()
+
+    print(f"Indexed {len(hashes):,} titles in {time.perf_counter() - start:.1f}s")
+    return len(hashes)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="EasyMod offline wikipedia index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build an index from an abstracts dump")
+    build.add_argument("dump", help="Path to the abstracts dump (.xml, uncompressed)")
+    build.add_argument("index", help="Where to write the index")
+
+    lookup = sub.add_parser("lookup", help="Look up a title to test an index")
+    lookup.add_argument("dump")
+    lookup.add_argument("index")
+    lookup.add_argument("title")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build_index(args.dump, args.index)
+        return 0
+
+    index = OfflineIndex(args.dump, args.index)
+    try:
+        start = time.perf_counter()
+        summary = index.summary(args.title)
+        took = (time.perf_counter() - start) * 1000
+    finally:
+        index.close()
+    if summary is None:
+        print(f"'{args.title}' isn't in the index ({took:.3f}ms)")
+        return 1
+    print(f"{summary}\n({took:.3f}ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
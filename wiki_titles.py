@@ -0,0 +1,169 @@
+# Wikipedia title autocomplete
+# Suggestions for /wikipedia's query option so people pick a real title instead of
+# guessing and getting "be more specific" or "not found" back. Titles come from searches
+# that worked and the options wikipedia lists with disambiguation errors, kept in one
+# sorted list so finding everything starting with what's been typed is two bisects and
+# a slice (a few microseconds, Discord gives autocomplete 3 seconds). When a prefix
+# doesn't have enough matches wikipedia's own search runs in the background and its
+# titles show up a keystroke later, autocomplete never waits on it. Titles are saved so
+# the index survives restarts. Doesn't import wikipedia, only the background search does
+import asyncio
+import bisect
+import importlib
+import sys
+from collections import OrderedDict
+
+import config
+import log
+from database import db
+from wiki_offline import normalize_title
+
+db.add_schema(
+    """
+    CREATE TABLE IF NOT EXISTS wiki_titles (
+        key TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    );
+    """
+)
+
+MAX_CHOICES = 25  # Discord's limit
+MAX_LENGTH = 100  # Longest choice Discord takes
+SCAN_LIMIT = 200  # Matches looked at per prefix before picking the most searched ones
+SEARCHED_PREFIXES = 2048  # Prefixes remembered so the same one isn't searched twice
+
+_keys: list[str] = []  # Normalized titles, sorted
+_titles: dict[str, str] = {}  # key -> title the way wikipedia writes it
+_hits: dict[str, int] = {}  # key -> searches that found it
+_searched: OrderedDict[str, None] = OrderedDict()
+_searching: set[asyncio.Task] = set()
+_loaded: asyncio.Task | None = None
+
+
+def size() -> int:
+    return len(_keys)
+
+
+async def load():
+    # The first autocomplete (or search) loads the saved titles, later calls return
+    # straight away
+    global _loaded
+    if _loaded is None:
+        _loaded = asyncio.ensure_future(_load())
+    await asyncio.shield(_loaded)
+
+
+async def _load():
+    try:
+        rows = await db.read(
+            "SELECT key, title, hits FROM wiki_titles ORDER BY hits DESC LIMIT ?",
+            (config.WIKI_TITLES_MAX,),
+        )
+    except Exception as e:
+        log.warning("wiki_titles_load_failed", error=str(e))
+        return
+    for key, title, hits in rows:
+        # Anything learned while this was loading wins
+        if key not in _titles:
+            _titles[key] = title
+            _hits[key] = hits
+    _keys[:] = sorted(_titles)
+
+
+def _insert(title: str) -> str | None:
+    title = " ".join(title.split())
+    if not title or len(title) > MAX_LENGTH:
+        return None
+    key = normalize_title(title)
+    if key not in _titles:
+        bisect.insort(_keys, key)
+        _titles[key] = title
+        _hits[key] = 0
+    return key
+
+
+def found(title: str):
+    # A search for this title worked
+    key = _insert(title)
+    if key is None:
+        return
+    _hits[key] += 1
+    db.write(
+        "INSERT INTO wiki_titles (key, title, hits) VALUES (?, ?, 1)"
+        " ON CONFLICT (key) DO UPDATE SET hits = hits + 1",
+        (key, _titles[key]),
+    )
+    _trim()
+
+
+def learn(titles: list[str]):
+    # Titles we heard about (disambiguation options, search results) but nobody picked yet
+    new = []
+    for title in titles:
+        if normalize_title(title) not in _titles:
+            key = _insert(title)
+            if key is not None:
+                new.append((key, _titles[key]))
+    db.write_many("INSERT OR IGNORE INTO wiki_titles (key, title) VALUES (?, ?)", new)
+    _trim()
+
+
+def _trim():
+    # Least searched titles go first once there's too many, lets it grow 10% over so
+    # this doesn't run on every insert
+    if len(_keys) <= config.WIKI_TITLES_MAX * 1.1:
+        return
+    keep = sorted(_hits, key=_hits.__getitem__, reverse=True)[: config.WIKI_TITLES_MAX]
+    for key in set(_hits).difference(keep):
+        del _titles[key]
+        del _hits[key]
+    _keys[:] = sorted(keep)
+    db.write(
+        "DELETE FROM wiki_titles WHERE key NOT IN"
+        " (SELECT key FROM wiki_titles ORDER BY hits DESC LIMIT ?)",
+        (config.WIKI_TITLES_MAX,),
+    )
+
+
+def complete(text: str) -> list[str]:
+    # Titles starting with text, most searched first
+    prefix = normalize_title(text)
+    if not prefix:
+        return []
+    start = bisect.bisect_left(_keys, prefix)
+    # Everything starting with prefix sorts before prefix + the last code point
+    end = bisect.bisect_left(_keys, prefix + "\U0010ffff", start, min(len(_keys), start + SCAN_LIMIT))
+    matches = _keys[start:end]
+    matches.sort(key=_hits.__getitem__, reverse=True)  # Stable, ties stay alphabetical
+    return [_titles[key] for key in matches[:MAX_CHOICES]]
+
+
+def search_upstream(text: str, matches: int):
+    # Asks wikipedia in the background when we don't have much for this prefix yet
+    prefix = normalize_title(text)
+    if (
+        not config.WIKI_AUTOCOMPLETE_SEARCH
+        or config.WIKI_OFFLINE_ONLY
+        or matches >= MAX_CHOICES
+        or len(prefix) < config.WIKI_AUTOCOMPLETE_MIN_CHARS
+        or prefix in _searched
+        or len(_searching) >= config.WIKI_AUTOCOMPLETE_MAX_SEARCHES
+    ):
+        return
+    _searched[prefix] = None
+    if len(_searched) > SEARCHED_PREFIXES:
+        _searched.popitem(last=False)
+    task = asyncio.ensure_future(_search(prefix))
+    _searching.add(task)
+    task.add_done_callback(_searching.discard)
+
+
+async def _search(prefix: str):
+    try:
+        # Importing wikipedia takes a while, do it off the event loop
+        wiki = sys.modules.get("wiki") or await asyncio.to_thread(importlib.import_module, "wiki")
+        learn(await wiki.search_titles(prefix))
+    except Exception as e:
+        _searched.pop(prefix, None)  # Worth another go later
+        log.warning("wiki_title_search_failed", prefix=prefix, error=str(e) or type(e).__name__)